@@ -1,17 +1,51 @@
+# Las anotaciones no se evalúan: pandas, numpy y plotly se importan en las funciones que
+# los usan para que una sesión nueva no espere a cargarlos
+from __future__ import annotations
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+from contextlib import nullcontext
+from itertools import chain
 import json
 import os
+import time
+import uuid
 from pathlib import Path
 from datetime import datetime
 from tablesScript import BuscadorCodeunit
+from indice_procedures import IndiceProcedures, MODO_CONTIENE, MODO_PREFIJO
+from similitud import construir_indice_similitud
+from snapshot import ErrorSnapshot, EXTENSION_SNAPSHOT
+from resultados_compactos import AlmacenProcedures, CONTENIDOS, ESTADOS
+from manifiesto import ManifiestoProcedures
+from trabajos_analisis import RegistroTrabajos
+from vigilancia import RegistroVigilantes
+from cache_ia import CacheIA
 from config import AI_API_KEY, DEFAULT_REPOS_PATH
 
 
-from ai_helper import AIHelper, create_ai_helper
+from ai_helper import AIHelper, ESTADO_CONECTADA, ESTADO_SIN_VERIFICAR, create_ai_helper
+
+DIRECTORIO_CACHE = ".cache_analisis"
+RUTA_CACHE_IA = os.path.join(DIRECTORIO_CACHE, "cache_ia.sqlite3")
+INTERVALO_REFRESCO = 1.0
+# Segundos entre comprobaciones de archivos cambiados con la vigilancia activa
+INTERVALO_VIGILANCIA = 2.0
+MAX_RESULTADOS_BUSQUEDA = 500
+UMBRAL_SIMILITUD = 0.6
+MAX_PROCEDURES_SIMILARES = 50
+# Por encima de este número de archivos no se ofrece el gráfico de una barra por archivo
+MAX_ARCHIVOS_GRAFICO = 200
+TOP_ARCHIVOS_GRAFICO = 30
+MODO_GRAFICO_TOP = "🏆 Top archivos"
+MODO_GRAFICO_REPOSITORIOS = "📦 Por repositorio"
+MODO_GRAFICO_HISTOGRAMA = "📈 Histograma"
+MODO_GRAFICO_DISPERSION = "🔬 Dispersión"
+MODO_GRAFICO_TODOS = "📊 Todos los archivos"
+# Procedures por página en las pestañas de detalle de un archivo
+TAMAÑO_PAGINA_PROCEDURES = 20
+VISTA_PAGINAS = "📄 Páginas"
+VISTA_TABLA = "📋 Tabla"
+RUTA_SNAPSHOT = os.path.join(DIRECTORIO_CACHE, "ultimo_analisis" + EXTENSION_SNAPSHOT)
 
 
 def inicializar_session_state():
@@ -27,12 +61,75 @@ def inicializar_session_state():
     
     if 'analisis_completado' not in st.session_state:
         st.session_state.analisis_completado = False
-
-    if 'ai_helper' not in st.session_state:
-        st.session_state.ai_helper = create_ai_helper(AI_API_KEY)
     
+    if 'trabajo' not in st.session_state:
+        st.session_state.trabajo = None
+
     if 'descripciones_procedures' not in st.session_state:
         st.session_state.descripciones_procedures = {}
+    
+    if 'indice_procedures' not in st.session_state:
+        st.session_state.indice_procedures = None
+    
+    if 'indice_similitud' not in st.session_state:
+        st.session_state.indice_similitud = None
+    
+    if 'version_analisis' not in st.session_state:
+        st.session_state.version_analisis = None
+    
+    if 'version_base' not in st.session_state:
+        st.session_state.version_base = None
+    
+    if 'vigilante' not in st.session_state:
+        st.session_state.vigilante = None
+    
+    if 'id_sesion' not in st.session_state:
+        st.session_state.id_sesion = uuid.uuid4().hex
+    
+    if 'version_resultados' not in st.session_state:
+        st.session_state.version_resultados = 0
+
+@st.cache_resource
+def obtener_cache_ia(ruta_db: str) -> CacheIA:
+    """Cache persistente de respuestas de IA compartida por todas las sesiones"""
+    return CacheIA(ruta_db)
+
+@st.cache_resource
+def obtener_ai_helper() -> AIHelper:
+    """Cliente de IA compartido por todas las sesiones; el modelo se configura en el primer uso"""
+    return create_ai_helper(AI_API_KEY, cache=obtener_cache_ia(RUTA_CACHE_IA))
+
+def mensaje_ia_no_disponible() -> str:
+    """Mensaje de IA no disponible con el error de configuración, igual para todas las sesiones"""
+    error = obtener_ai_helper().error_configuracion
+    if error:
+        return f"❌ IA no disponible: {error}"
+    return "❌ IA no disponible. Verifica la configuración de la API."
+
+@st.cache_resource
+def obtener_manifiesto(directorio_cache: str) -> ManifiestoProcedures:
+    """Manifiesto incremental compartido por todas las sesiones del servidor"""
+    return ManifiestoProcedures(directorio_cache)
+
+@st.cache_resource
+def obtener_registro_trabajos() -> RegistroTrabajos:
+    """Registro de análisis en segundo plano compartido por todas las sesiones"""
+    return RegistroTrabajos()
+
+@st.cache_resource
+def obtener_registro_vigilantes() -> RegistroVigilantes:
+    """Un vigilante por análisis, compartido por todas las sesiones que lo muestran"""
+    return RegistroVigilantes(intervalo=INTERVALO_VIGILANCIA)
+
+def leer_resultados():
+    """
+    Contexto para leer los resultados del buscador de la sesión
+
+    Si algún vigilante puede modificarlos (aunque sea de otra sesión), impide que se
+    apliquen cambios mientras se leen.
+    """
+    vigilante = obtener_registro_vigilantes().obtener(st.session_state.buscador)
+    return vigilante.lectura() if vigilante is not None else nullcontext()
 
 def obtener_ruta_archivo(nombre_archivo):
     """
@@ -47,6 +144,10 @@ def obtener_ruta_archivo(nombre_archivo):
     if not st.session_state.buscador:
         return None
     
+    indice = st.session_state.indice_procedures
+    if indice is not None and indice.origen is st.session_state.todos_los_procedures:
+        return indice.ruta_archivo(nombre_archivo)
+    
     if nombre_archivo in st.session_state.archivos_repetidos:
         primera_aparicion = st.session_state.archivos_repetidos[nombre_archivo]['archivos'][0]
         return primera_aparicion['archivo']['ruta_completa']
@@ -66,7 +167,7 @@ def generar_descripcion_procedure(nombre_procedure: str, info_procedure: dict, a
         return st.session_state.descripciones_procedures[cache_key]
     
     # Verificar si IA está disponible
-    if not st.session_state.ai_helper.is_available():
+    if not obtener_ai_helper().is_available():
         descripcion = "❌ IA no disponible"
         st.session_state.descripciones_procedures[cache_key] = descripcion
         return descripcion
@@ -83,13 +184,15 @@ def generar_descripcion_procedure(nombre_procedure: str, info_procedure: dict, a
     linea_procedure = primera_aparicion.get('linea', '')
     ruta_archivo = primera_aparicion.get('ruta_archivo', '')
     numero_linea = primera_aparicion.get('numero_linea', 0)
+    linea_fin = primera_aparicion.get('linea_fin')
     
     # Generar descripción con IA
-    descripcion = st.session_state.ai_helper.get_procedure_analysis(
+    descripcion = obtener_ai_helper().get_procedure_analysis(
         nombre_procedure=nombre_procedure,
         linea_procedure=linea_procedure,
         ruta_archivo=ruta_archivo,
-        numero_linea=numero_linea
+        numero_linea=numero_linea,
+        linea_fin=linea_fin
     )
     
     # Guardar en cache
@@ -105,6 +208,10 @@ def mostrar_procedure_con_descripcion(nombre_procedure: str, info_procedure: dic
             if info_procedure['estado'] == 'REPETIDO':
                 st.write(f"**Repositorios:** {', '.join(info_procedure['repositorios'])}")
                 st.write(f"**Total repositorios:** {info_procedure['total_repositorios']}")
+                st.write(f"**Contenido:** {info_procedure['contenido']}")
+                if info_procedure['contenido'] == 'DIVERGENTE':
+                    for numero, grupo in enumerate(info_procedure['grupos_huella'], 1):
+                        st.write(f"- Versión {numero} (`{grupo['huella'][:8]}`): {', '.join(grupo['repositorios'])}")
             else:
                 st.write(f"**Repositorio:** {info_procedure['repositorios'][0]}")
             
@@ -115,6 +222,9 @@ def mostrar_procedure_con_descripcion(nombre_procedure: str, info_procedure: dic
                     st.code(f"{aparicion['repositorio']}: {modificador_str}{aparicion['linea']}")
                 else:
                     st.code(f"{modificador_str}{aparicion['linea']}")
+            
+            if st.checkbox("🧬 Ver procedures similares", key=f"similares_{archivo_nombre}_{nombre_procedure}"):
+                mostrar_procedures_similares(nombre_procedure, info_procedure, archivo_nombre)
         
         with col2:
             if st.button(f"🤖 Analizar", key=f"btn_{archivo_nombre}_{nombre_procedure}"):
@@ -122,17 +232,92 @@ def mostrar_procedure_con_descripcion(nombre_procedure: str, info_procedure: dic
                 if cache_key in st.session_state.descripciones_procedures:
                     del st.session_state.descripciones_procedures[cache_key]
                 with st.spinner("Analizando procedure..."):
-                    descripcion = generar_descripcion_procedure(nombre_procedure, info_procedure, archivo_nombre)
+                    generar_descripcion_procedure(nombre_procedure, info_procedure, archivo_nombre)
         
-        descripcion = generar_descripcion_procedure(nombre_procedure, info_procedure, archivo_nombre)
+        # Solo se muestran descripciones ya generadas: renderizar no llama al modelo
+        descripcion = st.session_state.descripciones_procedures.get(f"{archivo_nombre}_{nombre_procedure}")
         
         if descripcion and not descripcion.startswith("❌"):
             st.success(f"🤖 **¿Qué hace?:** {descripcion}")
-        elif descripcion.startswith("❌"):
+        elif descripcion:
             st.error(f"🤖 **Análisis:** {descripcion}")
         else:
             st.info("🤖 **Haz clic en 'Analizar' para obtener descripción con IA**")
 
+def obtener_indice_similitud():
+    """Índice MinHash/LSH de los cuerpos del análisis de la sesión, construido la primera vez que se usa"""
+    indice = st.session_state.indice_similitud
+    if indice is None or indice[0] is not st.session_state.todos_los_procedures:
+        with st.spinner("Calculando firmas de similitud de los procedures..."):
+            indice = (st.session_state.todos_los_procedures,
+                      *construir_indice_similitud(st.session_state.todos_los_procedures))
+        st.session_state.indice_similitud = indice
+    return indice[1:]
+
+def mostrar_procedures_similares(nombre_procedure: str, info_procedure: dict, archivo_nombre: str):
+    """Procedures de cualquier archivo con el mismo cuerpo o uno casi igual (MinHash)"""
+    import pandas as pd
+    indice, procedures_por_huella, huellas_por_procedure = obtener_indice_similitud()
+    # Incluye las huellas calculadas al construir el índice para los procedures extraídos sin cuerpo
+    huellas = huellas_por_procedure.get((archivo_nombre, nombre_procedure), [])
+    
+    similitudes = {huella: 1.0 for huella in huellas}
+    for huella in huellas:
+        for otra_huella, valor in indice.buscar_similares(huella, umbral=UMBRAL_SIMILITUD):
+            similitudes[otra_huella] = max(similitudes.get(otra_huella, 0.0), valor)
+    
+    filas = []
+    vistos = {(archivo_nombre, nombre_procedure)}
+    for huella, valor in sorted(similitudes.items(), key=lambda par: -par[1]):
+        for procedure in procedures_por_huella.get(huella, []):
+            if procedure not in vistos:
+                vistos.add(procedure)
+                filas.append({'Procedure': procedure[1], 'Archivo': procedure[0], 'Similitud': f"{valor:.0%}"})
+    
+    if filas:
+        st.dataframe(pd.DataFrame(filas[:MAX_PROCEDURES_SIMILARES]), use_container_width=True)
+    elif not any(huella in indice.firmas for huella in huellas):
+        st.info("El cuerpo es demasiado corto para buscar procedures similares")
+    else:
+        st.info(f"No hay procedures con una similitud de al menos {UMBRAL_SIMILITUD:.0%}")
+
+def mostrar_boton_describir_visibles(procedures_visibles: dict, archivo_nombre: str, clave: str):
+    """Botón que genera con IA las descripciones que faltan de los procedures visibles"""
+    pendientes = {
+        nombre_procedure: info
+        for nombre_procedure, info in procedures_visibles.items()
+        if f"{archivo_nombre}_{nombre_procedure}" not in st.session_state.descripciones_procedures
+    }
+    
+    if not pendientes:
+        return
+    
+    if st.button(f"🤖 Describir todos los visibles ({len(pendientes)})", key=f"btn_describir_{clave}_{archivo_nombre}"):
+        if not obtener_ai_helper().is_available():
+            st.error(mensaje_ia_no_disponible())
+            return
+        
+        # Procedures sin apariciones se resuelven uno a uno (mensaje de error sin llamar al modelo)
+        con_apariciones = {k: v for k, v in pendientes.items() if v.get('apariciones')}
+        for nombre_procedure, info in pendientes.items():
+            if nombre_procedure not in con_apariciones:
+                generar_descripcion_procedure(nombre_procedure, info, archivo_nombre)
+        
+        with st.spinner(f"Describiendo {len(con_apariciones)} procedures..."):
+            descripciones = obtener_ai_helper().get_procedures_analysis_batch([
+                {
+                    'nombre_procedure': nombre_procedure,
+                    'linea_procedure': info['apariciones'][0].get('linea', ''),
+                    'ruta_archivo': info['apariciones'][0].get('ruta_archivo', ''),
+                    'numero_linea': info['apariciones'][0].get('numero_linea', 0),
+                    'linea_fin': info['apariciones'][0].get('linea_fin')
+                }
+                for nombre_procedure, info in con_apariciones.items()
+            ])
+        
+        for nombre_procedure, descripcion in zip(con_apariciones, descripciones):
+            st.session_state.descripciones_procedures[f"{archivo_nombre}_{nombre_procedure}"] = descripcion
+
 def mostrar_info_archivo(archivo_seleccionado):
     ruta_archivo = obtener_ruta_archivo(archivo_seleccionado)
     
@@ -159,8 +344,8 @@ def mostrar_descripcion_ia(archivo_seleccionado):
     st.markdown("### 🤖 Descripción General del Archivo")
     
     # Verificar si la IA está disponible
-    if not st.session_state.ai_helper.is_available():
-        st.error("❌ IA no disponible. Verifica la configuración de la API.")
+    if not obtener_ai_helper().is_available():
+        st.error(mensaje_ia_no_disponible())
         return
     
     # Obtener la ruta del archivo desde los datos del buscador
@@ -176,7 +361,7 @@ def mostrar_descripcion_ia(archivo_seleccionado):
         if st.button("🔄 Generar Descripción", key="btn_descripcion"):
             with st.spinner("Analizando archivo con IA..."):
                 # Usar el nuevo método que lee el archivo completo
-                descripcion = st.session_state.ai_helper.get_code_analysis_from_file(
+                descripcion = obtener_ai_helper().get_code_analysis_from_file(
                     ruta_archivo, archivo_seleccionado
                 )
                 st.session_state[f"descripcion_{archivo_seleccionado}"] = descripcion
@@ -203,49 +388,252 @@ def crear_dashboard():
     st.sidebar.header("⚙️ Configuración")
     
     with st.sidebar.expander("🤖 Estado de IA"):
-        if st.session_state.ai_helper.is_available():
+        # Sin configurar el modelo: se conecta la primera vez que se pide una descripción
+        estado_ia = obtener_ai_helper().estado_configuracion()
+        if estado_ia == ESTADO_CONECTADA:
             st.success("✅ IA Conectada")
+        elif estado_ia == ESTADO_SIN_VERIFICAR:
+            st.info("⏳ IA sin verificar: se conectará al pedir la primera descripción")
         else:
-            st.error("❌ IA No Disponible")
+            st.error(mensaje_ia_no_disponible())
         
         total_descripciones = len(st.session_state.descripciones_procedures)
         st.info(f"📊 Descripciones en cache: {total_descripciones}")
         
+        cache_ia = obtener_ai_helper().cache
+        if cache_ia is not None:
+            estadisticas_cache = cache_ia.obtener_estadisticas()
+            st.info(
+                f"💾 Cache persistente: {estadisticas_cache['entradas']} respuestas\n\n"
+                f"✅ Aciertos: {estadisticas_cache['aciertos']} · "
+                f"❌ Fallos: {estadisticas_cache['fallos']} "
+                f"({estadisticas_cache['tasa_aciertos']:.0%})"
+            )
+        
         if st.button("🗑️ Limpiar Cache"):
             st.session_state.descripciones_procedures = {}
             st.success("Cache limpiado")
+        
+        if cache_ia is not None and st.button("🗑️ Vaciar Cache Persistente"):
+            cache_ia.limpiar()
+            st.success("Cache persistente vaciado")
     
     ruta_repositorios = st.sidebar.text_input(
         "Ruta de repositorios:",
         value=DEFAULT_REPOS_PATH
     )
     
+    analisis_incremental = st.sidebar.checkbox(
+        "♻️ Análisis incremental",
+        value=True,
+        help="Reutiliza los procedures de los archivos que no han cambiado desde el último análisis"
+    )
+    
+    procesos_extraccion = st.sidebar.number_input(
+        "Procesos de extracción:",
+        min_value=1,
+        max_value=os.cpu_count() or 1,
+        value=os.cpu_count() or 1,
+        help="Número de procesos que extraen procedures en paralelo"
+    )
+    
+    perfilar_analisis = st.sidebar.checkbox(
+        "🔬 Perfilar análisis",
+        value=False,
+        help="Ejecuta el análisis con cProfile y tracemalloc (más lento); el resultado aparece en el panel Rendimiento"
+    )
+    
+    with st.sidebar.expander("💾 Snapshots"):
+        ruta_snapshot = st.text_input("Archivo de snapshot:", value=RUTA_SNAPSHOT)
+        
+        if st.button("📂 Abrir Snapshot"):
+            abrir_snapshot(ruta_snapshot)
+        
+        if st.session_state.analisis_completado and st.button("💾 Guardar Snapshot"):
+            with leer_resultados():
+                st.session_state.buscador.guardar_snapshot(ruta_snapshot)
+            st.success(f"Snapshot guardado en {ruta_snapshot}")
+    
+    vigilar_cambios = st.sidebar.checkbox(
+        "👁️ Vigilar cambios",
+        value=False,
+        disabled=not st.session_state.analisis_completado,
+        help="Vuelve a extraer los archivos .CodeUnit.al que cambian y actualiza los resultados sin repetir el análisis"
+    )
+    
+    registro_trabajos = obtener_registro_trabajos()
+    
     if st.sidebar.button("🚀 Ejecutar Análisis"):
-        with st.spinner("Analizando archivos..."):
-            try:
-                buscador = BuscadorCodeunit(ruta_repositorios)
-                buscador.buscar_archivos()
-                buscador.filtrar_archivos_repetidos()
-                buscador.analizar_todos_los_procedures()
-                
-                st.session_state.buscador = buscador
-                st.session_state.archivos_repetidos = buscador.filtrar_archivos_repetidos()[0]
-                st.session_state.todos_los_procedures = buscador.obtener_todos_los_procedures()
-                st.session_state.analisis_completado = True
-                
-                st.session_state.descripciones_procedures = {}
-                
-                st.success("✅ Análisis completado correctamente!")
-            except Exception as e:
-                st.error(f"❌ Error durante el análisis: {str(e)}")
-                st.session_state.analisis_completado = False
+        manifiesto = obtener_manifiesto(DIRECTORIO_CACHE) if analisis_incremental else None
+        trabajo, nuevo = registro_trabajos.iniciar_o_unirse(
+            ruta_repositorios,
+            manifiesto=manifiesto,
+            procesos=int(procesos_extraccion),
+            perfilar=perfilar_analisis
+        )
+        st.session_state.trabajo = trabajo
+        st.session_state.analisis_completado = False
+        if not nuevo:
+            st.sidebar.info("🔗 Ya había un análisis en curso para esta ruta, te has unido a él")
+    
+    trabajo = st.session_state.trabajo
+    if trabajo is None:
+        trabajo_en_curso = registro_trabajos.obtener(ruta_repositorios)
+        if trabajo_en_curso is not None and trabajo_en_curso.en_curso:
+            st.sidebar.warning("⏳ Hay un análisis en curso para esta ruta")
+            if st.sidebar.button("🔗 Unirse al análisis en curso"):
+                st.session_state.trabajo = trabajo = trabajo_en_curso
+    
+    if trabajo is not None:
+        if trabajo.en_curso:
+            mostrar_progreso_analisis(trabajo)
+            time.sleep(INTERVALO_REFRESCO)
+            st.rerun()
+        
+        finalizar_analisis(trabajo)
     
     if st.session_state.analisis_completado:
-        mostrar_resultados_interactivos()
+        actualizar_vigilancia(vigilar_cambios)
+        with leer_resultados():
+            sincronizar_resultados()
+            mostrar_resultados_interactivos()
     else:
+        actualizar_vigilancia(False)
         st.info("👆 Haz clic en 'Ejecutar Análisis' para comenzar")
 
-def mostrar_resultados_interactivos():
+def actualizar_vigilancia(activa: bool):
+    """Suscribe o da de baja la sesión del vigilante de su buscador y, si está activo, comprueba cambios"""
+    registro = obtener_registro_vigilantes()
+    vigilante = st.session_state.vigilante
+    if vigilante is not None and (not activa or vigilante.buscador is not st.session_state.buscador):
+        registro.cancelar(vigilante.buscador, st.session_state.id_sesion)
+        st.session_state.vigilante = vigilante = None
+    
+    if not activa:
+        return
+    
+    if vigilante is None:
+        st.session_state.vigilante = vigilante = registro.suscribir(st.session_state.buscador,
+                                                                    st.session_state.id_sesion)
+    
+    modo = "eventos del sistema" if vigilante.usa_eventos else f"sondeo cada {vigilante.intervalo_efectivo:.0f}s"
+    st.sidebar.caption(f"👁️ Vigilando cambios ({modo})")
+    comprobar_cambios_archivos()
+
+@st.fragment(run_every=INTERVALO_VIGILANCIA)
+def comprobar_cambios_archivos():
+    """Se ejecuta cada INTERVALO_VIGILANCIA segundos; si algún archivo ha cambiado recarga la página"""
+    vigilante = st.session_state.vigilante
+    if vigilante is None:
+        return
+    
+    # Otra sesión que vigila el mismo análisis puede haber aplicado los cambios
+    vigilante.comprobar()
+    buscador = vigilante.buscador
+    if buscador.version_resultados == st.session_state.version_resultados:
+        return
+    
+    nombres_actualizados = vigilante.ultimos_cambios
+    cambios_estado = sum(1 for transicion in buscador.ultimas_transiciones if transicion['tipo'] == 'procedure')
+    st.toast(f"🔄 {len(nombres_actualizados)} archivos actualizados: {', '.join(sorted(nombres_actualizados)[:3])}"
+             + ("..." if len(nombres_actualizados) > 3 else "")
+             + (f" · {cambios_estado} procedures cambian de estado" if cambios_estado else ""))
+    st.rerun()
+
+def fijar_version_analisis(version_base: str, version_resultados: int):
+    """
+    Guarda en la sesión la versión del análisis, que es la clave de las funciones st.cache_data
+    
+    version_base identifica el análisis cargado (trabajo o snapshot) y version_resultados
+    cuenta los cambios que el vigilante le ha aplicado; se guardan por separado. La clave
+    incluye además el id de la sesión: dos sesiones que abren el mismo snapshot tienen
+    buscadores distintos, que el vigilante de cada una actualiza por su cuenta.
+    """
+    st.session_state.version_base = version_base
+    st.session_state.version_resultados = version_resultados
+    st.session_state.version_analisis = f"{version_base}|{st.session_state.id_sesion}|{version_resultados}"
+
+def sincronizar_resultados():
+    """
+    Recoge en la sesión los cambios que un vigilante haya aplicado al buscador
+
+    Las agregaciones y los índices se vuelven a calcular con una nueva version_analisis.
+    """
+    buscador = st.session_state.buscador
+    if buscador is None or buscador.version_resultados == st.session_state.version_resultados:
+        return
+    
+    st.session_state.archivos_repetidos = buscador.archivos_repetidos
+    st.session_state.todos_los_procedures = buscador.obtener_todos_los_procedures()
+    fijar_version_analisis(st.session_state.version_base, buscador.version_resultados)
+    st.session_state.indice_procedures = None
+    st.session_state.indice_similitud = None
+
+def mostrar_progreso_analisis(trabajo):
+    """Muestra el progreso de un análisis en curso y los archivos ya clasificados"""
+    progreso = trabajo.obtener_progreso()
+    total_archivos = progreso.get('total_archivos', 0)
+    archivos_procesados = progreso.get('archivos_procesados', 0)
+    
+    st.subheader(f"⏳ Análisis en curso: {progreso.get('etapa', 'pendiente')}")
+    st.progress(archivos_procesados / total_archivos if total_archivos else 0.0)
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📦 Repositorios escaneados", f"{progreso.get('repos_escaneados', 0)}/{progreso.get('total_repos', 0)}")
+    col2.metric("📄 Archivos procesados", f"{archivos_procesados}/{total_archivos}")
+    col3.metric("⚙️ Procedures encontrados", progreso.get('procedures_encontrados', 0))
+    
+    resultados_parciales = trabajo.obtener_resultados_parciales()
+    if resultados_parciales and trabajo.buscador is not None:
+        st.session_state.buscador = trabajo.buscador
+        st.session_state.archivos_repetidos = trabajo.buscador.archivos_repetidos
+        st.session_state.todos_los_procedures = resultados_parciales
+        fijar_version_analisis(f"{trabajo.id}-{len(resultados_parciales)}", st.session_state.version_resultados)
+        mostrar_resultados_interactivos(parcial=True)
+
+def finalizar_analisis(trabajo):
+    """Vuelca en la sesión el resultado de un análisis terminado"""
+    st.session_state.trabajo = None
+    
+    if trabajo.estado == 'completado':
+        buscador = trabajo.buscador
+        st.session_state.buscador = buscador
+        st.session_state.archivos_repetidos = buscador.archivos_repetidos
+        st.session_state.todos_los_procedures = buscador.obtener_todos_los_procedures()
+        fijar_version_analisis(trabajo.id, buscador.version_resultados)
+        st.session_state.analisis_completado = True
+        
+        st.session_state.descripciones_procedures = {}
+        
+        st.success("✅ Análisis completado correctamente!")
+    else:
+        st.error(f"❌ Error durante el análisis: {trabajo.error}")
+        st.session_state.analisis_completado = False
+
+def abrir_snapshot(ruta_snapshot: str):
+    """Carga en la sesión un análisis guardado sin volver a escanear los repositorios"""
+    if not os.path.exists(ruta_snapshot):
+        st.sidebar.error(f"❌ No existe el snapshot {ruta_snapshot}")
+        return
+    
+    try:
+        buscador = BuscadorCodeunit.cargar_snapshot(ruta_snapshot)
+    except (ErrorSnapshot, OSError) as e:
+        st.sidebar.error(f"❌ No se pudo abrir el snapshot: {e}")
+        return
+    
+    st.session_state.trabajo = None
+    st.session_state.buscador = buscador
+    st.session_state.archivos_repetidos = buscador.archivos_repetidos
+    st.session_state.todos_los_procedures = buscador.obtener_todos_los_procedures()
+    fijar_version_analisis(f"{os.path.abspath(ruta_snapshot)}-{os.stat(ruta_snapshot).st_mtime_ns}",
+                           buscador.version_resultados)
+    st.session_state.analisis_completado = True
+    st.session_state.descripciones_procedures = {}
+    
+    st.sidebar.success("✅ Snapshot cargado")
+
+def mostrar_resultados_interactivos(parcial: bool = False):
     archivos_repetidos = st.session_state.archivos_repetidos
     todos_los_procedures = st.session_state.todos_los_procedures
     
@@ -253,144 +641,563 @@ def mostrar_resultados_interactivos():
         st.warning("⚠️ No se encontraron archivos para analizar")
         return
     
+    if parcial:
+        st.info("⏳ Resultados parciales: se actualizan a medida que se clasifican los archivos")
+    
+    version_analisis = st.session_state.version_analisis
+    df_resumen = calcular_resumen_por_archivo(version_analisis, todos_los_procedures)
+    metricas = calcular_metricas(version_analisis, df_resumen)
+    
     col1, col2, col3, col4 = st.columns(4)
     
-    total_archivos = len(todos_los_procedures)
-    total_procedures = sum(len(procedures) for procedures in todos_los_procedures.values())
-    procedures_repetidos = sum(1 for procedures in todos_los_procedures.values() 
-                          for procedure in procedures.values() if procedure['estado'] == 'REPETIDO')
-    procedures_unicos = total_procedures - procedures_repetidos
+    col1.metric("📁 Archivos Analizados", metricas['total_archivos'])
+    col2.metric("⚙️ Total Procedures", metricas['total_procedures'])
+    col3.metric("🔄 Procedures Repetidos", metricas['procedures_repetidos'])
+    col4.metric("⭐ Procedures Únicos", metricas['procedures_unicos'])
+    
+    col5, col6, _, _ = st.columns(4)
+    col5.metric("🟰 Repetidos Idénticos", metricas['procedures_identicos'],
+                help="Mismo cuerpo en todos los repositorios (sin contar comentarios ni espacios): se pueden consolidar")
+    col6.metric("🔀 Repetidos Divergentes", metricas['procedures_repetidos'] - metricas['procedures_identicos'],
+                help="Mismo nombre pero distinto cuerpo en algún repositorio")
     
-    col1.metric("📁 Archivos Analizados", total_archivos)
-    col2.metric("⚙️ Total Procedures", total_procedures)
-    col3.metric("🔄 Procedures Repetidos", procedures_repetidos)
-    col4.metric("⭐ Procedures Únicos", procedures_unicos)
+    if not parcial and st.session_state.buscador is not None:
+        with st.expander("⏱️ Rendimiento"):
+            mostrar_panel_rendimiento(st.session_state.buscador.instrumentacion)
     
     st.markdown("---")
     
-    crear_grafico_resumen(todos_los_procedures)
+    crear_grafico_resumen(version_analisis, df_resumen)
+    
+    if not parcial:
+        mostrar_buscador_procedures(obtener_indice_procedures(), todos_los_procedures)
     
     st.header("📄 Análisis Detallado por Archivo")
     
     archivo_seleccionado = st.selectbox(
         "Selecciona un archivo para ver detalles:",
-        options=list(todos_los_procedures.keys()),
+        options=metricas['archivos'],
         key="selector_archivo"
     )
     
-    if archivo_seleccionado:
+    if archivo_seleccionado and archivo_seleccionado in todos_los_procedures:
         mostrar_info_archivo(archivo_seleccionado)
         
         mostrar_descripcion_ia(archivo_seleccionado)
         
         st.markdown("---")
         
-        mostrar_detalles_archivo_mejorado(archivo_seleccionado, todos_los_procedures[archivo_seleccionado])
+        mostrar_detalles_archivo_mejorado(archivo_seleccionado, todos_los_procedures[archivo_seleccionado],
+                                          version_analisis)
 
-def crear_grafico_resumen(todos_los_procedures):
-    st.header("📊 Resumen Visual")
+def mostrar_panel_rendimiento(instrumentacion):
+    """Tiempos por etapa y por repositorio del último análisis y, si se perfiló, el informe de cProfile"""
+    import pandas as pd
+    metricas = instrumentacion.resumen()
+    contadores = metricas['contadores']
     
-    datos_resumen = []
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📄 Archivos/s", f"{metricas['archivos_por_segundo']:.1f}")
+    col2.metric("💽 MB/s leídos", f"{metricas['mb_por_segundo']:.1f}")
+    col3.metric("📦 MB leídos", f"{contadores.get('bytes_leidos', 0) / 2**20:.1f}")
+    col4.metric("♻️ Archivos reutilizados", contadores.get('archivos_reutilizados', 0))
     
-    for archivo, procedures in todos_los_procedures.items():
-        repetidos = sum(1 for c in procedures.values() if c['estado'] == 'REPETIDO')
-        unicos = sum(1 for c in procedures.values() if c['estado'] == 'ÚNICO')
-        
-        datos_resumen.append({
-            'Archivo': archivo,
-            'Procedures Repetidos': repetidos,
-            'Procedures Únicos': unicos,
-            'Total': repetidos + unicos
-        })
+    if metricas['etapas']:
+        st.dataframe(pd.DataFrame([
+            {
+                'Etapa': etapa,
+                'Segundos': round(datos['segundos'], 3),
+                'Llamadas': datos['llamadas'],
+                'Pico memoria (MB)': round(datos['pico_memoria'] / 2**20, 1) if 'pico_memoria' in datos else None
+            }
+            for etapa, datos in metricas['etapas'].items()
+        ]), use_container_width=True, hide_index=True)
+    else:
+        st.info("No hay métricas de este análisis")
     
-    if not datos_resumen:
-        st.warning("No hay datos para mostrar en el gráfico")
+    if metricas['repositorios']:
+        st.dataframe(pd.DataFrame([
+            {
+                'Repositorio': repositorio,
+                'Archivos': datos.get('archivos', 0),
+                'Escaneo (s)': round(datos.get('segundos_escaneo', 0.0), 3),
+                'Extracción (s)': round(datos.get('segundos_extraccion', 0.0), 3),
+                'MB leídos': round(datos.get('bytes_leidos', 0) / 2**20, 2)
+            }
+            for repositorio, datos in metricas['repositorios'].items()
+        ]), use_container_width=True, hide_index=True)
+    
+    perfil = instrumentacion.texto_perfil()
+    if perfil:
+        st.markdown("**🔬 cProfile (tiempo acumulado):**")
+        st.code(perfil)
+
+def obtener_indice_procedures() -> IndiceProcedures:
+    """Índice de búsqueda del análisis de la sesión, construido una sola vez por análisis"""
+    indice = st.session_state.indice_procedures
+    if indice is None or indice.origen is not st.session_state.todos_los_procedures:
+        with st.spinner("Indexando procedures..."):
+            indice = IndiceProcedures(
+                st.session_state.todos_los_procedures,
+                archivos_repetidos=st.session_state.archivos_repetidos,
+                archivos_unicos=getattr(st.session_state.buscador, 'archivos_unicos', {})
+            )
+        st.session_state.indice_procedures = indice
+    return indice
+
+def mostrar_buscador_procedures(indice: IndiceProcedures, todos_los_procedures):
+    """Búsqueda de procedures por nombre en todos los archivos, con filtros"""
+    import pandas as pd
+    st.header("🔎 Buscar Procedures")
+    
+    col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
+    consulta = col1.text_input("Nombre del procedure:", key="consulta_procedures")
+    modo = col2.selectbox("Búsqueda:", ["Contiene", "Empieza por"], key="modo_busqueda")
+    modificador = col3.selectbox("Modificador:", ["Todos"] + indice.modificadores, key="filtro_modificador")
+    repositorio = col4.selectbox("Repositorio:", ["Todos"] + indice.repositorios, key="filtro_repositorio")
+    
+    if not consulta and modificador == "Todos" and repositorio == "Todos":
         return
     
-    df_resumen = pd.DataFrame(datos_resumen)
+    inicio = time.perf_counter()
+    resultados = indice.buscar(
+        consulta,
+        modo=MODO_PREFIJO if modo == "Empieza por" else MODO_CONTIENE,
+        modificador=None if modificador == "Todos" else modificador,
+        repositorio=None if repositorio == "Todos" else repositorio
+    )
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    
+    st.caption(f"🔎 {len(resultados)} procedures encontrados en {duracion_ms:.1f} ms "
+               f"(de {indice.total_entradas} indexados)")
+    if not resultados:
+        return
+    
+    filas = []
+    vistas_archivo = {}
+    for nombre_archivo, nombre_procedure in resultados[:MAX_RESULTADOS_BUSQUEDA]:
+        if nombre_archivo not in vistas_archivo:
+            vistas_archivo[nombre_archivo] = todos_los_procedures[nombre_archivo]
+        info = vistas_archivo[nombre_archivo][nombre_procedure]
+        filas.append({
+            'Procedure': nombre_procedure,
+            'Archivo': nombre_archivo,
+            'Estado': info['estado'],
+            'Contenido': info['contenido'],
+            'Repositorios': info['total_repositorios']
+        })
+    
+    st.dataframe(pd.DataFrame(filas), use_container_width=True)
+    if len(resultados) > MAX_RESULTADOS_BUSQUEDA:
+        st.info(f"Mostrando los primeros {MAX_RESULTADOS_BUSQUEDA} resultados; afina la búsqueda para ver el resto")
+
+def tabla_procedures(todos_los_procedures, con_repositorios: bool = False) -> pd.DataFrame:
+    """
+    Una fila por procedure con 'Archivo', 'repetido' e 'identico' (repetido con el mismo cuerpo)
+    
+    Con con_repositorios=True hay una fila por procedure y repositorio en que aparece, con
+    las columnas 'procedure' (posición del procedure) y 'Repositorio'. Con un
+    AlmacenProcedures se construye directamente de sus columnas; los resultados parciales
+    (diccionario de archivos) se aplanan en una pasada.
+    """
+    import numpy as np
+    import pandas as pd
+    if not isinstance(todos_los_procedures, AlmacenProcedures):
+        # Columnas de escalares: crear una tupla por procedure dispara el recolector de basura
+        procedures = [procedure for procedures_archivo in todos_los_procedures.values()
+                      for procedure in procedures_archivo.values()]
+        tamaños = [len(procedures_archivo) for procedures_archivo in todos_los_procedures.values()]
+        repetido = np.array([procedure['estado'] for procedure in procedures], dtype=object) == 'REPETIDO'
+        df = pd.DataFrame({
+            'Archivo': pd.Categorical.from_codes(np.repeat(np.arange(len(tamaños)), tamaños),
+                                                 categories=list(todos_los_procedures)),
+            'repetido': repetido,
+            'identico': repetido & (np.array([procedure['contenido'] for procedure in procedures],
+                                             dtype=object) == 'IDÉNTICO')
+        })
+        if not con_repositorios:
+            return df
+        # Los repositorios de cada procedure ya son distintos
+        repositorios = [procedure['repositorios'] for procedure in procedures]
+        df_repositorios = pd.DataFrame({
+            'procedure': np.repeat(np.arange(len(procedures)), [len(lista) for lista in repositorios]),
+            'Repositorio': pd.Categorical(list(chain.from_iterable(repositorios)))
+        })
+        return df_repositorios.join(df, on='procedure')
+    
+    columnas = todos_los_procedures.columnas()
+    rangos = todos_los_procedures.rangos_archivos()
+    primeros = np.fromiter((primer for primer, _ in rangos.values()), dtype=np.int64, count=len(rangos))
+    tamaños = np.fromiter((fin - primer for primer, fin in rangos.values()), dtype=np.int64, count=len(rangos))
+    # Procedures de los archivos vivos (las columnas pueden tener filas huérfanas de archivos reemplazados)
+    desplazamientos = np.repeat(primeros - (np.cumsum(tamaños) - tamaños), tamaños)
+    grupos = np.arange(int(tamaños.sum())) + desplazamientos
+    estados = np.asarray(columnas['_grupo_estado'])[grupos]
+    repetido = estados == ESTADOS.index('REPETIDO')
+    df = pd.DataFrame({
+        'Archivo': pd.Categorical.from_codes(np.repeat(np.arange(len(rangos)), tamaños), categories=list(rangos)),
+        'repetido': repetido,
+        'identico': repetido & (np.asarray(columnas['_grupo_contenido'])[grupos] == CONTENIDOS.index('IDÉNTICO'))
+    })
+    if not con_repositorios:
+        return df
     
+    inicio = np.asarray(columnas['_grupo_inicio'], dtype=np.int64)
+    filas_por_grupo = inicio[grupos + 1] - inicio[grupos]
+    filas = np.arange(int(filas_por_grupo.sum())) + np.repeat(
+        inicio[grupos] - (np.cumsum(filas_por_grupo) - filas_por_grupo), filas_por_grupo)
+    procedure = np.repeat(np.arange(len(grupos)), filas_por_grupo)
+    df_repositorios = pd.DataFrame({
+        'procedure': procedure,
+        'Repositorio': np.asarray(columnas['_repositorio'])[filas]
+    }).drop_duplicates()
+    # Ids de la tabla de cadenas a nombres, solo para los repositorios presentes
+    ids, codigos = np.unique(df_repositorios['Repositorio'].to_numpy(), return_inverse=True)
+    cadenas = todos_los_procedures.cadenas
+    df_repositorios['Repositorio'] = pd.Categorical.from_codes(codigos, categories=[cadenas[id_] for id_ in ids])
+    return df_repositorios.join(df, on='procedure')
+
+# Los argumentos con guion bajo no forman parte de la clave de cache: el resultado se
+# reutiliza mientras no cambie version_analisis, que identifica cada análisis cargado
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_resumen_por_archivo(version_analisis: str, _todos_los_procedures) -> pd.DataFrame:
+    """Número de procedures repetidos, únicos e idénticos de cada archivo"""
+    df_resumen = tabla_procedures(_todos_los_procedures).groupby('Archivo', sort=False, observed=True).agg(**{
+        'Procedures Repetidos': ('repetido', 'sum'),
+        'Total': ('repetido', 'size'),
+        'Repetidos Idénticos': ('identico', 'sum')
+    }).reset_index()
+    df_resumen['Archivo'] = df_resumen['Archivo'].astype(str)
+    df_resumen['Procedures Únicos'] = df_resumen['Total'] - df_resumen['Procedures Repetidos']
+    return df_resumen[['Archivo', 'Procedures Repetidos', 'Procedures Únicos', 'Total', 'Repetidos Idénticos']]
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_metricas(version_analisis: str, _df_resumen: pd.DataFrame) -> dict:
+    """Totales del análisis a partir del resumen por archivo"""
+    return {
+        'archivos': _df_resumen['Archivo'].tolist(),
+        'total_archivos': len(_df_resumen),
+        'total_procedures': int(_df_resumen['Total'].sum()),
+        'procedures_repetidos': int(_df_resumen['Procedures Repetidos'].sum()),
+        'procedures_unicos': int(_df_resumen['Procedures Únicos'].sum()),
+        'procedures_identicos': int(_df_resumen['Repetidos Idénticos'].sum())
+    }
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def calcular_resumen_por_repositorio(version_analisis: str, _todos_los_procedures) -> pd.DataFrame:
+    """Procedures repetidos y únicos y archivos en que aparece cada repositorio"""
+    df_repositorios = tabla_procedures(_todos_los_procedures, con_repositorios=True).groupby(
+        'Repositorio', sort=False, observed=True).agg(**{
+            'Procedures Repetidos': ('repetido', 'sum'),
+            'Total': ('repetido', 'size'),
+            'Archivos': ('Archivo', 'nunique')
+        }).reset_index()
+    df_repositorios['Repositorio'] = df_repositorios['Repositorio'].astype(str)
+    df_repositorios['Procedures Únicos'] = df_repositorios['Total'] - df_repositorios['Procedures Repetidos']
+    return df_repositorios[['Repositorio', 'Procedures Repetidos', 'Procedures Únicos', 'Archivos', 'Total']].sort_values(
+        'Total', ascending=False, ignore_index=True)
+
+def crear_figura_barras(etiquetas, repetidos, unicos, titulo: str, eje_x: str) -> go.Figure:
+    """Barras apiladas de procedures repetidos y únicos"""
+    import plotly.graph_objects as go
     fig = go.Figure()
     
     fig.add_trace(go.Bar(
         name='Procedures Repetidos',
-        x=df_resumen['Archivo'],
-        y=df_resumen['Procedures Repetidos'],
+        x=etiquetas,
+        y=repetidos,
         marker_color='#FF6B6B'
     ))
     
     fig.add_trace(go.Bar(
         name='Procedures Únicos',
-        x=df_resumen['Archivo'],
-        y=df_resumen['Procedures Únicos'],
+        x=etiquetas,
+        y=unicos,
         marker_color='#4ECDC4'
     ))
     
     fig.update_layout(
-        title='Distribución de Procedures por Archivo',
-        xaxis_title='Archivos',
+        title=titulo,
+        xaxis_title=eje_x,
         yaxis_title='Número de Procedures',
         barmode='stack',
         height=500
     )
     
+    return fig
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def crear_figura_resumen(version_analisis: str, _df_resumen: pd.DataFrame) -> go.Figure:
+    return crear_figura_barras(_df_resumen['Archivo'], _df_resumen['Procedures Repetidos'],
+                               _df_resumen['Procedures Únicos'],
+                               'Distribución de Procedures por Archivo', 'Archivos')
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def crear_figura_top_archivos(version_analisis: str, top_n: int, _df_resumen: pd.DataFrame) -> go.Figure:
+    """Los top_n archivos con más procedures y una barra 'Otros' con la suma del resto"""
+    df_top = _df_resumen.nlargest(top_n, 'Total')
+    etiquetas = df_top['Archivo'].tolist()
+    repetidos = df_top['Procedures Repetidos'].tolist()
+    unicos = df_top['Procedures Únicos'].tolist()
+    
+    resto = len(_df_resumen) - len(df_top)
+    if resto > 0:
+        df_resto = _df_resumen.drop(df_top.index)
+        etiquetas.append(f'Otros ({resto} archivos)')
+        repetidos.append(int(df_resto['Procedures Repetidos'].sum()))
+        unicos.append(int(df_resto['Procedures Únicos'].sum()))
+    
+    return crear_figura_barras(etiquetas, repetidos, unicos,
+                               f'Top {len(df_top)} archivos por número de procedures', 'Archivos')
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def crear_figura_repositorios(version_analisis: str, _df_repositorios: pd.DataFrame) -> go.Figure:
+    fig = crear_figura_barras(_df_repositorios['Repositorio'], _df_repositorios['Procedures Repetidos'],
+                              _df_repositorios['Procedures Únicos'],
+                              'Procedures por Repositorio', 'Repositorios')
+    fig.update_traces(customdata=_df_repositorios['Archivos'],
+                      hovertemplate='%{x}<br>%{y} procedures<br>%{customdata} archivos')
+    return fig
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def crear_figura_histograma(version_analisis: str, _df_resumen: pd.DataFrame) -> go.Figure:
+    """Histograma del número de procedures por archivo, agregado en el servidor"""
+    import numpy as np
+    import plotly.graph_objects as go
+    totales = _df_resumen['Total'].to_numpy()
+    bins = max(1, min(50, len(np.unique(totales))))
+    conteos, bordes = np.histogram(totales, bins=bins)
+    
+    fig = go.Figure(go.Bar(
+        x=(bordes[:-1] + bordes[1:]) / 2,
+        y=conteos,
+        width=np.diff(bordes),
+        customdata=np.stack([bordes[:-1], bordes[1:]], axis=-1),
+        hovertemplate='%{customdata[0]:.0f} - %{customdata[1]:.0f} procedures<br>%{y} archivos<extra></extra>',
+        marker_color='#4ECDC4'
+    ))
+    
+    fig.update_layout(
+        title='Archivos según su número de procedures',
+        xaxis_title='Procedures por archivo',
+        yaxis_title='Número de Archivos',
+        bargap=0.05,
+        height=500
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def crear_figura_dispersion(version_analisis: str, _df_resumen: pd.DataFrame) -> go.Figure:
+    """Un punto por archivo dibujado con WebGL, usable con miles de archivos"""
+    import plotly.graph_objects as go
+    fig = go.Figure(go.Scattergl(
+        x=_df_resumen['Total'],
+        y=_df_resumen['Procedures Repetidos'],
+        mode='markers',
+        text=_df_resumen['Archivo'],
+        hovertemplate='%{text}<br>%{x} procedures<br>%{y} repetidos<extra></extra>',
+        marker=dict(size=6, color='#FF6B6B', opacity=0.6)
+    ))
+    
+    fig.update_layout(
+        title='Procedures repetidos frente al total por archivo',
+        xaxis_title='Total de Procedures',
+        yaxis_title='Procedures Repetidos',
+        height=500
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def crear_figura_archivo(archivo: str, repetidos: int, unicos: int) -> go.Figure:
+    import plotly.graph_objects as go
+    fig = go.Figure(data=[go.Pie(
+        labels=['Procedures Repetidos', 'Procedures Únicos'],
+        values=[repetidos, unicos],
+        hole=0.3,
+        marker_colors=['#FF6B6B', '#4ECDC4']
+    )])
+    
+    fig.update_layout(
+        title=f'Distribución de Procedures en {archivo}',
+        height=400
+    )
+    
+    return fig
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def indexar_procedures_archivo(version_analisis: str, archivo: str, _procedures) -> dict:
+    """
+    Listas y filtros de los procedures de un archivo, calculados una sola vez por análisis
+    
+    Returns:
+        dict: 'repetidos' y 'unicos' (nombres), 'por_modificador' y 'por_repositorio'
+            (valor -> conjunto de nombres) y 'tabla' (DataFrame indexado por nombre)
+    """
+    import pandas as pd
+    repetidos = []
+    unicos = []
+    por_modificador = {}
+    por_repositorio = {}
+    filas = []
+    
+    for nombre_procedure, info in _procedures.items():
+        (repetidos if info['estado'] == 'REPETIDO' else unicos).append(nombre_procedure)
+        modificadores = sorted({aparicion['modificador'] for aparicion in info['apariciones']})
+        for modificador in modificadores:
+            por_modificador.setdefault(modificador, set()).add(nombre_procedure)
+        for repositorio in info['repositorios']:
+            por_repositorio.setdefault(repositorio, set()).add(nombre_procedure)
+        filas.append({
+            'Procedure': nombre_procedure,
+            'Estado': info['estado'],
+            'Contenido': info['contenido'],
+            'Repositorios': info['total_repositorios'],
+            'Modificadores': ', '.join(modificadores)
+        })
+    
+    return {
+        'repetidos': repetidos,
+        'unicos': unicos,
+        'por_modificador': por_modificador,
+        'por_repositorio': por_repositorio,
+        'tabla': pd.DataFrame(filas, columns=['Procedure', 'Estado', 'Contenido', 'Repositorios',
+                                              'Modificadores']).set_index('Procedure', drop=False)
+    }
+
+def crear_grafico_resumen(version_analisis: str, df_resumen: pd.DataFrame):
+    st.header("📊 Resumen Visual")
+    
+    if df_resumen.empty:
+        st.warning("No hay datos para mostrar en el gráfico")
+        return
+    
+    modos = [MODO_GRAFICO_TOP, MODO_GRAFICO_REPOSITORIOS, MODO_GRAFICO_HISTOGRAMA, MODO_GRAFICO_DISPERSION]
+    if len(df_resumen) <= MAX_ARCHIVOS_GRAFICO:
+        modos.insert(0, MODO_GRAFICO_TODOS)
+    
+    modo = st.radio("Tipo de gráfico", modos, horizontal=True, key="modo_grafico_resumen")
+    
+    if modo == MODO_GRAFICO_TODOS:
+        fig = crear_figura_resumen(version_analisis, df_resumen)
+    elif modo == MODO_GRAFICO_TOP:
+        top_n = st.slider("Número de archivos", min_value=5, max_value=100,
+                          value=TOP_ARCHIVOS_GRAFICO, step=5, key="top_archivos_grafico")
+        fig = crear_figura_top_archivos(version_analisis, top_n, df_resumen)
+    elif modo == MODO_GRAFICO_REPOSITORIOS:
+        df_repositorios = calcular_resumen_por_repositorio(version_analisis, st.session_state.todos_los_procedures)
+        fig = crear_figura_repositorios(version_analisis, df_repositorios)
+    elif modo == MODO_GRAFICO_HISTOGRAMA:
+        fig = crear_figura_histograma(version_analisis, df_resumen)
+    else:
+        fig = crear_figura_dispersion(version_analisis, df_resumen)
+    
+    if len(df_resumen) > MAX_ARCHIVOS_GRAFICO:
+        st.caption(f"{len(df_resumen)} archivos: el gráfico con una barra por archivo solo está disponible "
+                   f"hasta {MAX_ARCHIVOS_GRAFICO}")
+    
     st.plotly_chart(fig, use_container_width=True)
 
-def mostrar_detalles_archivo_mejorado(archivo, procedures):
+def mostrar_lista_procedures(archivo, procedures, nombres: list, indice_archivo: dict, clave: str, icono: str):
+    """
+    Procedures de una pestaña, filtrados por modificador y repositorio
+    
+    Solo se crean widgets para una página de procedures o, en la vista de tabla, para el
+    procedure seleccionado, así que el coste de cada rerun no depende del tamaño del archivo.
+    """
+    col1, col2, col3 = st.columns([1, 1, 1])
+    modificador = col1.selectbox("Modificador:", ["Todos"] + sorted(indice_archivo['por_modificador']),
+                                 key=f"filtro_modificador_{clave}_{archivo}")
+    repositorio = col2.selectbox("Repositorio:", ["Todos"] + sorted(indice_archivo['por_repositorio']),
+                                 key=f"filtro_repositorio_{clave}_{archivo}")
+    vista = col3.radio("Vista:", [VISTA_PAGINAS, VISTA_TABLA], horizontal=True,
+                       key=f"vista_{clave}_{archivo}")
+    
+    filtros = []
+    if modificador != "Todos":
+        filtros.append(indice_archivo['por_modificador'][modificador])
+    if repositorio != "Todos":
+        filtros.append(indice_archivo['por_repositorio'][repositorio])
+    if filtros:
+        nombres = [nombre for nombre in nombres if all(nombre in filtro for filtro in filtros)]
+    
+    if not nombres:
+        st.info("Ningún procedure cumple los filtros")
+        return
+    
+    if vista == VISTA_TABLA:
+        seleccion = st.dataframe(
+            indice_archivo['tabla'].loc[nombres],
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key=f"tabla_{clave}_{archivo}"
+        )
+        filas_seleccionadas = seleccion.selection.rows
+        if filas_seleccionadas:
+            nombre_procedure = nombres[filas_seleccionadas[0]]
+            mostrar_procedure_con_descripcion(
+                nombre_procedure=nombre_procedure,
+                info_procedure=procedures[nombre_procedure],
+                archivo_nombre=archivo,
+                icono=icono
+            )
+        else:
+            st.caption("Selecciona una fila para ver el detalle del procedure")
+        return
+    
+    total_paginas = (len(nombres) - 1) // TAMAÑO_PAGINA_PROCEDURES + 1
+    pagina = 1
+    if total_paginas > 1:
+        pagina = st.number_input(f"Página (de {total_paginas}):", min_value=1, max_value=total_paginas,
+                                 value=1, step=1, key=f"pagina_{clave}_{archivo}")
+    inicio = (pagina - 1) * TAMAÑO_PAGINA_PROCEDURES
+    procedures_pagina = {nombre: procedures[nombre]
+                         for nombre in nombres[inicio:inicio + TAMAÑO_PAGINA_PROCEDURES]}
+    
+    st.caption(f"Procedures {inicio + 1}-{inicio + len(procedures_pagina)} de {len(nombres)}")
+    mostrar_boton_describir_visibles(procedures_pagina, archivo, clave)
+    
+    for nombre_procedure, info in procedures_pagina.items():
+        mostrar_procedure_con_descripcion(
+            nombre_procedure=nombre_procedure,
+            info_procedure=info,
+            archivo_nombre=archivo,
+            icono=icono
+        )
+
+def mostrar_detalles_archivo_mejorado(archivo, procedures, version_analisis: str):
     
     st.subheader(f"📄 {archivo}")
     
+    indice_archivo = indexar_procedures_archivo(version_analisis, archivo, procedures)
+    nombres_repetidos = indice_archivo['repetidos']
+    nombres_unicos = indice_archivo['unicos']
+    
     tab1, tab2, tab3 = st.tabs(["🔄 Procedures Repetidos", "⭐ Procedures Únicos", "📊 Visualización"])
     
     with tab1:
-        procedures_repetidos = {k: v for k, v in procedures.items() if v['estado'] == 'REPETIDO'}
-        
-        if procedures_repetidos:
-            st.info(f"📊 **{len(procedures_repetidos)} procedures repetidos encontrados**")
-            
-            for nombre_procedure, info in procedures_repetidos.items():
-                mostrar_procedure_con_descripcion(
-                    nombre_procedure=nombre_procedure,
-                    info_procedure=info,
-                    archivo_nombre=archivo,
-                    icono="🔄"
-                )
+        if nombres_repetidos:
+            st.info(f"📊 **{len(nombres_repetidos)} procedures repetidos encontrados**")
+            mostrar_lista_procedures(archivo, procedures, nombres_repetidos, indice_archivo, "repetidos", "🔄")
         else:
             st.info("No hay procedures repetidos en este archivo")
     
     with tab2:
-        procedures_unicos = {k: v for k, v in procedures.items() if v['estado'] == 'ÚNICO'}
-        
-        if procedures_unicos:
-            st.info(f"📊 **{len(procedures_unicos)} procedures únicos encontrados**")
-            
-            for nombre_procedure, info in procedures_unicos.items():
-                mostrar_procedure_con_descripcion(
-                    nombre_procedure=nombre_procedure,
-                    info_procedure=info,
-                    archivo_nombre=archivo,
-                    icono="⭐"
-                )
+        if nombres_unicos:
+            st.info(f"📊 **{len(nombres_unicos)} procedures únicos encontrados**")
+            mostrar_lista_procedures(archivo, procedures, nombres_unicos, indice_archivo, "unicos", "⭐")
         else:
             st.info("No hay procedures únicos en este archivo")
     
     with tab3:
-        repetidos = sum(1 for c in procedures.values() if c['estado'] == 'REPETIDO')
-        unicos = sum(1 for c in procedures.values() if c['estado'] == 'ÚNICO')
+        repetidos = len(nombres_repetidos)
+        unicos = len(nombres_unicos)
         
         if repetidos + unicos > 0:
-            fig = go.Figure(data=[go.Pie(
-                labels=['Procedures Repetidos', 'Procedures Únicos'],
-                values=[repetidos, unicos],
-                hole=0.3,
-                marker_colors=['#FF6B6B', '#4ECDC4']
-            )])
-            
-            fig.update_layout(
-                title=f'Distribución de Procedures en {archivo}',
-                height=400
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(crear_figura_archivo(archivo, repetidos, unicos), use_container_width=True)
         else:
             st.info("No hay datos suficientes para crear el gráfico")
 
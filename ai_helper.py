@@ -1,72 +1,341 @@
-import google.generativeai as genai
-import streamlit as st
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+import importlib.util
+import json
+import logging
 import os
+import random
+import threading
+import time
+
+from cache_contenido import cache_contenido
+from cache_ia import CacheIA
+
+MODELO_IA = 'gemini-2.0-flash'
+
+# Valores de AIHelper.estado_configuracion()
+ESTADO_SIN_VERIFICAR = 'sin_verificar'
+ESTADO_CONECTADA = 'conectada'
+ESTADO_ERROR = 'error'
+
+logger = logging.getLogger(__name__)
+
+# Excepciones de google.api_core que indican cuota agotada o un fallo temporal del servicio
+EXCEPCIONES_REINTENTABLES = ('TooManyRequests', 'ResourceExhausted', 'InternalServerError',
+                             'ServiceUnavailable', 'DeadlineExceeded')
+# Códigos HTTP equivalentes, para excepciones que solo traen el atributo 'code'
+CODIGOS_REINTENTABLES = (429, 500, 503, 504)
+# Fragmentos del mensaje que se usan si la excepción no trae tipo ni código reconocibles
+ERRORES_REINTENTABLES = ('429', 'resource exhausted', 'resourceexhausted', 'quota', 'rate limit',
+                         '500', '503', 'unavailable', 'deadline exceeded', 'timeout')
+
+@lru_cache(maxsize=None)
+def _tipos_reintentables() -> tuple:
+    """Clases de EXCEPCIONES_REINTENTABLES, o una tupla vacía si google.api_core no está instalado"""
+    try:
+        from google.api_core import exceptions
+    except ImportError:
+        return ()
+    return tuple(getattr(exceptions, nombre) for nombre in EXCEPCIONES_REINTENTABLES if hasattr(exceptions, nombre))
+
+def es_error_reintentable(error: Exception) -> bool:
+    """
+    Indica si un error de la API justifica reintentar la petición
+
+    Se decide por el tipo de la excepción (google.api_core o errores de red) o por su
+    código HTTP; el texto del mensaje solo se mira si no trae ninguno de los dos.
+    """
+    if isinstance(error, _tipos_reintentables() + (TimeoutError, ConnectionError)):
+        return True
+    codigo = getattr(error, 'code', None)
+    if isinstance(codigo, int):
+        return codigo in CODIGOS_REINTENTABLES
+    texto = f"{type(error).__name__} {error}".lower()
+    return any(fragmento in texto for fragmento in ERRORES_REINTENTABLES)
+
+# Aproximación habitual para código: unos 4 caracteres por token
+CARACTERES_POR_TOKEN = 4
+
+def recortar_a_presupuesto(texto: str, presupuesto_tokens: int) -> str:
+    """Recorta el texto al presupuesto de tokens, cortando en un salto de línea si es posible"""
+    max_caracteres = presupuesto_tokens * CARACTERES_POR_TOKEN
+    if len(texto) <= max_caracteres:
+        return texto
+    
+    recortado = texto[:max_caracteres]
+    ultimo_salto = recortado.rfind('\n')
+    if ultimo_salto > max_caracteres // 2:
+        recortado = recortado[:ultimo_salto]
+    return recortado + "\n// ... (recortado)"
+
+def genai_instalado() -> bool:
+    """Indica si google.generativeai está instalado, sin importarlo"""
+    try:
+        return importlib.util.find_spec('google.generativeai') is not None
+    except ModuleNotFoundError:
+        return False
 
 class AIHelper:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[CacheIA] = None, model=None,
+                 max_reintentos: int = 5, espera_inicial: float = 1.0,
+                 presupuesto_tokens_procedure: int = 400, presupuesto_tokens_archivo: int = 1500):
         self.api_key = api_key
-        self.model = None
-        self._configure_ai()
+        self.presupuesto_tokens_procedure = presupuesto_tokens_procedure
+        self.presupuesto_tokens_archivo = presupuesto_tokens_archivo
+        self.model_name = MODELO_IA
+        self._model = model
+        self._configurado = model is not None
+        self.error_configuracion = None
+        self._lock_configuracion = threading.Lock()
+        self.cache = cache
+        self.max_reintentos = max_reintentos
+        self.espera_inicial = espera_inicial
+    
+    @property
+    def model(self):
+        """Modelo de IA; google.generativeai se importa y configura la primera vez que se usa"""
+        if not self._configurado:
+            with self._lock_configuracion:
+                if not self._configurado:
+                    self._configure_ai()
+                    self._configurado = True
+        return self._model
     
     def _configure_ai(self):
         try:
+            import google.generativeai as genai
             genai.configure(api_key=self.api_key)
-            self.model = genai.GenerativeModel('gemini-2.0-flash')
+            self._model = genai.GenerativeModel(self.model_name)
         except Exception as e:
-            st.error(f"Error al configurar IA: {str(e)}")
-            self.model = None
+            # El cliente se comparte entre sesiones: el error se guarda para que todas lo muestren
+            logger.error("❌ Error al configurar IA: %s", e)
+            self.error_configuracion = str(e)
+            self._model = None
+    
+    def _generar(self, prompt: str) -> str:
+        """
+        Envía el prompt al modelo, reutilizando la respuesta de la cache persistente si existe
+        
+        Solo se guardan en cache las respuestas correctas; los errores se propagan.
+        """
+        if self.cache is not None:
+            respuesta = self.cache.obtener(self.model_name, prompt)
+            if respuesta is not None:
+                return respuesta
+        
+        respuesta = self._llamar_modelo(prompt)
+        
+        if self.cache is not None:
+            self.cache.guardar(self.model_name, prompt, respuesta)
+        return respuesta
+    
+    def _llamar_modelo(self, prompt: str) -> str:
+        """
+        Llama al modelo reintentando con espera exponencial si se alcanza el límite de peticiones
+        
+        Los errores que no son de cuota o temporales se propagan sin reintentar.
+        """
+        for intento in range(self.max_reintentos + 1):
+            try:
+                response = self.model.generate_content(prompt)
+                return response.text.strip()
+            except Exception as e:
+                if intento == self.max_reintentos or not es_error_reintentable(e):
+                    raise
+                espera = self.espera_inicial * (2 ** intento) * (0.5 + random.random())
+                time.sleep(espera)
     
     def leer_contenido_archivo(self, ruta_archivo: str) -> Optional[str]:
         try:
-            with open(ruta_archivo, 'r', encoding='utf-8') as archivo:
-                return archivo.read()
+            return cache_contenido.leer(ruta_archivo)
         except Exception as e:
-            print(f"Error leyendo archivo {ruta_archivo}: {str(e)}")
+            logger.error("❌ Error leyendo archivo %s: %s", ruta_archivo, e)
             return None
     
-    def get_procedure_analysis(self, nombre_procedure: str, linea_procedure: str, ruta_archivo: str = None, numero_linea: int = None) -> str:
-        
-        if not self.model:
-            return "❌ IA no disponible"
+    def _construir_contexto_procedure(self, ruta_archivo: str = None, numero_linea: int = None,
+                                      linea_fin: int = None) -> str:
+        """
+        Obtiene el código del procedure para el prompt
         
-        try:
-            contexto_basico = f"Procedure: {linea_procedure}"
-            
-            contexto_adicional = ""
-            if ruta_archivo and numero_linea:
-                contenido_archivo = self.leer_contenido_archivo(ruta_archivo)
-                if contenido_archivo:
-                    lineas = contenido_archivo.split('\n')
-                    # Obtener algunas líneas del procedure (desde la línea del procedure hasta unas líneas después)
-                    inicio = max(0, numero_linea - 1)  
-                    fin = min(len(lineas), numero_linea + 100)  
-                    
-                    contexto_adicional = "\n".join(lineas[inicio:fin])
-            
-            if contexto_adicional:
-                prompt = f"""Analiza este procedure de Business Central AL y describe brevemente qué hace en menos de 40 palabras:
+        Se envía el cuerpo exacto (de la cabecera al 'end;' que lo cierra) recortado al
+        presupuesto de tokens. Si no llega 'linea_fin' (procedures extraídos sin cuerpo)
+        se delimita aquí; si aun así no se encuentra el procedure en esa línea se
+        mantiene el comportamiento anterior de 100 líneas recortadas a 500 caracteres.
+        """
+        contexto_adicional = ""
+        if ruta_archivo and numero_linea:
+            try:
+                contenido_archivo = cache_contenido.obtener(ruta_archivo)
+            except Exception as e:
+                logger.error("❌ Error leyendo archivo %s: %s", ruta_archivo, e)
+                contenido_archivo = None
+            if contenido_archivo:
+                if not linea_fin:
+                    from tablesScript import buscar_linea_fin
+                    linea_fin = buscar_linea_fin(contenido_archivo.texto, numero_linea)
+                if linea_fin and linea_fin >= numero_linea:
+                    cuerpo = contenido_archivo.lineas(numero_linea - 1, linea_fin)
+                    return recortar_a_presupuesto(cuerpo, self.presupuesto_tokens_procedure)
+                
+                # Obtener algunas líneas del procedure (desde la línea del procedure hasta unas líneas después)
+                # usando los offsets de línea de la cache, sin partir el archivo completo
+                contexto_adicional = contenido_archivo.lineas(numero_linea - 1, numero_linea + 100)
+        return contexto_adicional[:500]
+    
+    def _construir_prompt_procedure(self, nombre_procedure: str, linea_procedure: str, contexto_adicional: str) -> str:
+        if contexto_adicional:
+            return f"""Analiza este procedure de Business Central AL y describe brevemente qué hace en menos de 40 palabras:
 
 Nombre: {nombre_procedure}
 Línea: {linea_procedure}
 
 Contexto del código:
-{contexto_adicional[:500]}
+{contexto_adicional}
 
 Responde SOLO la funcionalidad, sin explicaciones técnicas adicionales."""
-            else:
-                prompt = f"""Basándote en esta línea de procedure de Business Central AL, describe brevemente qué hace en menos de 30 palabras:
+        
+        return f"""Basándote en esta línea de procedure de Business Central AL, describe brevemente qué hace en menos de 30 palabras:
 
 {linea_procedure}
 
 Responde SOLO la funcionalidad principal."""
+    
+    def get_procedure_analysis(self, nombre_procedure: str, linea_procedure: str, ruta_archivo: str = None, numero_linea: int = None,
+                               linea_fin: int = None) -> str:
+        
+        if not self.model:
+            return "❌ IA no disponible"
+        
+        try:
+            contexto_adicional = self._construir_contexto_procedure(ruta_archivo, numero_linea, linea_fin)
+            prompt = self._construir_prompt_procedure(nombre_procedure, linea_procedure, contexto_adicional)
             
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generar(prompt)
             
         except Exception as e:
             return f"❌ Error: {str(e)[:50]}..."
     
+    def get_procedures_analysis_batch(self, procedures: List[dict], procedures_por_prompt: int = 10,
+                                      max_concurrentes: int = 4) -> List[str]:
+        """
+        Describe varios procedures agrupándolos en prompts y enviando los grupos en paralelo
+        
+        Cada procedure se busca primero en la cache con el mismo prompt que usaría
+        get_procedure_analysis, así que ambos caminos comparten las respuestas guardadas.
+        
+        Args:
+            procedures (list): Diccionarios con 'nombre_procedure', 'linea_procedure' y,
+                opcionalmente, 'ruta_archivo', 'numero_linea' y 'linea_fin'
+            procedures_por_prompt (int): Procedures empaquetados en cada petición
+            max_concurrentes (int): Peticiones en vuelo como máximo
+            
+        Returns:
+            list: Descripciones en el mismo orden que 'procedures'
+        """
+        if not self.model:
+            return ["❌ IA no disponible"] * len(procedures)
+        
+        descripciones = [None] * len(procedures)
+        pendientes = []
+        
+        for indice, procedure in enumerate(procedures):
+            try:
+                contexto = self._construir_contexto_procedure(
+                    procedure.get('ruta_archivo'), procedure.get('numero_linea'), procedure.get('linea_fin')
+                )
+                prompt = self._construir_prompt_procedure(procedure['nombre_procedure'], procedure['linea_procedure'], contexto)
+            except Exception as e:
+                descripciones[indice] = f"❌ Error: {str(e)[:50]}..."
+                continue
+            
+            respuesta = self.cache.obtener(self.model_name, prompt) if self.cache is not None else None
+            if respuesta is not None:
+                descripciones[indice] = respuesta
+            else:
+                pendientes.append((indice, procedure, contexto, prompt))
+        
+        lotes = [pendientes[i:i + procedures_por_prompt] for i in range(0, len(pendientes), procedures_por_prompt)]
+        
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrentes)) as executor:
+            for resultados_lote in executor.map(self._describir_lote, lotes):
+                for indice, descripcion in resultados_lote:
+                    descripciones[indice] = descripcion
+        
+        return descripciones
+    
+    def _describir_lote(self, lote: list) -> List[tuple]:
+        """
+        Describe un lote de procedures con un único prompt y reparte la respuesta
+        
+        Si la petición del lote falla, todo el lote se marca como error: repetirla
+        procedure a procedure solo multiplicaría las peticiones contra una cuota ya
+        agotada. Únicamente los procedures que falten en una respuesta que sí llegó (o
+        que no se pudo interpretar) se piden por separado.
+        """
+        if len(lote) == 1:
+            indice, _, _, prompt = lote[0]
+            try:
+                return [(indice, self._generar(prompt))]
+            except Exception as e:
+                return [(indice, f"❌ Error: {str(e)[:50]}...")]
+        
+        bloques = []
+        for numero, (_, procedure, contexto, _) in enumerate(lote, 1):
+            bloques.append(f"""### {numero}
+Nombre: {procedure['nombre_procedure']}
+Línea: {procedure['linea_procedure']}
+Contexto del código:
+{contexto or '(sin contexto)'}""")
+        
+        prompt_lote = f"""Analiza estos {len(lote)} procedures de Business Central AL y describe brevemente qué hace cada uno en menos de 40 palabras.
+
+{chr(10).join(bloques)}
+
+Responde SOLO con un objeto JSON cuyas claves sean los números de cada procedure ("1", "2", ...) y cuyos valores sean la funcionalidad de cada uno, sin explicaciones técnicas adicionales."""
+        
+        try:
+            respuestas = self._separar_respuesta_lote(self._llamar_modelo(prompt_lote))
+        except Exception as e:
+            error = f"❌ Error: {str(e)[:50]}..."
+            return [(indice, error) for indice, _, _, _ in lote]
+        
+        resultados = []
+        error_cuota = None
+        for numero, (indice, _, _, prompt) in enumerate(lote, 1):
+            descripcion = respuestas.get(str(numero))
+            if error_cuota is not None and not descripcion:
+                resultados.append((indice, error_cuota))
+                continue
+            try:
+                if descripcion:
+                    descripcion = str(descripcion).strip()
+                    if self.cache is not None:
+                        self.cache.guardar(self.model_name, prompt, descripcion)
+                else:
+                    # El modelo no devolvió este procedure: se pide por separado
+                    descripcion = self._generar(prompt)
+            except Exception as e:
+                descripcion = f"❌ Error: {str(e)[:50]}..."
+                if es_error_reintentable(e):
+                    # _generar ya agotó los reintentos: el resto del lote no se pide
+                    error_cuota = descripcion
+            resultados.append((indice, descripcion))
+        return resultados
+    
+    @staticmethod
+    def _separar_respuesta_lote(texto: str) -> dict:
+        """Extrae el objeto JSON de la respuesta de un lote (admite bloques ```json)"""
+        inicio = texto.find('{')
+        fin = texto.rfind('}')
+        if inicio == -1 or fin <= inicio:
+            return {}
+        try:
+            respuestas = json.loads(texto[inicio:fin + 1])
+        except ValueError:
+            return {}
+        return respuestas if isinstance(respuestas, dict) else {}
+    
     def get_code_analysis_from_file(self, ruta_archivo: str, nombre_archivo: str) -> str:
         """
         Analiza un archivo leyendo su contenido desde el disco
@@ -98,8 +367,7 @@ Responde SOLO la funcionalidad principal."""
 Enfócate en su funcionalidad principal y propósito.
 Sé conciso y específico."""
             
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generar(prompt)
         except Exception as e:
             return f"❌ Error al generar descripción: {str(e)}"
     
@@ -109,12 +377,12 @@ Sé conciso y específico."""
         
         try:
             if contenido_codigo:
-                contenido_limitado = contenido_codigo[:2000] if len(contenido_codigo) > 2000 else contenido_codigo
+                contenido_limitado = recortar_a_presupuesto(contenido_codigo, self.presupuesto_tokens_archivo)
                 
                 prompt = f"""Analiza este código del archivo '{archivo}' y describe brevemente su funcionalidad principal:
 
 Código:
-{contenido_codigo}
+{contenido_limitado}
 
 Respuesta en menos de 150 palabras."""
             else:
@@ -125,17 +393,36 @@ Respuesta en menos de 150 palabras."""
 
 Respuesta en menos de 80 palabras."""
             
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            return self._generar(prompt)
         except Exception as e:
             return f"❌ Error al generar análisis: {str(e)}"
     
     def is_available(self) -> bool:
+        """
+        Indica si la IA se puede usar, configurando el modelo si aún no se ha intentado
+
+        Para mostrar el estado sin importar google.generativeai, usar estado_configuracion().
+        """
         return self.model is not None
 
-def create_ai_helper(api_key: str) -> AIHelper:
+    def estado_configuracion(self) -> str:
+        """
+        Estado de la configuración del modelo, sin configurarlo
+
+        Returns:
+            str: ESTADO_CONECTADA si se configuró correctamente, ESTADO_ERROR si falló (el
+                motivo queda en error_configuracion) o no puede funcionar, y
+                ESTADO_SIN_VERIFICAR mientras no se haya usado
+        """
+        if self._configurado:
+            return ESTADO_CONECTADA if self._model is not None else ESTADO_ERROR
+        if not self.api_key or not genai_instalado():
+            return ESTADO_ERROR
+        return ESTADO_SIN_VERIFICAR
+
+def create_ai_helper(api_key: str, cache: Optional[CacheIA] = None) -> AIHelper:
   
-    return AIHelper(api_key)
+    return AIHelper(api_key, cache=cache)
 
 def get_quick_description(archivo: str, api_key: str) -> str:
     ai_helper = AIHelper(api_key)
@@ -0,0 +1,144 @@
+"""
+Tiempo de importación de los módulos del dashboard en un intérprete nuevo
+
+Cada repetición lanza 'python -X importtime -c "import MODULO"' desde la raíz del
+repositorio, como hace Streamlit al abrir el script, y lee el informe de importtime:
+el tiempo acumulado del módulo y de cada una de sus importaciones directas. También
+se mide el tiempo total del proceso frente a un intérprete que no importa nada. La
+primera ejecución de cada módulo no se cuenta (compila los .pyc).
+
+Los resultados se escriben en JSON (--salida) con el commit y el mínimo y la mediana
+de cada módulo. Con --comparar se muestra la relación con otro JSON generado por este
+script, por ejemplo en el commit anterior.
+
+Uso:
+    python benchmarks/bench_arranque.py [--modulos Dashboard ai_helper tablesScript]
+        [--repeticiones 5] [--top 10] [--salida bench_arranque.json] [--comparar anterior.json]
+"""
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_pipeline import obtener_commit
+
+RAIZ_REPOSITORIO = Path(__file__).resolve().parent.parent
+MODULOS = ['Dashboard', 'ai_helper', 'tablesScript']
+# import time: self [us] | cumulative | imported package
+PATRON_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( +)(\S+)$')
+
+
+def ejecutar(codigo: str) -> tuple:
+    """
+    Ejecuta 'codigo' en un intérprete nuevo con -X importtime
+
+    Returns:
+        tuple: (segundos del proceso, stderr, código de salida)
+    """
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ_REPOSITORIO,
+                             capture_output=True, text=True)
+    return time.perf_counter() - inicio, proceso.stderr, proceso.returncode
+
+
+def leer_importtime(salida: str, modulo: str) -> tuple:
+    """
+    Interpreta el informe de -X importtime
+
+    Returns:
+        tuple: (microsegundos acumulados del módulo, {importación directa: microsegundos acumulados})
+    """
+    acumulado = None
+    directas = {}
+    for linea in salida.splitlines():
+        coincidencia = PATRON_IMPORTTIME.match(linea)
+        if coincidencia is None:
+            continue
+        _, cumulativo, sangria, nombre = coincidencia.groups()
+        # El módulo pedido no lleva sangría extra; sus importaciones directas, dos espacios
+        if len(sangria) == 1 and nombre == modulo:
+            acumulado = int(cumulativo)
+        elif len(sangria) == 3:
+            directas[nombre] = int(cumulativo)
+    return acumulado, directas
+
+
+def medir_modulo(modulo: str, repeticiones: int, segundos_base: float) -> dict:
+    """Mínimo y mediana del tiempo de importación de un módulo y de sus importaciones directas"""
+    _, salida, codigo = ejecutar(f"import {modulo}")
+    if codigo != 0:
+        return {'error': salida.strip().splitlines()[-1] if salida.strip() else f"código de salida {codigo}"}
+
+    procesos, importaciones = [], []
+    directas = {}
+    for _ in range(repeticiones):
+        segundos, salida, _ = ejecutar(f"import {modulo}")
+        microsegundos, directas_repeticion = leer_importtime(salida, modulo)
+        procesos.append(segundos - segundos_base)
+        importaciones.append(microsegundos / 1e6)
+        for nombre, valor in directas_repeticion.items():
+            directas.setdefault(nombre, []).append(valor / 1e6)
+
+    return {
+        'minimo': min(importaciones),
+        'mediana': statistics.median(importaciones),
+        'proceso_sobre_base': statistics.median(procesos),
+        'importaciones_directas': {nombre: statistics.median(valores)
+                                   for nombre, valores in sorted(directas.items(),
+                                                                 key=lambda par: -statistics.median(par[1]))}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modulos', nargs='+', default=MODULOS)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="Importaciones directas más lentas a mostrar")
+    parser.add_argument('--salida', default="bench_arranque.json")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    ejecutar("pass")
+    segundos_base = statistics.median(ejecutar("pass")[0] for _ in range(args.repeticiones))
+    modulos = {modulo: medir_modulo(modulo, args.repeticiones, segundos_base) for modulo in args.modulos}
+
+    resultado = {
+        'fecha': datetime.now().isoformat(),
+        'commit': obtener_commit(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': vars(args),
+        'interprete_vacio': segundos_base,
+        'modulos': modulos
+    }
+
+    anterior = {}
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f).get('modulos', {})
+
+    print(f"{'módulo':>14} {'mínimo (s)':>11} {'mediana (s)':>12}" + (f" {'vs anterior':>12}" if anterior else ""))
+    for modulo, valores in modulos.items():
+        if 'error' in valores:
+            print(f"{modulo:>14} ❌ {valores['error']}")
+            continue
+        linea = f"{modulo:>14} {valores['minimo']:>11.3f} {valores['mediana']:>12.3f}"
+        if anterior.get(modulo, {}).get('minimo'):
+            linea += f" {valores['minimo'] / anterior[modulo]['minimo']:>11.2f}x"
+        print(linea)
+        for nombre, segundos in list(valores['importaciones_directas'].items())[:args.top]:
+            print(f"{'':>14}   {segundos:>9.3f}  {nombre}")
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Micro-benchmark del extractor de procedures
+
+Compara la búsqueda línea a línea original con extraer_procedures_de_contenido
+(un único finditer precompilado) sobre codeunits sintéticos grandes. La comparación
+es con la misma salida (solo cabeceras; la referencia conserva además el campo
+linea_completa, copia de 'linea', que el extractor ya no repite) y el script falla si el extractor deja de
+ser al menos tan rápido como la búsqueda original. Se muestra también el tiempo con
+cuerpos=True (rango begin/end y huella de cada procedure), que solo se pide para
+los archivos que lo necesitan.
+
+Uso:
+    python benchmarks/bench_extractor.py [--procedures 5000] [--repeticiones 5]
+"""
+from pathlib import Path
+import argparse
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tablesScript import extraer_procedures_de_contenido
+
+
+def extraer_procedures_por_lineas(contenido):
+    """Implementación de referencia: re.search por cada línea y sufijos desde _2"""
+    procedures = {}
+    for numero_linea, linea in enumerate(contenido.split('\n'), 1):
+        linea_limpia = linea.strip()
+        patron_procedure = r'^\s*(local\s+|internal\s+)?procedure\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\('
+        match = re.search(patron_procedure, linea_limpia, re.IGNORECASE)
+        if match:
+            modificador = match.group(1).strip() if match.group(1) else "public"
+            nombre_procedure = match.group(2)
+            if modificador and modificador.lower() in ['local', 'internal']:
+                modificador = modificador.lower()
+            else:
+                modificador = "public"
+
+            clave_procedure = f"{nombre_procedure}"
+            contador = 1
+            clave_original = clave_procedure
+            while clave_procedure in procedures:
+                contador += 1
+                clave_procedure = f"{clave_original}_{contador}"
+
+            procedures[clave_procedure] = {
+                'linea': linea_limpia,
+                'numero_linea': numero_linea,
+                'nombre': nombre_procedure,
+                'modificador': modificador,
+                'linea_completa': linea_limpia
+            }
+    return procedures
+
+
+def generar_codeunit(total_procedures, sobrecargas=0.2, semilla=42):
+    """Genera el texto de un codeunit AL con 'total_procedures' procedures"""
+    aleatorio = random.Random(semilla)
+    partes = ['codeunit 50100 "Benchmark Codeunit"', '{']
+    nombres = [f"Procedure{i}" for i in range(max(1, total_procedures // 10))]
+    for i in range(total_procedures):
+        nombre = aleatorio.choice(nombres) if aleatorio.random() < sobrecargas else f"Proc{i}"
+        modificador = aleatorio.choice(["", "local ", "internal "])
+        partes.extend([
+            f"    {modificador}procedure {nombre}(Cliente: Record Customer; Importe: Decimal): Boolean",
+            "    var",
+            "        Linea: Record \"Sales Line\";",
+            "    begin",
+            "        // Comentario con la palabra procedure dentro",
+            "        if Cliente.Get(Linea.\"Sell-to Customer No.\") then",
+            "            exit(Importe > 0);",
+            "        exit(false);",
+            "    end;",
+            ""
+        ])
+    partes.append('}')
+    return '\n'.join(partes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procedures', type=int, nargs='+', default=[500, 5000, 20000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'procedures':>10} {'por líneas (ms)':>16} {'finditer (ms)':>14} {'mejora':>7} {'con cuerpos (ms)':>17}")
+    for total in args.procedures:
+        contenido = generar_codeunit(total)
+        referencia = extraer_procedures_por_lineas(contenido)
+        assert all(
+            {campo: procedure[campo] for campo in info} == info
+            for procedure, info in zip(referencia.values(), extraer_procedures_de_contenido(contenido).values())
+        )
+
+        t_lineas = min(timeit.repeat(lambda: extraer_procedures_por_lineas(contenido),
+                                     number=1, repeat=args.repeticiones))
+        t_finditer = min(timeit.repeat(lambda: extraer_procedures_de_contenido(contenido),
+                                       number=1, repeat=args.repeticiones))
+        t_cuerpos = min(timeit.repeat(lambda: extraer_procedures_de_contenido(contenido, cuerpos=True),
+                                      number=1, repeat=args.repeticiones))
+        print(f"{total:>10} {t_lineas * 1000:>16.2f} {t_finditer * 1000:>14.2f} {t_lineas / t_finditer:>6.1f}x"
+              f" {t_cuerpos * 1000:>17.2f}")
+        assert t_lineas / t_finditer >= 1.0, f"El extractor es más lento que la búsqueda por líneas con {total} procedures"
+
+
+if __name__ == "__main__":
+    main()
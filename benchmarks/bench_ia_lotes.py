@@ -0,0 +1,94 @@
+"""
+Benchmark offline de las peticiones de IA en lote
+
+Usa un modelo falso local con latencia fija y límite de peticiones simultáneas
+(responde con un error 429 si se supera) para comparar get_procedure_analysis
+en serie con get_procedures_analysis_batch.
+
+Uso:
+    python benchmarks/bench_ia_lotes.py [--procedures 200] [--latencia 0.05]
+"""
+from pathlib import Path
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ai_helper import AIHelper
+
+
+class RespuestaFalsa:
+    def __init__(self, text):
+        self.text = text
+
+
+class ModeloFalso:
+    """Imita GenerativeModel.generate_content con latencia y límite de concurrencia"""
+
+    def __init__(self, latencia=0.05, max_simultaneas=8):
+        self.latencia = latencia
+        self.max_simultaneas = max_simultaneas
+        self.peticiones = 0
+        self.rechazadas = 0
+        self._en_vuelo = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        with self._lock:
+            self.peticiones += 1
+            if self._en_vuelo >= self.max_simultaneas:
+                self.rechazadas += 1
+                raise RuntimeError("429 Resource exhausted: rate limit")
+            self._en_vuelo += 1
+        try:
+            time.sleep(self.latencia)
+            numeros = re.findall(r'^### (\d+)$', prompt, re.MULTILINE)
+            if numeros:
+                return RespuestaFalsa(json.dumps({n: f"Descripción del procedure {n}" for n in numeros}))
+            return RespuestaFalsa("Descripción del procedure")
+        finally:
+            with self._lock:
+                self._en_vuelo -= 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procedures', type=int, default=200)
+    parser.add_argument('--latencia', type=float, default=0.05)
+    parser.add_argument('--por-prompt', type=int, default=10)
+    parser.add_argument('--concurrentes', type=int, default=4)
+    args = parser.parse_args()
+
+    procedures = [
+        {'nombre_procedure': f"Proc{i}", 'linea_procedure': f"procedure Proc{i}(Importe: Decimal)"}
+        for i in range(args.procedures)
+    ]
+
+    modelo = ModeloFalso(latencia=args.latencia)
+    helper = AIHelper(api_key="", model=modelo, espera_inicial=args.latencia)
+    inicio = time.perf_counter()
+    for procedure in procedures:
+        helper.get_procedure_analysis(procedure['nombre_procedure'], procedure['linea_procedure'])
+    t_serie = time.perf_counter() - inicio
+    print(f"En serie:  {t_serie:7.2f}s  {modelo.peticiones:5d} peticiones  "
+          f"{args.procedures / t_serie:8.1f} procedures/s")
+
+    modelo = ModeloFalso(latencia=args.latencia)
+    helper = AIHelper(api_key="", model=modelo, espera_inicial=args.latencia)
+    inicio = time.perf_counter()
+    descripciones = helper.get_procedures_analysis_batch(
+        procedures, procedures_por_prompt=args.por_prompt, max_concurrentes=args.concurrentes
+    )
+    t_lote = time.perf_counter() - inicio
+    assert all(d and not d.startswith("❌") for d in descripciones)
+    print(f"En lote:   {t_lote:7.2f}s  {modelo.peticiones:5d} peticiones  "
+          f"{args.procedures / t_lote:8.1f} procedures/s  ({modelo.rechazadas} rechazadas por cuota)")
+    print(f"Mejora: {t_serie / t_lote:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
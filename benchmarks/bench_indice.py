@@ -0,0 +1,56 @@
+"""
+Construcción y consultas del índice de procedures
+
+Construye un AlmacenProcedures sintético con cientos de miles de procedures
+(mismo generador que bench_memoria_resultados) y mide el tiempo de construir
+IndiceProcedures y de varias búsquedas por prefijo, subcadena y filtros.
+
+Uso:
+    python benchmarks/bench_indice.py [--repositorios 3] [--archivos 3000] [--procedures 100]
+"""
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_memoria_resultados import generar_archivos
+from indice_procedures import IndiceProcedures, MODO_CONTIENE, MODO_PREFIJO
+from resultados_compactos import AlmacenProcedures
+from tablesScript import BuscadorCodeunit
+
+CONSULTAS = [
+    ("Procedure12", MODO_PREFIJO, {}),
+    ("dure7", MODO_CONTIENE, {}),
+    ("7", MODO_CONTIENE, {'repositorio': "Repositorio001", 'modificador': "local"}),
+    ("NoExiste", MODO_CONTIENE, {}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repositorios', type=int, default=3)
+    parser.add_argument('--archivos', type=int, default=3000)
+    parser.add_argument('--procedures', type=int, default=100)
+    args = parser.parse_args()
+
+    buscador = BuscadorCodeunit(".")
+    almacen = AlmacenProcedures()
+    for nombre_archivo, procedures_del_archivo in generar_archivos(args.repositorios, args.archivos, args.procedures):
+        buscador._cerrar_archivo(almacen, nombre_archivo, procedures_del_archivo)
+
+    inicio = time.perf_counter()
+    indice = IndiceProcedures(almacen)
+    print(f"Índice de {indice.total_entradas} procedures construido en {time.perf_counter() - inicio:.2f} s")
+
+    print(f"{'consulta':>12} {'modo':>9} {'filtros':>8} {'resultados':>11} {'ms':>8}")
+    for consulta, modo, filtros in CONSULTAS:
+        inicio = time.perf_counter()
+        resultados = indice.buscar(consulta, modo, **filtros)
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+        print(f"{consulta:>12} {modo:>9} {len(filtros):>8} {len(resultados):>11} {duracion_ms:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
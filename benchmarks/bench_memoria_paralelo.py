@@ -0,0 +1,82 @@
+"""
+Pico de memoria de analizar_todos_los_procedures con extracción en paralelo
+
+Genera con corpus_sintetico dos corpus, uno con --archivos codeunits y otro con
+--factor veces más, y los analiza con --procesos workers exportando a NDJSON sin
+conservar el resultado (como la línea de comandos con --formato ndjson). Mide con
+tracemalloc el pico de memoria del proceso principal durante el análisis.
+
+Con los lotes en vuelo acotados y los resultados soltados tras su último uso, el
+pico apenas depende del tamaño del corpus: solo crecen las listas de trabajos y
+rutas pendientes. El script falla si el pico del corpus grande supera --tolerancia
+veces el del pequeño.
+
+Uso:
+    python benchmarks/bench_memoria_paralelo.py [--repositorios 6] [--archivos 150] [--procedures 40]
+        [--factor 4] [--procesos 2] [--tolerancia 1.5]
+"""
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cache_contenido import cache_contenido
+from corpus_sintetico import generar_corpus
+from exportacion_ndjson import ExportadorNDJSON
+from tablesScript import BuscadorCodeunit
+
+
+def medir(directorio, procesos, salida):
+    """Analiza 'directorio' y retorna (pico en bytes, segundos, archivos repetidos)"""
+    buscador = BuscadorCodeunit(directorio)
+    with open(os.devnull, 'w', encoding='utf-8') as nulo, redirect_stdout(nulo):
+        buscador.buscar_archivos()
+        buscador.filtrar_archivos_repetidos()
+        cache_contenido.limpiar()
+        gc.collect()
+        # Los archivos encontrados se crean antes de empezar a medir
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        buscador.analizar_todos_los_procedures(procesos=procesos, exportador=ExportadorNDJSON(salida),
+                                               conservar_resultados=False)
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return pico, segundos, len(buscador.archivos_repetidos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repositorios', type=int, default=6)
+    parser.add_argument('--archivos', type=int, default=150)
+    parser.add_argument('--procedures', type=int, default=40)
+    parser.add_argument('--factor', type=int, default=4)
+    parser.add_argument('--procesos', type=int, default=2)
+    parser.add_argument('--tolerancia', type=float, default=1.5)
+    args = parser.parse_args()
+
+    picos = []
+    print(f"{'codeunits':>10} {'repetidos':>10} {'pico (MB)':>10} {'tiempo (s)':>11}")
+    with tempfile.TemporaryDirectory() as temporal:
+        for archivos in (args.archivos, args.archivos * args.factor):
+            directorio = str(Path(temporal) / f"repos{archivos}")
+            generar_corpus(directorio, args.repositorios, archivos, args.procedures)
+            pico, segundos, repetidos = medir(directorio, args.procesos, Path(temporal) / f"resumen{archivos}.ndjson.gz")
+            picos.append(pico)
+            print(f"{archivos:>10} {repetidos:>10} {pico / 2**20:>10.1f} {segundos:>11.2f}")
+
+    print(f"Pico con {args.factor}x codeunits: {picos[1] / picos[0]:.2f}x")
+    assert picos[1] <= picos[0] * args.tolerancia, (
+        f"El pico crece con el corpus: {picos[1] / 2**20:.1f} MB frente a {picos[0] / 2**20:.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
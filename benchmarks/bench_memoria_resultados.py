@@ -0,0 +1,108 @@
+"""
+Memoria del resultado de analizar_todos_los_procedures
+
+Genera un corpus sintético de apariciones (varios repositorios con los mismos
+codeunits y muchos procedures repetidos) y construye el resultado igual que
+analizar_todos_los_procedures, archivo a archivo, con el diccionario anidado
+original, con el AlmacenProcedures columnar y exportando a NDJSON comprimido sin
+conservar el resultado. Mide con tracemalloc la memoria retenida por el resultado
+y el pico durante su construcción.
+
+Uso:
+    python benchmarks/bench_memoria_resultados.py [--repositorios 50] [--archivos 100] [--procedures 100]
+"""
+from collections import defaultdict
+from pathlib import Path
+import argparse
+import gc
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from exportacion_ndjson import ExportadorNDJSON
+from resultados_compactos import AlmacenProcedures
+from tablesScript import BuscadorCodeunit
+
+
+def generar_archivos(repositorios, archivos, procedures, semilla=42):
+    """
+    Genera (nombre_archivo, procedures_del_archivo) como los acumula analizar_todos_los_procedures
+
+    Cada texto se construye de nuevo para cada repositorio, igual que al leerlo de disco.
+    """
+    aleatorio = random.Random(semilla)
+    for indice_archivo in range(archivos):
+        nombre_archivo = f"Codeunit{indice_archivo}.CodeUnit.al"
+        procedures_del_archivo = defaultdict(list)
+        for indice_repo in range(repositorios):
+            repo = f"Repositorio{indice_repo:03d}"
+            ruta = f"C:/repos/{repo}/src/Codeunits/{nombre_archivo}"
+            for indice_procedure in range(procedures):
+                # Un 20% de los procedures solo existe en un repositorio
+                if indice_procedure % 5 == 0 and aleatorio.random() > 1 / repositorios:
+                    continue
+                nombre = f"Procedure{indice_procedure}"
+                modificador = ("public", "local", "internal")[indice_procedure % 3]
+                prefijo = "" if modificador == "public" else f"{modificador} "
+                numero_linea = 10 + indice_procedure * 12
+                procedures_del_archivo[nombre].append({
+                    'repositorio': repo,
+                    'linea': f"{prefijo}procedure {nombre}(Cliente: Record Customer; Importe: Decimal): Boolean",
+                    'numero_linea': numero_linea,
+                    'linea_fin': numero_linea + 9,
+                    'ruta_archivo': ruta,
+                    'modificador': f"{modificador}",
+                    'nombre': f"{nombre}",
+                    # Uno de cada siete procedures tiene dos versiones del cuerpo
+                    'huella': f"{indice_procedure:08x}{indice_repo % 2 if indice_procedure % 7 == 0 else 0:08x}"
+                })
+        yield nombre_archivo, procedures_del_archivo
+
+
+def medir(resultado_final, args, exportador=None):
+    """Construye el resultado y retorna (memoria retenida, pico, segundos, apariciones)"""
+    buscador = BuscadorCodeunit(".")
+    gc.collect()
+    # El resultado vacío se crea antes de empezar a medir
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    if exportador is not None:
+        exportador.abrir(buscador.carpeta_repositorios)
+    apariciones = 0
+    for nombre_archivo, procedures_del_archivo in generar_archivos(args.repositorios, args.archivos, args.procedures):
+        apariciones += sum(len(lista) for lista in procedures_del_archivo.values())
+        buscador._cerrar_archivo(resultado_final, nombre_archivo, procedures_del_archivo, exportador)
+        del procedures_del_archivo
+    if exportador is not None:
+        exportador.cerrar()
+    segundos = time.perf_counter() - inicio
+    gc.collect()
+    retenida, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retenida, pico, segundos, apariciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repositorios', type=int, default=50)
+    parser.add_argument('--archivos', type=int, default=100)
+    parser.add_argument('--procedures', type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'formato':>12} {'apariciones':>12} {'retenida (MB)':>14} {'pico (MB)':>10} {'tiempo (s)':>11}")
+    for nombre, crear_resultado in (("dict", dict), ("columnar", AlmacenProcedures)):
+        retenida, pico, segundos, apariciones = medir(crear_resultado(), args)
+        print(f"{nombre:>12} {apariciones:>12} {retenida / 2**20:>14.1f} {pico / 2**20:>10.1f} {segundos:>11.2f}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        exportador = ExportadorNDJSON(Path(directorio) / "resumen.ndjson.gz")
+        retenida, pico, segundos, apariciones = medir(None, args, exportador)
+        print(f"{'ndjson.gz':>12} {apariciones:>12} {retenida / 2**20:>14.1f} {pico / 2**20:>10.1f} {segundos:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
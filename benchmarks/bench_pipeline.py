@@ -0,0 +1,164 @@
+"""
+Tiempos de cada etapa del análisis sobre un corpus sintético en disco
+
+Genera con corpus_sintetico un árbol de repositorios con carpetas LLB (o usa uno
+existente con --directorio) y mide por separado buscar_archivos,
+filtrar_archivos_repetidos, extraer_procedures_de_archivo (todas las rutas de los
+archivos repetidos), analizar_todos_los_procedures y guardar_resumen_completo.
+La cache de contenido se vacía antes de cada etapa que lee archivos, así que los
+tiempos incluyen la lectura de disco.
+
+Los resultados se escriben en JSON (--salida) con los parámetros, el commit y el
+mínimo y la mediana de cada etapa. Con --comparar se muestra la relación con otro
+JSON generado por este script, por ejemplo en el commit anterior.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--repositorios 10] [--archivos 200] [--procedures 40]
+        [--duplicacion 0.6] [--repeticiones 3] [--salida bench_pipeline.json]
+        [--comparar anterior.json] [--directorio CORPUS]
+"""
+from contextlib import redirect_stdout
+from datetime import datetime
+from pathlib import Path
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cache_contenido import cache_contenido
+from corpus_sintetico import generar_corpus
+from tablesScript import BuscadorCodeunit
+
+ETAPAS = [
+    'buscar_archivos',
+    'filtrar_archivos_repetidos',
+    'extraer_procedures_de_archivo',
+    'analizar_todos_los_procedures',
+    'guardar_resumen_completo'
+]
+
+
+def obtener_commit():
+    """Hash del commit actual o None si no se está en un repositorio git"""
+    try:
+        salida = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=Path(__file__).resolve().parent, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return salida.stdout.strip() or None
+
+
+def medir_etapas(directorio, directorio_salida) -> tuple:
+    """
+    Ejecuta el análisis completo una vez
+
+    Returns:
+        tuple: (segundos por etapa, contadores del análisis)
+    """
+    tiempos = {}
+    buscador = BuscadorCodeunit(directorio)
+
+    # Los mensajes por archivo no forman parte de la medida
+    with open(os.devnull, 'w', encoding='utf-8') as nulo, redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        buscador.buscar_archivos()
+        tiempos['buscar_archivos'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        buscador.filtrar_archivos_repetidos()
+        tiempos['filtrar_archivos_repetidos'] = time.perf_counter() - inicio
+
+        rutas = [aparicion['archivo']['ruta_completa']
+                 for info in buscador.archivos_repetidos.values()
+                 for aparicion in info['archivos']]
+        cache_contenido.limpiar()
+        inicio = time.perf_counter()
+        for ruta in rutas:
+            buscador.extraer_procedures_de_archivo(ruta)
+        tiempos['extraer_procedures_de_archivo'] = time.perf_counter() - inicio
+
+        cache_contenido.limpiar()
+        inicio = time.perf_counter()
+        buscador.analizar_todos_los_procedures()
+        tiempos['analizar_todos_los_procedures'] = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        buscador.guardar_resumen_completo(str(Path(directorio_salida) / "resumen.json"))
+        tiempos['guardar_resumen_completo'] = time.perf_counter() - inicio
+
+    contadores = {
+        'archivos': sum(len(archivos) for archivos in buscador.archivos_encontrados.values()),
+        'archivos_repetidos': len(buscador.archivos_repetidos),
+        'rutas_extraidas': len(rutas),
+        'procedures': sum(len(procedures) for procedures in buscador.todos_los_procedures.values())
+    }
+    return tiempos, contadores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repositorios', type=int, default=10)
+    parser.add_argument('--archivos', type=int, default=200)
+    parser.add_argument('--procedures', type=int, default=40)
+    parser.add_argument('--duplicacion', type=float, default=0.6)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--salida', default="bench_pipeline.json")
+    parser.add_argument('--comparar', help="JSON de una ejecución anterior")
+    parser.add_argument('--directorio', help="Corpus ya generado (por defecto se genera uno temporal)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        if args.directorio:
+            directorio = args.directorio
+            corpus = {'directorio': directorio}
+        else:
+            directorio = str(Path(temporal) / "repos")
+            corpus = generar_corpus(directorio, args.repositorios, args.archivos, args.procedures,
+                                    args.duplicacion)
+
+        mediciones = {etapa: [] for etapa in ETAPAS}
+        for _ in range(args.repeticiones):
+            tiempos, contadores = medir_etapas(directorio, temporal)
+            for etapa, segundos in tiempos.items():
+                mediciones[etapa].append(segundos)
+
+    resultado = {
+        'fecha': datetime.now().isoformat(),
+        'commit': obtener_commit(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'parametros': vars(args),
+        'corpus': corpus,
+        'contadores': contadores,
+        'etapas': {
+            etapa: {'minimo': min(valores), 'mediana': statistics.median(valores), 'valores': valores}
+            for etapa, valores in mediciones.items()
+        }
+    }
+
+    anterior = {}
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            anterior = json.load(f).get('etapas', {})
+
+    print(f"{'etapa':>31} {'mínimo (s)':>11} {'mediana (s)':>12}" + (f" {'vs anterior':>12}" if anterior else ""))
+    for etapa, valores in resultado['etapas'].items():
+        linea = f"{etapa:>31} {valores['minimo']:>11.3f} {valores['mediana']:>12.3f}"
+        if etapa in anterior and anterior[etapa]['minimo'] > 0:
+            linea += f" {valores['minimo'] / anterior[etapa]['minimo']:>11.2f}x"
+        print(linea)
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"💾 Resultados guardados en: {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
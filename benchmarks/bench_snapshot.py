@@ -0,0 +1,95 @@
+"""
+Snapshot binario frente al resumen JSON de guardar_resumen_completo
+
+Construye un análisis sintético (mismo corpus que bench_memoria_resultados) y
+compara el tamaño en disco y los tiempos de guardado y de carga del JSON con
+indent=2 y del snapshot. La carga del snapshot se mide sin el detalle de las
+apariciones (lo que necesita el dashboard para abrirlo) y forzando su carga.
+
+Uso:
+    python benchmarks/bench_snapshot.py [--repositorios 50] [--archivos 100] [--procedures 100]
+"""
+from pathlib import Path
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_memoria_resultados import generar_archivos
+from resultados_compactos import AlmacenProcedures
+from tablesScript import BuscadorCodeunit
+
+
+def crear_buscador(args) -> BuscadorCodeunit:
+    """Buscador con archivos encontrados y procedures sintéticos"""
+    buscador = BuscadorCodeunit("C:/repos")
+    for indice_repo in range(args.repositorios):
+        repo = f"Repositorio{indice_repo:03d}"
+        buscador.archivos_encontrados[repo] = [
+            {
+                'ruta_completa': f"C:/repos/{repo}/src/LLB/Codeunit{indice}.CodeUnit.al",
+                'ruta_relativa': f"src/LLB/Codeunit{indice}.CodeUnit.al",
+                'ruta_desde_llb': f"Codeunit{indice}.CodeUnit.al",
+                'carpeta_llb_base': "src/LLB",
+                'nombre': f"Codeunit{indice}.CodeUnit.al",
+                'tamaño': 40000 + indice,
+                'modificado': "2024-01-01T00:00:00"
+            }
+            for indice in range(args.archivos)
+        ]
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        buscador.filtrar_archivos_repetidos()
+
+    buscador.todos_los_procedures = AlmacenProcedures()
+    for nombre_archivo, procedures_del_archivo in generar_archivos(args.repositorios, args.archivos, args.procedures):
+        buscador._cerrar_archivo(buscador.todos_los_procedures, nombre_archivo, procedures_del_archivo)
+    return buscador
+
+
+def cronometrar(funcion):
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcion()
+    return resultado, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repositorios', type=int, default=50)
+    parser.add_argument('--archivos', type=int, default=100)
+    parser.add_argument('--procedures', type=int, default=100)
+    args = parser.parse_args()
+
+    buscador = crear_buscador(args)
+    print(f"Apariciones: {buscador.todos_los_procedures.total_apariciones}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_json = Path(directorio) / "resumen.json"
+        ruta_snapshot = Path(directorio) / "resumen.cusnap"
+
+        _, t_guardar_json = cronometrar(lambda: buscador.guardar_resumen_completo(str(ruta_json)))
+        _, t_guardar_snapshot = cronometrar(lambda: buscador.guardar_snapshot(str(ruta_snapshot)))
+
+        def cargar_json():
+            with open(ruta_json, 'r', encoding='utf-8') as f:
+                return json.load(f)
+
+        _, t_cargar_json = cronometrar(cargar_json)
+        cargado, t_cargar_snapshot = cronometrar(lambda: BuscadorCodeunit.cargar_snapshot(ruta_snapshot))
+        _, t_detalle = cronometrar(lambda: cargado.todos_los_procedures.columnas())
+
+        print(f"{'formato':>10} {'tamaño (MB)':>12} {'guardar (s)':>12} {'cargar (s)':>11} {'+ detalle (s)':>14}")
+        print(f"{'json':>10} {ruta_json.stat().st_size / 2**20:>12.1f} {t_guardar_json:>12.2f} "
+              f"{t_cargar_json:>11.2f} {'-':>14}")
+        print(f"{'snapshot':>10} {ruta_snapshot.stat().st_size / 2**20:>12.1f} {t_guardar_snapshot:>12.2f} "
+              f"{t_cargar_snapshot:>11.2f} {t_cargar_snapshot + t_detalle:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Generador de repositorios AL sintéticos para los benchmarks
+
+Crea en un directorio varios repositorios con codeunits dentro de carpetas LLB
+(algunas anidadas: LLB/<módulo>/LLB). Una fracción de los codeunits se comparte
+entre repositorios, con los mismos procedures y algunos cuerpos modificados, y el
+resto existe en un solo repositorio.
+
+Uso:
+    python benchmarks/corpus_sintetico.py DIRECTORIO [--repositorios 10] [--archivos 200]
+        [--procedures 40] [--duplicacion 0.6] [--semilla 42]
+"""
+from pathlib import Path
+import argparse
+import random
+
+NOMBRE_CARPETA_LLB = "LLB"
+MODULOS = ["Ventas", "Compras", "Almacen", "Contabilidad", "Produccion"]
+
+
+def generar_procedure(nombre, modificador, variante):
+    """Texto AL de un procedure; 'variante' distinta de 0 cambia el cuerpo"""
+    prefijo = "" if modificador == "public" else f"{modificador} "
+    lineas = [
+        f"    {prefijo}procedure {nombre}(Cliente: Record Customer; Importe: Decimal): Boolean",
+        "    var",
+        "        Linea: Record \"Sales Line\";",
+        "    begin",
+        "        // Comentario con la palabra procedure dentro",
+        "        if Cliente.Get(Linea.\"Sell-to Customer No.\") then",
+        f"            exit(Importe > {variante});",
+        "        exit(false);",
+        "    end;",
+        ""
+    ]
+    return "\n".join(lineas)
+
+
+def generar_codeunit(numero, procedures, variantes):
+    """
+    Texto de un codeunit
+
+    Args:
+        numero (int): Número del codeunit (nombre y id)
+        procedures (int): Número de procedures
+        variantes (set): Índices de los procedures con el cuerpo modificado
+    """
+    partes = [f'codeunit {50000 + numero} "Codeunit {numero}"', "{"]
+    for indice in range(procedures):
+        modificador = ("public", "local", "internal")[indice % 3]
+        partes.append(generar_procedure(f"Procedure{indice}", modificador, 1 if indice in variantes else 0))
+    partes.append("}")
+    return "\n".join(partes)
+
+
+def generar_corpus(directorio, repositorios=10, archivos=200, procedures=40, duplicacion=0.6,
+                   proporcion_anidadas=0.3, proporcion_variantes=0.1, semilla=42) -> dict:
+    """
+    Escribe el corpus en 'directorio'
+
+    Args:
+        directorio (str): Carpeta raíz; cada repositorio es una subcarpeta
+        repositorios (int): Número de repositorios
+        archivos (int): Codeunits distintos en todo el corpus
+        procedures (int): Procedures por codeunit
+        duplicacion (float): Fracción de codeunits presentes en más de un repositorio
+        proporcion_anidadas (float): Fracción de archivos en una LLB anidada
+        proporcion_variantes (float): Fracción de procedures con el cuerpo cambiado
+            en cada copia de un codeunit compartido
+        semilla (int): Semilla del generador aleatorio
+
+    Returns:
+        dict: Número de repositorios, codeunits distintos, archivos escritos y bytes
+    """
+    aleatorio = random.Random(semilla)
+    raiz = Path(directorio)
+    nombres_repositorios = [f"Repositorio{indice:03d}" for indice in range(repositorios)]
+    archivos_escritos = 0
+    bytes_escritos = 0
+
+    for numero in range(archivos):
+        if repositorios > 1 and aleatorio.random() < duplicacion:
+            destinos = aleatorio.sample(nombres_repositorios, aleatorio.randint(2, repositorios))
+        else:
+            destinos = [aleatorio.choice(nombres_repositorios)]
+
+        for repositorio in destinos:
+            carpeta = raiz / repositorio / "src" / NOMBRE_CARPETA_LLB
+            if aleatorio.random() < proporcion_anidadas:
+                carpeta = carpeta / aleatorio.choice(MODULOS) / NOMBRE_CARPETA_LLB
+            carpeta.mkdir(parents=True, exist_ok=True)
+
+            variantes = {indice for indice in range(procedures) if aleatorio.random() < proporcion_variantes}
+            texto = generar_codeunit(numero, procedures, variantes)
+            (carpeta / f"Codeunit{numero}.CodeUnit.al").write_text(texto, encoding="utf-8")
+            archivos_escritos += 1
+            bytes_escritos += len(texto)
+
+    return {
+        'repositorios': repositorios,
+        'codeunits': archivos,
+        'archivos': archivos_escritos,
+        'bytes': bytes_escritos
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directorio')
+    parser.add_argument('--repositorios', type=int, default=10)
+    parser.add_argument('--archivos', type=int, default=200)
+    parser.add_argument('--procedures', type=int, default=40)
+    parser.add_argument('--duplicacion', type=float, default=0.6)
+    parser.add_argument('--semilla', type=int, default=42)
+    args = parser.parse_args()
+
+    resumen = generar_corpus(args.directorio, args.repositorios, args.archivos, args.procedures,
+                             args.duplicacion, semilla=args.semilla)
+    print(f"📁 {resumen['archivos']} archivos ({resumen['bytes'] / 2**20:.1f} MB) "
+          f"en {resumen['repositorios']} repositorios")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+
+class ContenidoArchivo:
+    """Texto de un archivo junto con sus offsets de línea y su hash, calculados bajo demanda"""
+
+    __slots__ = ('texto', '_offsets_lineas', '_hash')
+
+    def __init__(self, texto: str):
+        self.texto = texto
+        self._offsets_lineas = None
+        self._hash = None
+
+    @property
+    def offsets_lineas(self):
+        """Offset de inicio de cada línea (separadas por '\\n')"""
+        if self._offsets_lineas is None:
+            offsets = [0]
+            texto = self.texto
+            posicion = texto.find('\n')
+            while posicion != -1:
+                offsets.append(posicion + 1)
+                posicion = texto.find('\n', posicion + 1)
+            self._offsets_lineas = offsets
+        return self._offsets_lineas
+
+    @property
+    def total_lineas(self) -> int:
+        return len(self.offsets_lineas)
+
+    @property
+    def hash(self) -> str:
+        """Hash SHA-1 del texto"""
+        if self._hash is None:
+            self._hash = hashlib.sha1(self.texto.encode('utf-8')).hexdigest()
+        return self._hash
+
+    def lineas(self, inicio: int, fin: int) -> str:
+        """
+        Devuelve las líneas [inicio, fin) (base 0) unidas por '\\n'
+
+        Equivale a "\\n".join(texto.split('\\n')[inicio:fin]) sin partir el archivo entero.
+        """
+        offsets = self.offsets_lineas
+        inicio = max(0, inicio)
+        fin = min(len(offsets), fin)
+        if inicio >= fin:
+            return ""
+        fin_texto = offsets[fin] - 1 if fin < len(offsets) else len(self.texto)
+        return self.texto[offsets[inicio]:fin_texto]
+
+
+def leer_contenido(ruta_archivo) -> ContenidoArchivo:
+    """
+    Lee un archivo de disco sin pasar por la cache
+
+    Para procesos que leen cada archivo una sola vez (los workers de extracción), donde
+    guardarlo en su propia copia de la cache solo ocuparía memoria.
+
+    Raises:
+        OSError, UnicodeDecodeError: Si el archivo no se puede leer como UTF-8
+    """
+    with open(ruta_archivo, 'r', encoding='utf-8') as f:
+        return ContenidoArchivo(f.read())
+
+
+class CacheContenido:
+    """
+    Cache LRU acotada del contenido de los archivos, indexada por ruta, fecha de
+    modificación y tamaño
+
+    La comparten el extractor de procedures, el manifiesto incremental y AIHelper, de
+    modo que cada archivo se lee de disco una sola vez mientras no cambie.
+    """
+
+    def __init__(self, max_caracteres: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_caracteres (int): Tamaño máximo total de los textos guardados
+        """
+        self.max_caracteres = max_caracteres
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()
+        self._caracteres = 0
+        self._lock = threading.Lock()
+
+    def obtener(self, ruta_archivo) -> ContenidoArchivo:
+        """
+        Devuelve el contenido del archivo, leyéndolo de disco solo si no está en cache
+
+        Raises:
+            OSError, UnicodeDecodeError: Si el archivo no se puede leer como UTF-8
+        """
+        ruta = str(ruta_archivo)
+        estado = os.stat(ruta)
+        clave = (estado.st_mtime_ns, estado.st_size)
+
+        with self._lock:
+            entrada = self._entradas.get(ruta)
+            if entrada is not None and entrada[0] == clave:
+                self._entradas.move_to_end(ruta)
+                self.aciertos += 1
+                return entrada[1]
+            self.fallos += 1
+
+        contenido = leer_contenido(ruta)
+
+        with self._lock:
+            anterior = self._entradas.pop(ruta, None)
+            if anterior is not None:
+                self._caracteres -= len(anterior[1].texto)
+            if len(contenido.texto) <= self.max_caracteres:
+                self._entradas[ruta] = (clave, contenido)
+                self._caracteres += len(contenido.texto)
+                while self._caracteres > self.max_caracteres:
+                    _, (_, expulsado) = self._entradas.popitem(last=False)
+                    self._caracteres -= len(expulsado.texto)
+        return contenido
+
+    def leer(self, ruta_archivo) -> str:
+        """Devuelve el texto del archivo"""
+        return self.obtener(ruta_archivo).texto
+
+    def invalidar(self, ruta_archivo):
+        """Elimina un archivo de la cache"""
+        with self._lock:
+            anterior = self._entradas.pop(str(ruta_archivo), None)
+            if anterior is not None:
+                self._caracteres -= len(anterior[1].texto)
+
+    def limpiar(self):
+        """Vacía la cache"""
+        with self._lock:
+            self._entradas.clear()
+            self._caracteres = 0
+
+    def obtener_estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                'archivos': len(self._entradas),
+                'caracteres': self._caracteres,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+# Instancia compartida por todo el proceso
+cache_contenido = CacheContenido()
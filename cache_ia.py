@@ -0,0 +1,122 @@
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+class CacheIA:
+    """
+    Cache persistente en SQLite para las respuestas del modelo de IA
+
+    Las entradas se indexan por el hash del modelo y del prompt completo, que ya incluye
+    el código del procedure o del archivo, así que una entrada solo deja de usarse cuando
+    cambia el código o el modelo. Se desalojan por antigüedad (TTL) y, si se supera
+    el máximo de entradas, las usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, ruta_db, max_entradas: int = 10000, ttl_segundos: int = 30 * 24 * 3600):
+        """
+        Args:
+            ruta_db (str): Ruta del archivo SQLite
+            max_entradas (int): Número máximo de respuestas guardadas
+            ttl_segundos (int): Tiempo de vida de cada respuesta desde que se generó
+        """
+        self.ruta_db = Path(ruta_db)
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.aciertos = 0
+        self.fallos = 0
+        self._lock = threading.Lock()
+
+        self.ruta_db.parent.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(str(self.ruta_db), check_same_thread=False)
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS respuestas (
+                    clave TEXT PRIMARY KEY,
+                    modelo TEXT NOT NULL,
+                    respuesta TEXT NOT NULL,
+                    creado REAL NOT NULL,
+                    ultimo_acceso REAL NOT NULL
+                )
+            """)
+            self._conexion.execute(
+                "CREATE INDEX IF NOT EXISTS idx_respuestas_acceso ON respuestas (ultimo_acceso)"
+            )
+
+    @staticmethod
+    def calcular_clave(modelo: str, prompt: str) -> str:
+        """Clave de cache: hash del nombre del modelo y del prompt"""
+        return hashlib.sha256(f"{modelo}\0{prompt}".encode('utf-8')).hexdigest()
+
+    def obtener(self, modelo: str, prompt: str):
+        """Retorna la respuesta guardada para el prompt, o None si no existe o ha caducado"""
+        clave = self.calcular_clave(modelo, prompt)
+        ahora = time.time()
+
+        with self._lock, self._conexion:
+            fila = self._conexion.execute(
+                "SELECT respuesta, creado FROM respuestas WHERE clave = ?", (clave,)
+            ).fetchone()
+
+            if fila is None or ahora - fila[1] > self.ttl_segundos:
+                if fila is not None:
+                    self._conexion.execute("DELETE FROM respuestas WHERE clave = ?", (clave,))
+                self.fallos += 1
+                return None
+
+            self._conexion.execute(
+                "UPDATE respuestas SET ultimo_acceso = ? WHERE clave = ?", (ahora, clave)
+            )
+            self.aciertos += 1
+            return fila[0]
+
+    def guardar(self, modelo: str, prompt: str, respuesta: str):
+        """Guarda una respuesta y aplica la política de desalojo"""
+        clave = self.calcular_clave(modelo, prompt)
+        ahora = time.time()
+
+        with self._lock, self._conexion:
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO respuestas (clave, modelo, respuesta, creado, ultimo_acceso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (clave, modelo, respuesta, ahora, ahora)
+            )
+            self._desalojar(ahora)
+
+    def _desalojar(self, ahora: float):
+        """Elimina las entradas caducadas y las menos usadas recientemente si sobran"""
+        self._conexion.execute("DELETE FROM respuestas WHERE creado < ?", (ahora - self.ttl_segundos,))
+
+        total = self._conexion.execute("SELECT COUNT(*) FROM respuestas").fetchone()[0]
+        if total > self.max_entradas:
+            self._conexion.execute(
+                "DELETE FROM respuestas WHERE clave IN "
+                "(SELECT clave FROM respuestas ORDER BY ultimo_acceso ASC LIMIT ?)",
+                (total - self.max_entradas,)
+            )
+
+    def limpiar(self):
+        """Vacía la cache y reinicia los contadores"""
+        with self._lock, self._conexion:
+            self._conexion.execute("DELETE FROM respuestas")
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener_estadisticas(self) -> dict:
+        """Retorna el número de entradas y los aciertos/fallos desde que se abrió la cache"""
+        with self._lock:
+            entradas, tamaño = self._conexion.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(respuesta)), 0) FROM respuestas"
+            ).fetchone()
+
+        consultas = self.aciertos + self.fallos
+        return {
+            'entradas': entradas,
+            'tamaño_respuestas': tamaño,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+        }
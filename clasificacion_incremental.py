@@ -0,0 +1,213 @@
+from collections import Counter, defaultdict
+
+# Valores de 'tipo' de las transiciones
+TRANSICION_ARCHIVO = 'archivo'
+TRANSICION_PROCEDURE = 'procedure'
+
+
+class ClasificadorIncremental:
+    """
+    Clasificación REPETIDO/ÚNICO mantenida con contadores de referencias
+
+    Cada archivo registrado es una aparición de un nombre_archivo en una carpeta LLB de
+    un repositorio, con la lista de sus procedures (clave y huella del cuerpo). Se
+    cuentan las apariciones por (nombre_archivo, carpeta LLB) y, para cada
+    (nombre_archivo, procedure), las apariciones por repositorio y por huella:
+
+        - un archivo es REPETIDO si aparece en más de una carpeta LLB
+        - un procedure es REPETIDO si aparece en más de un repositorio, y su contenido
+          IDÉNTICO si además todas las copias tienen la misma huella (DIVERGENTE si no)
+
+    Registrar o quitar un archivo solo toca los contadores de sus procedures, así que
+    cuesta O(procedures del archivo) y no depende del tamaño del corpus. Cada operación
+    devuelve las transiciones de estado que ha provocado.
+    """
+
+    def __init__(self):
+        self._carpetas = defaultdict(Counter)       # nombre_archivo -> carpeta_llb_id -> apariciones
+        self._repositorios = defaultdict(Counter)   # (nombre_archivo, procedure) -> repositorio -> apariciones
+        self._huellas = defaultdict(Counter)        # (nombre_archivo, procedure) -> huella -> apariciones
+        self._registros = {}                        # (ruta, carpeta_llb_id) -> registro
+        self._registros_por_ruta = defaultdict(list)
+        self.archivos_repetidos = 0
+        self.procedures_repetidos = 0
+        self.procedures_identicos = 0
+
+    @staticmethod
+    def _estado_archivo(carpetas: Counter):
+        if not carpetas:
+            return None
+        return 'REPETIDO' if len(carpetas) > 1 else 'ÚNICO'
+
+    @staticmethod
+    def _estado_procedure(repositorios: Counter, huellas: Counter):
+        """(estado, contenido) de un procedure o None si no tiene apariciones"""
+        if not repositorios:
+            return None
+        if len(repositorios) == 1:
+            return 'ÚNICO', 'ÚNICO'
+        return 'REPETIDO', 'IDÉNTICO' if len(huellas) == 1 else 'DIVERGENTE'
+
+    def _contabilizar(self, anterior, nuevo):
+        """Actualiza los totales de procedures repetidos e idénticos tras una transición"""
+        for estado, signo in ((anterior, -1), (nuevo, 1)):
+            if estado is not None and estado[0] == 'REPETIDO':
+                self.procedures_repetidos += signo
+                if estado[1] == 'IDÉNTICO':
+                    self.procedures_identicos += signo
+
+    def _modificar(self, registro, signo: int) -> list:
+        """Suma (signo=1) o resta (signo=-1) un registro de los contadores"""
+        nombre_archivo = registro['nombre_archivo']
+        transiciones = []
+
+        carpetas = self._carpetas[nombre_archivo]
+        estado_anterior = self._estado_archivo(carpetas)
+        carpetas[registro['carpeta_llb_id']] += signo
+        if carpetas[registro['carpeta_llb_id']] <= 0:
+            del carpetas[registro['carpeta_llb_id']]
+        estado_nuevo = self._estado_archivo(carpetas)
+        if not carpetas:
+            del self._carpetas[nombre_archivo]
+        if estado_anterior != estado_nuevo:
+            self.archivos_repetidos += (estado_nuevo == 'REPETIDO') - (estado_anterior == 'REPETIDO')
+            transiciones.append({'tipo': TRANSICION_ARCHIVO, 'nombre_archivo': nombre_archivo,
+                                 'nombre_procedure': None, 'anterior': estado_anterior, 'nuevo': estado_nuevo})
+
+        repositorio = registro['repositorio']
+        for nombre_procedure, huella in registro['procedures']:
+            clave = (nombre_archivo, nombre_procedure)
+            repositorios, huellas = self._repositorios[clave], self._huellas[clave]
+            anterior = self._estado_procedure(repositorios, huellas)
+
+            repositorios[repositorio] += signo
+            if repositorios[repositorio] <= 0:
+                del repositorios[repositorio]
+            huellas[huella] += signo
+            if huellas[huella] <= 0:
+                del huellas[huella]
+
+            nuevo = self._estado_procedure(repositorios, huellas)
+            if not repositorios:
+                del self._repositorios[clave], self._huellas[clave]
+            if anterior != nuevo:
+                self._contabilizar(anterior, nuevo)
+                transiciones.append({
+                    'tipo': TRANSICION_PROCEDURE,
+                    'nombre_archivo': nombre_archivo,
+                    'nombre_procedure': nombre_procedure,
+                    'anterior': anterior[0] if anterior else None,
+                    'nuevo': nuevo[0] if nuevo else None,
+                    'contenido_anterior': anterior[1] if anterior else None,
+                    'contenido_nuevo': nuevo[1] if nuevo else None
+                })
+        return transiciones
+
+    def registrar(self, archivo_info: dict, procedures) -> list:
+        """
+        Añade la aparición de un archivo con sus procedures
+
+        Args:
+            archivo_info (dict): Aparición tal como la agrupa filtrar_archivos_repetidos
+                ('archivo', 'repo' y 'carpeta_llb_id')
+            procedures: Pares (nombre_procedure, huella) del archivo
+
+        Returns:
+            list: Transiciones de estado provocadas
+        """
+        archivo = archivo_info['archivo']
+        clave_registro = (archivo['ruta_completa'], archivo_info['carpeta_llb_id'])
+        transiciones = []
+        if clave_registro in self._registros:
+            transiciones.extend(self.quitar(*clave_registro))
+
+        registro = {
+            'nombre_archivo': archivo['nombre'],
+            'carpeta_llb_id': archivo_info['carpeta_llb_id'],
+            'repositorio': archivo_info['repo'],
+            'procedures': list(procedures)
+        }
+        self._registros[clave_registro] = registro
+        self._registros_por_ruta[archivo['ruta_completa']].append(clave_registro)
+        transiciones.extend(self._modificar(registro, 1))
+        return transiciones
+
+    def quitar(self, ruta: str, carpeta_llb_id: str = None) -> list:
+        """
+        Quita las apariciones registradas de una ruta
+
+        Args:
+            ruta (str): Ruta completa del archivo
+            carpeta_llb_id (str): Solo la aparición en esta carpeta LLB (por defecto todas;
+                un archivo en LLB anidadas aparece una vez por cada una)
+
+        Returns:
+            list: Transiciones de estado provocadas
+        """
+        transiciones = []
+        for clave_registro in list(self._registros_por_ruta.get(ruta, [])):
+            if carpeta_llb_id is not None and clave_registro[1] != carpeta_llb_id:
+                continue
+            registro = self._registros.pop(clave_registro)
+            self._registros_por_ruta[ruta].remove(clave_registro)
+            transiciones.extend(self._modificar(registro, -1))
+        if not self._registros_por_ruta.get(ruta, True):
+            del self._registros_por_ruta[ruta]
+        return transiciones
+
+    def estado_archivo(self, nombre_archivo: str):
+        """'REPETIDO', 'ÚNICO' o None si no hay ninguna aparición del archivo"""
+        return self._estado_archivo(self._carpetas.get(nombre_archivo, Counter()))
+
+    def estado_procedure(self, nombre_archivo: str, nombre_procedure: str):
+        """(estado, contenido) del procedure o None si no aparece"""
+        clave = (nombre_archivo, nombre_procedure)
+        if clave not in self._repositorios:
+            return None
+        return self._estado_procedure(self._repositorios[clave], self._huellas[clave])
+
+    def procedures_ruta(self, ruta: str) -> set:
+        """Pares (nombre_archivo, nombre_procedure) registrados para una ruta"""
+        pares = set()
+        for clave_registro in self._registros_por_ruta.get(ruta, ()):
+            registro = self._registros[clave_registro]
+            pares.update((registro['nombre_archivo'], nombre_procedure)
+                         for nombre_procedure, _ in registro['procedures'])
+        return pares
+
+    def repositorios_procedure(self, nombre_archivo: str, nombre_procedure: str) -> list:
+        return list(self._repositorios.get((nombre_archivo, nombre_procedure), ()))
+
+    def carpetas_archivo(self, nombre_archivo: str) -> list:
+        return list(self._carpetas.get(nombre_archivo, ()))
+
+    @property
+    def total_archivos(self) -> int:
+        return len(self._carpetas)
+
+    @property
+    def total_procedures(self) -> int:
+        return len(self._repositorios)
+
+
+def consolidar_transiciones(transiciones) -> list:
+    """
+    Reduce una secuencia de transiciones a su efecto neto
+
+    Un archivo modificado se quita y se vuelve a registrar, lo que puede producir pares
+    como REPETIDO -> ÚNICO -> REPETIDO. Se conserva, en el orden de la primera, una
+    transición por archivo o procedure con el estado inicial y el final, y se descartan
+    las que acaban donde empezaron.
+    """
+    netas = {}
+    for transicion in transiciones:
+        clave = (transicion['tipo'], transicion['nombre_archivo'], transicion['nombre_procedure'])
+        if clave in netas:
+            neta = netas[clave]
+            neta['nuevo'] = transicion['nuevo']
+            if 'contenido_nuevo' in transicion:
+                neta['contenido_nuevo'] = transicion['contenido_nuevo']
+        else:
+            netas[clave] = dict(transicion)
+    return [neta for neta in netas.values()
+            if (neta['anterior'], neta.get('contenido_anterior')) != (neta['nuevo'], neta.get('contenido_nuevo'))]
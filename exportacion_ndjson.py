@@ -0,0 +1,113 @@
+from datetime import datetime
+from pathlib import Path
+import gzip
+import json
+
+
+class ExportadorNDJSON:
+    """
+    Exporta el análisis como NDJSON (un objeto JSON por línea) a medida que se genera
+
+    Cada línea lleva un campo 'tipo':
+        - 'cabecera': fecha y carpeta analizada (primera línea)
+        - 'archivo': resumen de un archivo .CodeUnit.al, seguido de sus procedures
+        - 'procedure': un procedure con su estado, repositorios y apariciones
+        - 'estadisticas': totales del análisis y errores (última línea)
+
+    Solo se mantienen en memoria los contadores, así que el consumo no depende del
+    tamaño del análisis.
+    """
+
+    def __init__(self, archivo_salida, comprimir=None):
+        """
+        Args:
+            archivo_salida (str): Ruta del archivo NDJSON
+            comprimir (bool): Si es True se escribe con gzip; por defecto se comprime
+                cuando la ruta termina en .gz
+        """
+        self.archivo_salida = Path(archivo_salida)
+        if comprimir is None:
+            comprimir = self.archivo_salida.suffix == '.gz'
+        self.comprimir = comprimir
+        self.total_archivos = 0
+        self.total_procedures = 0
+        self.procedures_repetidos = 0
+        self.procedures_unicos = 0
+        self.procedures_identicos = 0
+        self.procedures_divergentes = 0
+        self._archivo = None
+
+    def abrir(self, carpeta_repositorios):
+        """Abre el archivo de salida y escribe la cabecera"""
+        self.archivo_salida.parent.mkdir(parents=True, exist_ok=True)
+        if self.comprimir:
+            self._archivo = gzip.open(self.archivo_salida, 'wt', encoding='utf-8', compresslevel=6)
+        else:
+            self._archivo = open(self.archivo_salida, 'w', encoding='utf-8')
+        self._escribir({
+            'tipo': 'cabecera',
+            'fecha_busqueda': datetime.now().isoformat(),
+            'tipo_analisis': 'codeunits',
+            'carpeta_repositorios': str(carpeta_repositorios)
+        })
+
+    def _escribir(self, registro: dict):
+        self._archivo.write(json.dumps(registro, ensure_ascii=False, default=dict))
+        self._archivo.write('\n')
+
+    def escribir_archivo(self, nombre_archivo: str, procedures: dict):
+        """
+        Escribe el resumen de un archivo y un registro por cada uno de sus procedures
+
+        Args:
+            nombre_archivo (str): Nombre del archivo .CodeUnit.al
+            procedures (dict): nombre_procedure -> info ya clasificados
+        """
+        repetidos = sum(1 for info in procedures.values() if info['estado'] == 'REPETIDO')
+        identicos = sum(1 for info in procedures.values() if info['contenido'] == 'IDÉNTICO')
+        divergentes = sum(1 for info in procedures.values() if info['contenido'] == 'DIVERGENTE')
+        self._escribir({
+            'tipo': 'archivo',
+            'nombre_archivo': nombre_archivo,
+            'total_procedures': len(procedures),
+            'procedures_repetidos': repetidos,
+            'procedures_unicos': len(procedures) - repetidos,
+            'procedures_identicos': identicos,
+            'procedures_divergentes': divergentes
+        })
+        for nombre_procedure, info in procedures.items():
+            self._escribir({'tipo': 'procedure', 'nombre_archivo': nombre_archivo,
+                            'nombre_procedure': nombre_procedure, **info})
+
+        self.total_archivos += 1
+        self.total_procedures += len(procedures)
+        self.procedures_repetidos += repetidos
+        self.procedures_unicos += len(procedures) - repetidos
+        self.procedures_identicos += identicos
+        self.procedures_divergentes += divergentes
+
+    def cerrar(self, estadisticas: dict = None, errores: list = None):
+        """
+        Escribe el pie con las estadísticas y cierra el archivo
+
+        Args:
+            estadisticas (dict): Estadísticas adicionales del buscador (repositorios, archivos...)
+            errores (list): Errores encontrados durante el análisis
+        """
+        if self._archivo is None:
+            return
+        self._escribir({
+            'tipo': 'estadisticas',
+            'estadisticas': {
+                **(estadisticas or {}),
+                'archivos_analizados': self.total_archivos,
+                'total_procedures': self.total_procedures,
+                'procedures_repetidos': self.procedures_repetidos,
+                'procedures_unicos': self.procedures_unicos,
+                'procedures_identicos': self.procedures_identicos,
+                'procedures_divergentes': self.procedures_divergentes
+            },
+            'errores': errores or []
+        })
+        self._archivo.close()
+        self._archivo = None
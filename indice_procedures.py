@@ -0,0 +1,145 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
+from resultados_compactos import AlmacenProcedures
+
+MODO_CONTIENE = 'contiene'
+MODO_PREFIJO = 'prefijo'
+
+
+def _resumir_procedures(todos_los_procedures):
+    """Genera (nombre_archivo, nombre_procedure, repositorios, modificadores) de cada procedure"""
+    if isinstance(todos_los_procedures, AlmacenProcedures):
+        yield from todos_los_procedures.resumir_procedures()
+        return
+    for nombre_archivo, procedures in todos_los_procedures.items():
+        for nombre_procedure, info in procedures.items():
+            apariciones = info['apariciones']
+            yield (nombre_archivo, nombre_procedure,
+                   {aparicion['repositorio'] for aparicion in apariciones},
+                   {aparicion['modificador'] for aparicion in apariciones})
+
+
+class IndiceProcedures:
+    """
+    Índice invertido sobre el resultado de analizar_todos_los_procedures
+
+    Cada procedure de cada archivo es una entrada. Los nombres se guardan en minúsculas,
+    sin repetir y ordenados: las búsquedas por prefijo son una bisección y las búsquedas
+    por subcadena un str.find sobre todos los nombres concatenados. El modificador, el
+    repositorio y el archivo se indexan como conjuntos de entradas para filtrar.
+    """
+
+    def __init__(self, todos_los_procedures, archivos_repetidos=None, archivos_unicos=None):
+        """
+        Args:
+            todos_los_procedures (dict): nombre_archivo -> nombre_procedure -> info
+            archivos_repetidos (dict): Archivos repetidos del buscador, para las rutas
+            archivos_unicos (dict): Archivos únicos del buscador, para las rutas
+        """
+        self.origen = todos_los_procedures
+        self.entradas = []  # (nombre_archivo, nombre_procedure)
+        self.por_modificador = defaultdict(set)
+        self.por_repositorio = defaultdict(set)
+        self.por_archivo = defaultdict(set)
+
+        entradas_por_nombre = defaultdict(list)
+        for nombre_archivo, nombre_procedure, repositorios, modificadores in _resumir_procedures(todos_los_procedures):
+            entrada = len(self.entradas)
+            self.entradas.append((nombre_archivo, nombre_procedure))
+            entradas_por_nombre[nombre_procedure.lower()].append(entrada)
+            self.por_archivo[nombre_archivo].add(entrada)
+            for modificador in modificadores:
+                self.por_modificador[modificador].add(entrada)
+            for repositorio in repositorios:
+                self.por_repositorio[repositorio].add(entrada)
+
+        self.nombres = sorted(entradas_por_nombre)
+        self._entradas_por_nombre = [entradas_por_nombre[nombre] for nombre in self.nombres]
+        # Nombres separados por '\n' y offset de inicio de cada uno en el texto
+        self._texto_nombres = '\n'.join(self.nombres)
+        self._offsets_nombres = []
+        posicion = 0
+        for nombre in self.nombres:
+            self._offsets_nombres.append(posicion)
+            posicion += len(nombre) + 1
+
+        # La primera aparición de cada archivo, dando prioridad a los archivos repetidos
+        self.rutas_archivo = {}
+        for archivos in (archivos_unicos or {}, archivos_repetidos or {}):
+            for nombre_archivo, info in archivos.items():
+                if info['archivos']:
+                    self.rutas_archivo[nombre_archivo] = info['archivos'][0]['archivo']['ruta_completa']
+
+    @property
+    def total_entradas(self) -> int:
+        return len(self.entradas)
+
+    @property
+    def repositorios(self) -> list:
+        return sorted(self.por_repositorio)
+
+    @property
+    def modificadores(self) -> list:
+        return sorted(self.por_modificador)
+
+    def ruta_archivo(self, nombre_archivo: str):
+        """Retorna la ruta de la primera aparición del archivo o None si no se conoce"""
+        return self.rutas_archivo.get(nombre_archivo)
+
+    def _indices_nombres(self, consulta: str, modo: str):
+        """Genera, en orden alfabético, los índices de self.nombres que encajan con la consulta"""
+        if not consulta:
+            yield from range(len(self.nombres))
+            return
+
+        if modo == MODO_PREFIJO:
+            indice = bisect_left(self.nombres, consulta)
+            while indice < len(self.nombres) and self.nombres[indice].startswith(consulta):
+                yield indice
+                indice += 1
+            return
+
+        texto = self._texto_nombres
+        posicion = texto.find(consulta)
+        while posicion != -1:
+            indice = bisect_right(self._offsets_nombres, posicion) - 1
+            yield indice
+            # Continuar desde el siguiente nombre para no repetir el actual
+            if indice + 1 >= len(self._offsets_nombres):
+                return
+            posicion = texto.find(consulta, self._offsets_nombres[indice + 1])
+
+    def buscar(self, consulta: str = "", modo: str = MODO_CONTIENE, modificador: str = None,
+               repositorio: str = None, nombre_archivo: str = None, limite: int = None) -> list:
+        """
+        Busca procedures por nombre (sin distinguir mayúsculas) y filtros opcionales
+
+        Args:
+            consulta (str): Texto a buscar en el nombre del procedure; vacío para todos
+            modo (str): MODO_CONTIENE (subcadena) o MODO_PREFIJO
+            modificador (str): Solo procedures con alguna aparición con este modificador
+            repositorio (str): Solo procedures que aparecen en este repositorio
+            nombre_archivo (str): Solo procedures de este archivo
+            limite (int): Número máximo de resultados
+
+        Returns:
+            list: (nombre_archivo, nombre_procedure) ordenados por nombre de procedure
+        """
+        filtros = []
+        if modificador is not None:
+            filtros.append(self.por_modificador.get(modificador, set()))
+        if repositorio is not None:
+            filtros.append(self.por_repositorio.get(repositorio, set()))
+        if nombre_archivo is not None:
+            filtros.append(self.por_archivo.get(nombre_archivo, set()))
+        filtros.sort(key=len)
+
+        resultados = []
+        for indice in self._indices_nombres(consulta.strip().lower(), modo):
+            for entrada in self._entradas_por_nombre[indice]:
+                if all(entrada in filtro for filtro in filtros):
+                    resultados.append(self.entradas[entrada])
+                    if limite is not None and len(resultados) >= limite:
+                        return resultados
+        return resultados
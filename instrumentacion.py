@@ -0,0 +1,139 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+
+# Etapas del análisis en el orden en que se ejecutan; 'analisis' incluye 'extraccion' y
+# 'clasificacion', que se alternan archivo a archivo
+ETAPAS = ('escaneo', 'filtrado', 'analisis', 'extraccion', 'clasificacion', 'guardado')
+FORMATO_LOG = "%(message)s"
+
+
+def configurar_logging(nivel=logging.INFO):
+    """
+    Configura el logging de consola para los scripts
+
+    Con INFO solo se muestran las etapas y los totales; con DEBUG también un mensaje por
+    repositorio, carpeta LLB y archivo, como hacían los print originales.
+    """
+    logging.basicConfig(level=nivel, format=FORMATO_LOG)
+
+
+class Instrumentacion:
+    """
+    Tiempos y contadores del análisis por etapa y por repositorio
+
+    Las etapas se miden con el contexto etapa() o sumando tiempos con acumular() cuando
+    se ejecutan intercaladas (la extracción y la clasificación se alternan archivo a
+    archivo). Opcionalmente perfila las etapas con cProfile y mide su pico de memoria
+    con tracemalloc; ambas cosas ralentizan el análisis, así que están desactivadas
+    por defecto.
+
+    tracemalloc es global al proceso: el pico de memoria solo es fiable si no hay otros
+    análisis en marcha a la vez (en el dashboard, varias sesiones o trabajos), porque
+    incluye sus reservas y cualquiera de ellos puede reiniciarlo.
+    """
+
+    def __init__(self, perfilar: bool = False, medir_memoria: bool = False):
+        """
+        Args:
+            perfilar (bool): Si es True las etapas se ejecutan bajo cProfile
+            medir_memoria (bool): Si es True se registra el pico de memoria de cada etapa
+        """
+        self.perfilar = perfilar
+        self.medir_memoria = medir_memoria
+        self.etapas = {}
+        self.contadores = defaultdict(int)
+        self.repositorios = {}
+        self._perfil = cProfile.Profile() if perfilar else None
+        self._profundidad = 0
+        self._inicio_tracemalloc = False
+
+    def _etapa(self, nombre: str) -> dict:
+        if nombre not in self.etapas:
+            self.etapas[nombre] = {'segundos': 0.0, 'llamadas': 0}
+        return self.etapas[nombre]
+
+    @contextmanager
+    def etapa(self, nombre: str):
+        """Mide el bloque como (una llamada a) la etapa 'nombre'"""
+        exterior = self._profundidad == 0
+        self._profundidad += 1
+        if self.medir_memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._inicio_tracemalloc = True
+            tracemalloc.reset_peak()
+        if self._perfil is not None and exterior:
+            self._perfil.enable()
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            if self._perfil is not None and exterior:
+                self._perfil.disable()
+            self._profundidad -= 1
+            self.acumular(nombre, segundos)
+            if self.medir_memoria:
+                datos = self._etapa(nombre)
+                datos['pico_memoria'] = max(datos.get('pico_memoria', 0), tracemalloc.get_traced_memory()[1])
+                if exterior and self._inicio_tracemalloc:
+                    # Solo se detiene el tracemalloc que arrancó esta instancia
+                    tracemalloc.stop()
+                    self._inicio_tracemalloc = False
+
+    def acumular(self, nombre: str, segundos: float, llamadas: int = 1):
+        """Suma tiempo a una etapa medida fuera de etapa()"""
+        datos = self._etapa(nombre)
+        datos['segundos'] += segundos
+        datos['llamadas'] += llamadas
+
+    def contar(self, nombre: str, cantidad: int = 1):
+        self.contadores[nombre] += cantidad
+
+    def registrar_repositorio(self, repositorio: str, **valores):
+        """
+        Suma valores a los contadores de un repositorio
+
+        Args:
+            repositorio (str): Nombre del repositorio
+            **valores: Contadores a sumar (p. ej. segundos_escaneo, archivos, bytes_leidos)
+        """
+        datos = self.repositorios.setdefault(repositorio, defaultdict(int))
+        for nombre, valor in valores.items():
+            datos[nombre] += valor
+
+    def texto_perfil(self, limite: int = 30, orden: str = 'cumulative') -> str:
+        """Las 'limite' funciones más costosas según cProfile, o una cadena vacía si no se perfila"""
+        if self._perfil is None:
+            return ""
+        salida = io.StringIO()
+        pstats.Stats(self._perfil, stream=salida).sort_stats(orden).print_stats(limite)
+        return salida.getvalue()
+
+    def resumen(self) -> dict:
+        """
+        Métricas en tipos básicos, listas para JSON o para el dashboard
+
+        Returns:
+            dict: 'etapas', 'contadores', 'repositorios' y los ritmos de extracción
+                ('archivos_por_segundo' y 'mb_por_segundo')
+        """
+        etapas = {nombre: dict(self.etapas[nombre]) for nombre in ETAPAS if nombre in self.etapas}
+        etapas.update({nombre: dict(datos) for nombre, datos in self.etapas.items() if nombre not in etapas})
+
+        segundos_extraccion = self.etapas.get('extraccion', {}).get('segundos', 0.0)
+        archivos = self.contadores.get('archivos_procesados', 0)
+        bytes_leidos = self.contadores.get('bytes_leidos', 0)
+        return {
+            'etapas': etapas,
+            'contadores': dict(self.contadores),
+            'repositorios': {repositorio: dict(datos) for repositorio, datos in self.repositorios.items()},
+            'archivos_por_segundo': archivos / segundos_extraccion if segundos_extraccion else 0.0,
+            'mb_por_segundo': bytes_leidos / 2**20 / segundos_extraccion if segundos_extraccion else 0.0
+        }
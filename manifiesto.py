@@ -0,0 +1,347 @@
+from pathlib import Path
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from cache_contenido import cache_contenido
+
+VERSION_MANIFIESTO = 6
+NOMBRE_MANIFIESTO = "manifiesto_procedures.sqlite3"
+# Entradas nuevas o modificadas que se acumulan en memoria antes de escribirlas en una transacción
+MAX_PENDIENTES = 500
+
+logger = logging.getLogger(__name__)
+
+
+class ManifiestoProcedures:
+    """
+    Manifiesto en SQLite con los procedures extraídos de cada archivo .CodeUnit.al
+
+    Cada fila está indexada por 'ruta_completa' y guarda el tamaño, la fecha de
+    modificación y el hash del texto junto con la salida de
+    extraer_procedures_de_archivo en JSON. Un archivo se reutiliza si su tamaño y
+    fecha no han cambiado o, si cambiaron, cuando su hash sigue siendo el mismo. Una
+    entrada extraída sin cuerpos (sin linea_fin ni huella) no sirve cuando se piden.
+
+    Las filas se leen de una en una cuando se consultan y solo se escriben las
+    entradas nuevas o modificadas: se acumulan en memoria y se vuelcan en una
+    transacción cada MAX_PENDIENTES entradas y en guardar().
+
+    Un mismo manifiesto lo pueden usar varios análisis a la vez (el dashboard lo
+    comparte entre sesiones): la conexión y las entradas pendientes se protegen con un
+    lock y los archivos vistos y los contadores de cada análisis viven en su
+    AnalisisManifiesto.
+    """
+
+    def __init__(self, directorio_cache, verificar_hash=False):
+        """
+        Args:
+            directorio_cache (str): Carpeta donde se guarda el manifiesto
+            verificar_hash (bool): Si es True, se comprueba siempre el hash aunque
+                coincidan tamaño y fecha de modificación
+        """
+        self.directorio_cache = Path(directorio_cache)
+        self.ruta_manifiesto = self.directorio_cache / NOMBRE_MANIFIESTO
+        self.verificar_hash = verificar_hash
+        # ruta -> entrada pendiente de escribir ('procedures' None si solo cambian los metadatos)
+        self._pendientes = {}
+        self._lock = threading.Lock()
+
+        self.directorio_cache.mkdir(parents=True, exist_ok=True)
+        self._conexion = sqlite3.connect(str(self.ruta_manifiesto), check_same_thread=False)
+        self.cargar()
+
+    def cargar(self):
+        """Prepara la tabla del manifiesto, descartándolo si es de otra versión"""
+        with self._lock, self._conexion:
+            self._conexion.execute("PRAGMA journal_mode=WAL")
+            version = self._conexion.execute("PRAGMA user_version").fetchone()[0]
+            if version != VERSION_MANIFIESTO:
+                if version:
+                    logger.warning("⚠️ Manifiesto de otra versión (%s), se reconstruirá", version)
+                self._conexion.execute("DROP TABLE IF EXISTS archivos")
+                self._conexion.execute(f"PRAGMA user_version = {VERSION_MANIFIESTO}")
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS archivos (
+                    ruta TEXT PRIMARY KEY,
+                    tamano INTEGER NOT NULL,
+                    modificado TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    cuerpos INTEGER NOT NULL,
+                    procedures TEXT NOT NULL
+                )
+            """)
+
+    def iniciar_analisis(self):
+        """Devuelve un AnalisisManifiesto nuevo para recorrer los archivos de un análisis"""
+        return AnalisisManifiesto(self)
+
+    def _leer_metadatos(self, ruta):
+        """(tamaño, modificado, hash, cuerpos) de la entrada de 'ruta' o None. Se llama con el lock"""
+        pendiente = self._pendientes.get(ruta)
+        if pendiente is not None:
+            return pendiente['tamaño'], pendiente['modificado'], pendiente['hash'], pendiente['cuerpos']
+        return self._conexion.execute(
+            "SELECT tamano, modificado, hash, cuerpos FROM archivos WHERE ruta = ?", (ruta,)
+        ).fetchone()
+
+    def _comprobar_entrada(self, archivo, obtener_hash, cuerpos=False):
+        """
+        Comprueba si la entrada del archivo sigue siendo válida, sin leer sus procedures
+
+        Args:
+            archivo (dict): Información del archivo tal como la genera buscar_archivos
+            obtener_hash (callable): Devuelve el hash del contenido actual o None si no se puede leer
+            cuerpos (bool): Si es True solo vale una entrada extraída con cuerpos
+
+        Returns:
+            tuple: (True si es válida, hash calculado o None)
+        """
+        ruta = archivo['ruta_completa']
+        with self._lock:
+            metadatos = self._leer_metadatos(ruta)
+        if metadatos is None:
+            # Archivo nuevo: no hay con qué comparar, así que no se lee; el hash se calcula al extraerlo
+            return False, None
+
+        tamaño, modificado, hash_entrada, con_cuerpos = metadatos
+        if cuerpos and not con_cuerpos:
+            # Hay que volver a extraerlo de todos modos: no merece la pena leerlo para el hash
+            return False, None
+        mismos_metadatos = tamaño == archivo['tamaño'] and modificado == archivo['modificado']
+        if mismos_metadatos and not self.verificar_hash:
+            return True, None
+
+        # El hash se calcula fuera del lock: puede suponer leer el archivo de disco
+        hash_contenido = obtener_hash()
+        if hash_contenido is None or hash_entrada != hash_contenido:
+            return False, hash_contenido
+
+        if not mismos_metadatos:
+            # Contenido idéntico (p. ej. tras un checkout): solo se actualizan los metadatos
+            with self._lock:
+                pendiente = self._pendientes.get(ruta)
+                if pendiente is None:
+                    pendiente = self._pendientes[ruta] = {'hash': hash_entrada, 'cuerpos': con_cuerpos,
+                                                          'procedures': None}
+                pendiente['tamaño'] = archivo['tamaño']
+                pendiente['modificado'] = archivo['modificado']
+                self._volcar_si_lleno()
+        return True, hash_contenido
+
+    def _leer_procedures(self, ruta):
+        """Procedures guardados de 'ruta', o None si la entrada ya no existe"""
+        with self._lock:
+            pendiente = self._pendientes.get(ruta)
+            if pendiente is not None and pendiente['procedures'] is not None:
+                return pendiente['procedures']
+            fila = self._conexion.execute(
+                "SELECT procedures FROM archivos WHERE ruta = ?", (ruta,)
+            ).fetchone()
+        return json.loads(fila[0]) if fila is not None else None
+
+    def _registrar_entrada(self, archivo, hash_contenido, procedures, cuerpos):
+        with self._lock:
+            self._pendientes[archivo['ruta_completa']] = {
+                'tamaño': archivo['tamaño'],
+                'modificado': archivo['modificado'],
+                'hash': hash_contenido,
+                'cuerpos': cuerpos,
+                'procedures': procedures
+            }
+            self._volcar_si_lleno()
+
+    def _volcar_si_lleno(self):
+        """Escribe las entradas pendientes si ya hay MAX_PENDIENTES. Se llama con el lock"""
+        if len(self._pendientes) >= MAX_PENDIENTES:
+            try:
+                self._volcar()
+            except sqlite3.Error as e:
+                # Se reintentará en el siguiente volcado o en guardar()
+                logger.warning("⚠️ No se pudo escribir el manifiesto: %s", e)
+
+    def _volcar(self):
+        """Escribe las entradas pendientes en una transacción. Se llama con el lock"""
+        if not self._pendientes:
+            return
+        completas = []
+        metadatos = []
+        for ruta, entrada in self._pendientes.items():
+            if entrada['procedures'] is None:
+                metadatos.append((entrada['tamaño'], entrada['modificado'], ruta))
+            else:
+                completas.append((ruta, entrada['tamaño'], entrada['modificado'], entrada['hash'],
+                                  int(entrada['cuerpos']),
+                                  json.dumps(entrada['procedures'], ensure_ascii=False, separators=(',', ':'))))
+        with self._conexion:
+            self._conexion.executemany(
+                "INSERT OR REPLACE INTO archivos (ruta, tamano, modificado, hash, cuerpos, procedures) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                completas
+            )
+            self._conexion.executemany("UPDATE archivos SET tamano = ?, modificado = ? WHERE ruta = ?",
+                                       metadatos)
+        self._pendientes.clear()
+
+    def podar(self, prefijo, vistos):
+        """
+        Elimina las entradas bajo 'prefijo' que no se han visto en un análisis
+
+        Args:
+            prefijo (str): Carpeta de repositorios analizada
+            vistos (set): Rutas que ha recorrido ese análisis (AnalisisManifiesto.vistos)
+        """
+        prefijo = os.path.join(str(prefijo), '')
+        with self._lock:
+            self._volcar()
+            # Rango equivalente a startswith(prefijo) que aprovecha el índice de la clave
+            obsoletas = [(ruta,) for (ruta,) in self._conexion.execute(
+                "SELECT ruta FROM archivos WHERE ruta >= ? AND ruta < ?", (prefijo, prefijo + '\U0010ffff')
+            ) if ruta.startswith(prefijo) and ruta not in vistos]
+            with self._conexion:
+                self._conexion.executemany("DELETE FROM archivos WHERE ruta = ?", obsoletas)
+        return len(obsoletas)
+
+    def guardar(self):
+        """Escribe en disco las entradas nuevas o modificadas"""
+        with self._lock:
+            self._volcar()
+
+    def total_entradas(self) -> int:
+        with self._lock:
+            self._volcar()
+            return self._conexion.execute("SELECT COUNT(*) FROM archivos").fetchone()[0]
+
+
+class AnalisisManifiesto:
+    """
+    Uso de un ManifiestoProcedures durante un análisis
+
+    Guarda los archivos vistos (para podar las entradas de los que ya no existen), los
+    hashes calculados de los archivos que hay que volver a extraer y los aciertos y
+    fallos de este análisis, sin afectar a otros análisis que usen el mismo manifiesto.
+    """
+
+    def __init__(self, manifiesto: ManifiestoProcedures):
+        self.manifiesto = manifiesto
+        self.vistos = set()
+        self.hashes_pendientes = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener_procedures(self, archivo, extraer, cuerpos=False):
+        """
+        Devuelve los procedures de un archivo, reutilizando el manifiesto si no ha cambiado
+
+        Args:
+            archivo (dict): Información del archivo tal como la genera buscar_archivos
+            extraer (callable): Función que recibe la ruta y devuelve sus procedures y
+                si la extracción fue correcta (solo entonces se guarda en el manifiesto)
+            cuerpos (bool): Si 'extraer' calcula los cuerpos (y hacen falta)
+
+        Returns:
+            dict: Procedures del archivo
+        """
+        procedures = self.buscar(archivo, cuerpos)
+        if procedures is not None:
+            return procedures
+
+        procedures, correcto = extraer(archivo['ruta_completa'])
+        if correcto:
+            self.registrar(archivo, procedures, cuerpos=cuerpos)
+        return procedures
+
+    def buscar(self, archivo, cuerpos=False):
+        """
+        Busca los procedures de un archivo en el manifiesto
+
+        Args:
+            archivo (dict): Información del archivo tal como la genera buscar_archivos
+            cuerpos (bool): Si es True solo vale una entrada extraída con cuerpos
+
+        Returns:
+            dict: Procedures del archivo, o None si hay que extraerlos de nuevo
+        """
+        if not self.comprobar(archivo, cuerpos):
+            return None
+        return self.leer(archivo)
+
+    def comprobar(self, archivo, cuerpos=False):
+        """
+        Comprueba si el manifiesto tiene una entrada válida del archivo, sin leer sus procedures
+
+        Cuenta el acierto o el fallo; los procedures se obtienen después con leer().
+
+        Args:
+            archivo (dict): Información del archivo tal como la genera buscar_archivos
+            cuerpos (bool): Si es True solo vale una entrada extraída con cuerpos
+
+        Returns:
+            bool: True si se puede reutilizar, False si hay que extraerlo de nuevo
+        """
+        ruta = archivo['ruta_completa']
+        self.vistos.add(ruta)
+
+        def obtener_hash():
+            try:
+                # El texto queda en la cache compartida y el extractor no vuelve a leerlo
+                return cache_contenido.obtener(ruta).hash
+            except (OSError, UnicodeDecodeError):
+                return None
+
+        valida, hash_contenido = self.manifiesto._comprobar_entrada(archivo, obtener_hash, cuerpos)
+        if valida:
+            self.aciertos += 1
+            return True
+
+        self.fallos += 1
+        if hash_contenido is not None:
+            self.hashes_pendientes[ruta] = hash_contenido
+        return False
+
+    def leer(self, archivo):
+        """
+        Procedures de un archivo que comprobar() dio por válido
+
+        Returns:
+            dict: Procedures del archivo, o None si otro análisis ha eliminado la entrada
+        """
+        return self.manifiesto._leer_procedures(archivo['ruta_completa'])
+
+    def registrar(self, archivo, procedures, hash_contenido=None, cuerpos=False):
+        """
+        Guarda los procedures recién extraídos de un archivo que buscar() no encontró
+
+        Args:
+            archivo (dict): Información del archivo tal como la genera buscar_archivos
+            procedures (dict): Procedures extraídos
+            hash_contenido (str): Hash del texto del que se extrajeron (p. ej. calculado
+                en un worker). Si no se indica se usa el que calculó buscar() o, si no
+                llegó a calcularlo, el del contenido en cache_contenido
+            cuerpos (bool): Si se extrajeron con cuerpos
+        """
+        ruta = archivo['ruta_completa']
+        hash_pendiente = self.hashes_pendientes.pop(ruta, None)
+        if hash_contenido is None:
+            hash_contenido = hash_pendiente
+        if hash_contenido is None:
+            try:
+                # Recién extraído, el texto suele estar todavía en la cache
+                hash_contenido = cache_contenido.obtener(ruta).hash
+            except (OSError, UnicodeDecodeError):
+                return
+        self.manifiesto._registrar_entrada(archivo, hash_contenido, procedures, cuerpos)
+
+    def podar(self, prefijo):
+        """Elimina del manifiesto las entradas bajo 'prefijo' que este análisis no ha visto"""
+        return self.manifiesto.podar(prefijo, self.vistos)
+
+    def obtener_estadisticas(self):
+        """Retorna los aciertos y fallos de este análisis"""
+        return {
+            'archivos_en_manifiesto': self.manifiesto.total_entradas(),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos
+        }
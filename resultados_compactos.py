@@ -0,0 +1,371 @@
+from array import array
+from collections.abc import Mapping
+
+ESTADOS = ('REPETIDO', 'ÚNICO')
+CONTENIDOS = ('IDÉNTICO', 'DIVERGENTE', 'ÚNICO')
+
+# Columnas por aparición, que se pueden cargar de forma diferida
+COLUMNAS_APARICION = ('_repositorio', '_ruta', '_linea', '_numero_linea', '_linea_fin', '_modificador', '_nombre',
+                      '_huella')
+# Columnas por procedure, siempre cargadas: bastan para listar y contar
+COLUMNAS_GRUPO = ('_grupo_clave', '_grupo_inicio', '_grupo_estado', '_grupo_repositorios', '_grupo_contenido',
+                  '_grupo_variantes')
+# Tipo de cada columna en el módulo array ('i' = entero de 32 bits en todas las plataformas)
+TIPOS_COLUMNA = {'_grupo_estado': 'b', '_grupo_contenido': 'b'}
+
+
+def agrupar_por_huella(apariciones: list) -> list:
+    """
+    Agrupa las apariciones de un procedure por la huella de su cuerpo
+
+    Returns:
+        list: Un dict por versión distinta del cuerpo con 'huella', 'repositorios' (en orden
+            de primera aparición) y 'total_apariciones', de la más a la menos frecuente
+    """
+    grupos = {}
+    for aparicion in apariciones:
+        huella = aparicion.get('huella', '')
+        grupo = grupos.get(huella)
+        if grupo is None:
+            grupo = grupos[huella] = {'huella': huella, 'repositorios': [], 'total_apariciones': 0}
+        if aparicion['repositorio'] not in grupo['repositorios']:
+            grupo['repositorios'].append(aparicion['repositorio'])
+        grupo['total_apariciones'] += 1
+    return sorted(grupos.values(), key=lambda grupo: -grupo['total_apariciones'])
+
+
+class TablaCadenas:
+    """Tabla de cadenas internadas: cada cadena distinta se guarda una vez y se referencia por id"""
+
+    __slots__ = ('_ids', 'cadenas')
+
+    def __init__(self):
+        self._ids = {}
+        self.cadenas = []
+
+    def id(self, cadena: str) -> int:
+        identificador = self._ids.get(cadena)
+        if identificador is None:
+            identificador = len(self.cadenas)
+            self._ids[cadena] = identificador
+            self.cadenas.append(cadena)
+        return identificador
+
+    def __getitem__(self, identificador: int) -> str:
+        return self.cadenas[identificador]
+
+    def __len__(self):
+        return len(self.cadenas)
+
+
+class AlmacenProcedures(Mapping):
+    """
+    Resultado de analizar_todos_los_procedures en formato columnar compacto
+
+    Cada aparición de un procedure es una fila de varias columnas array('i') con ids de
+    una tabla de cadenas internadas (repositorio, ruta, línea, modificador...), de modo que
+    los textos repetidos entre repositorios se guardan una sola vez. Las filas de un mismo
+    procedure son consecutivas y los procedures de un archivo también, así que basta con
+    guardar dónde empieza cada grupo.
+
+    Se comporta como el diccionario nombre_archivo -> nombre_procedure -> info de siempre:
+    las vistas de cada archivo y la información de cada procedure se construyen al acceder
+    a ellas. El estado y el total de repositorios de cada procedure están en columnas
+    propias, así que contar y listar no necesita el detalle de las apariciones.
+
+    Las columnas solo crecen: al reemplazar o eliminar un archivo sus filas quedan
+    huérfanas hasta que se llama a compactar().
+    """
+
+    def __init__(self):
+        self.cadenas = TablaCadenas()
+        for columna in COLUMNAS_APARICION + COLUMNAS_GRUPO:
+            setattr(self, columna, array(TIPOS_COLUMNA.get(columna, 'i')))
+        self._grupo_inicio.append(0)
+        # nombre_archivo -> (primer grupo, último grupo + 1)
+        self._archivos = {}
+        # Procedures de archivos reemplazados o eliminados que siguen en las columnas
+        self._grupos_huerfanos = 0
+        # Función que devuelve las columnas por aparición cuando se cargan de forma diferida
+        self._cargar_apariciones = None
+
+    @classmethod
+    def desde_columnas(cls, cadenas: list, archivos: dict, columnas_grupo: dict, cargar_apariciones) -> 'AlmacenProcedures':
+        """
+        Reconstruye un almacén a partir de sus columnas (ver columnas())
+
+        Args:
+            cadenas (list): Tabla de cadenas internadas
+            archivos (dict): nombre_archivo -> (primer grupo, último grupo + 1)
+            columnas_grupo (dict): Columnas por procedure
+            cargar_apariciones (callable): Devuelve las columnas por aparición; solo se
+                llama la primera vez que se necesita el detalle de las apariciones
+        """
+        almacen = cls()
+        for cadena in cadenas:
+            almacen.cadenas.id(cadena)
+        almacen._archivos = dict(archivos)
+        for columna in COLUMNAS_GRUPO:
+            setattr(almacen, columna, columnas_grupo[columna])
+        almacen._cargar_apariciones = cargar_apariciones
+        almacen._grupos_huerfanos = len(almacen._grupo_clave) - sum(
+            fin_grupos - primer_grupo for primer_grupo, fin_grupos in almacen._archivos.values()
+        )
+        return almacen
+
+    def _asegurar_apariciones(self):
+        if self._cargar_apariciones is not None:
+            columnas = self._cargar_apariciones()
+            for columna in COLUMNAS_APARICION:
+                setattr(self, columna, columnas[columna])
+            self._cargar_apariciones = None
+
+    def rangos_archivos(self) -> dict:
+        """Retorna nombre_archivo -> (primer grupo, último grupo + 1)"""
+        return dict(self._archivos)
+
+    def columnas(self) -> dict:
+        """Retorna todas las columnas (por aparición y por procedure) por nombre"""
+        self._asegurar_apariciones()
+        return {columna: getattr(self, columna) for columna in COLUMNAS_APARICION + COLUMNAS_GRUPO}
+
+    def agregar_archivo(self, nombre_archivo: str, procedures_del_archivo: dict):
+        """
+        Añade los procedures ya clasificados de un archivo
+
+        Args:
+            nombre_archivo (str): Nombre del archivo .CodeUnit.al
+            procedures_del_archivo (dict): nombre_procedure -> info, tal como lo genera
+                BuscadorCodeunit._clasificar_archivo
+        """
+        self._asegurar_apariciones()
+        if nombre_archivo in self._archivos:
+            anterior_inicio, anterior_fin = self._archivos[nombre_archivo]
+            self._grupos_huerfanos += anterior_fin - anterior_inicio
+        id_cadena = self.cadenas.id
+        primer_grupo = len(self._grupo_clave)
+
+        for nombre_procedure, info in procedures_del_archivo.items():
+            for aparicion in info['apariciones']:
+                self._repositorio.append(id_cadena(aparicion['repositorio']))
+                self._ruta.append(id_cadena(aparicion['ruta_archivo']))
+                self._linea.append(id_cadena(aparicion['linea']))
+                self._numero_linea.append(aparicion['numero_linea'])
+                self._linea_fin.append(aparicion.get('linea_fin') or 0)
+                self._modificador.append(id_cadena(aparicion['modificador']))
+                self._nombre.append(id_cadena(aparicion['nombre']))
+                self._huella.append(id_cadena(aparicion.get('huella', '')))
+
+            self._grupo_clave.append(id_cadena(nombre_procedure))
+            self._grupo_estado.append(ESTADOS.index(info['estado']))
+            self._grupo_repositorios.append(info['total_repositorios'])
+            self._grupo_contenido.append(CONTENIDOS.index(info['contenido']))
+            self._grupo_variantes.append(info['variantes'])
+            self._grupo_inicio.append(len(self._repositorio))
+
+        self._archivos[nombre_archivo] = (primer_grupo, len(self._grupo_clave))
+
+    def __setitem__(self, nombre_archivo: str, procedures_del_archivo: dict):
+        # Permite usar el almacén donde antes se asignaba resultado_final[nombre_archivo]
+        self.agregar_archivo(nombre_archivo, procedures_del_archivo)
+
+    def __delitem__(self, nombre_archivo: str):
+        primer_grupo, fin_grupos = self._archivos.pop(nombre_archivo)
+        self._grupos_huerfanos += fin_grupos - primer_grupo
+
+    def compactar(self, umbral: float = 0.0) -> bool:
+        """
+        Reconstruye las columnas sin las filas de archivos reemplazados o eliminados
+
+        Las vistas y los InfoProcedure obtenidos antes de compactar dejan de ser válidos.
+
+        Args:
+            umbral (float): Solo se compacta si los procedures huérfanos superan esta
+                fracción del total
+
+        Returns:
+            bool: True si se ha compactado
+        """
+        if not self._grupos_huerfanos or self._grupos_huerfanos <= umbral * len(self._grupo_clave):
+            return False
+        compacto = AlmacenProcedures()
+        for nombre_archivo, vista in self.items():
+            compacto.agregar_archivo(nombre_archivo, {nombre_procedure: dict(info)
+                                                      for nombre_procedure, info in vista.items()})
+        self.__dict__.update(compacto.__dict__)
+        return True
+
+    @property
+    def total_apariciones(self) -> int:
+        return self._grupo_inicio[-1]
+
+    def _aparicion(self, fila: int) -> dict:
+        cadenas = self.cadenas
+        return {
+            'repositorio': cadenas[self._repositorio[fila]],
+            'linea': cadenas[self._linea[fila]],
+            'numero_linea': self._numero_linea[fila],
+            'linea_fin': self._linea_fin[fila] or None,
+            'ruta_archivo': cadenas[self._ruta[fila]],
+            'modificador': cadenas[self._modificador[fila]],
+            'nombre': cadenas[self._nombre[fila]],
+            'huella': cadenas[self._huella[fila]]
+        }
+
+    def _apariciones(self, grupo: int) -> list:
+        self._asegurar_apariciones()
+        filas = range(self._grupo_inicio[grupo], self._grupo_inicio[grupo + 1])
+        return [self._aparicion(fila) for fila in filas]
+
+    def _procedure(self, grupo: int) -> 'InfoProcedure':
+        return InfoProcedure(self, grupo)
+
+    def __getitem__(self, nombre_archivo: str) -> 'VistaArchivo':
+        primer_grupo, fin_grupos = self._archivos[nombre_archivo]
+        return VistaArchivo(self, primer_grupo, fin_grupos)
+
+    def __iter__(self):
+        return iter(self._archivos)
+
+    def __len__(self):
+        return len(self._archivos)
+
+    def __contains__(self, nombre_archivo):
+        return nombre_archivo in self._archivos
+
+    def resumir_procedures(self):
+        """
+        Genera (nombre_archivo, nombre_procedure, repositorios, modificadores) de cada procedure
+        leyendo directamente las columnas, sin construir el diccionario de cada aparición
+        """
+        self._asegurar_apariciones()
+        cadenas = self.cadenas.cadenas
+        inicio, claves = self._grupo_inicio, self._grupo_clave
+        repositorio, modificador = self._repositorio, self._modificador
+        for nombre_archivo, (primer_grupo, fin_grupos) in self._archivos.items():
+            for grupo in range(primer_grupo, fin_grupos):
+                filas = range(inicio[grupo], inicio[grupo + 1])
+                yield (nombre_archivo, cadenas[claves[grupo]],
+                       {cadenas[repositorio[fila]] for fila in filas},
+                       {cadenas[modificador[fila]] for fila in filas})
+
+    def contar_procedures(self, nombre_archivo: str = None) -> dict:
+        """Cuenta procedures repetidos, únicos, idénticos y divergentes sin construir ningún diccionario"""
+        if nombre_archivo is None and self._grupos_huerfanos:
+            totales = [self.contar_procedures(nombre) for nombre in self._archivos]
+            return {clave: sum(total[clave] for total in totales)
+                    for clave in ('total', 'REPETIDO', 'ÚNICO', 'IDÉNTICO', 'DIVERGENTE')}
+        if nombre_archivo is None:
+            estados, contenidos = self._grupo_estado, self._grupo_contenido
+        else:
+            primer_grupo, fin_grupos = self._archivos[nombre_archivo]
+            estados = self._grupo_estado[primer_grupo:fin_grupos]
+            contenidos = self._grupo_contenido[primer_grupo:fin_grupos]
+        repetidos = estados.count(ESTADOS.index('REPETIDO'))
+        return {
+            'total': len(estados),
+            'REPETIDO': repetidos,
+            'ÚNICO': len(estados) - repetidos,
+            'IDÉNTICO': contenidos.count(CONTENIDOS.index('IDÉNTICO')),
+            'DIVERGENTE': contenidos.count(CONTENIDOS.index('DIVERGENTE'))
+        }
+
+    def a_diccionario(self) -> dict:
+        """Convierte el almacén al diccionario anidado clásico"""
+        return {
+            nombre_archivo: {nombre_procedure: dict(info) for nombre_procedure, info in vista.items()}
+            for nombre_archivo, vista in self.items()
+        }
+
+
+class VistaArchivo(Mapping):
+    """Vista perezosa nombre_procedure -> info de los procedures de un archivo"""
+
+    __slots__ = ('_almacen', '_primer_grupo', '_fin_grupos', '_grupos_por_clave')
+
+    def __init__(self, almacen: AlmacenProcedures, primer_grupo: int, fin_grupos: int):
+        self._almacen = almacen
+        self._primer_grupo = primer_grupo
+        self._fin_grupos = fin_grupos
+        self._grupos_por_clave = None
+
+    def _indice(self) -> dict:
+        if self._grupos_por_clave is None:
+            cadenas = self._almacen.cadenas
+            claves = self._almacen._grupo_clave
+            self._grupos_por_clave = {
+                cadenas[claves[grupo]]: grupo for grupo in range(self._primer_grupo, self._fin_grupos)
+            }
+        return self._grupos_por_clave
+
+    def __getitem__(self, nombre_procedure: str) -> dict:
+        return self._almacen._procedure(self._indice()[nombre_procedure])
+
+    def __iter__(self):
+        cadenas = self._almacen.cadenas
+        claves = self._almacen._grupo_clave
+        for grupo in range(self._primer_grupo, self._fin_grupos):
+            yield cadenas[claves[grupo]]
+
+    def __len__(self):
+        return self._fin_grupos - self._primer_grupo
+
+    def __contains__(self, nombre_procedure):
+        return nombre_procedure in self._indice()
+
+    def items(self):
+        # Recorrido secuencial sin pasar por el índice de claves
+        cadenas = self._almacen.cadenas
+        claves = self._almacen._grupo_clave
+        for grupo in range(self._primer_grupo, self._fin_grupos):
+            yield cadenas[claves[grupo]], self._almacen._procedure(grupo)
+
+    def values(self):
+        for _, info in self.items():
+            yield info
+
+
+class InfoProcedure(Mapping):
+    """
+    Información de un procedure con las mismas claves que el diccionario original
+
+    'estado', 'contenido', 'total_repositorios' y 'variantes' se leen directamente de las
+    columnas por procedure; el resto se construye a partir de las apariciones, que se
+    cargan la primera vez que se piden.
+    """
+
+    __slots__ = ('_almacen', '_grupo', '_apariciones')
+
+    CLAVES = ('estado', 'contenido', 'repositorios', 'total_repositorios', 'variantes', 'grupos_huella',
+              'apariciones')
+
+    def __init__(self, almacen: AlmacenProcedures, grupo: int):
+        self._almacen = almacen
+        self._grupo = grupo
+        self._apariciones = None
+
+    def __getitem__(self, clave: str):
+        if clave == 'estado':
+            return ESTADOS[self._almacen._grupo_estado[self._grupo]]
+        if clave == 'contenido':
+            return CONTENIDOS[self._almacen._grupo_contenido[self._grupo]]
+        if clave == 'total_repositorios':
+            return self._almacen._grupo_repositorios[self._grupo]
+        if clave == 'variantes':
+            return self._almacen._grupo_variantes[self._grupo]
+        if clave not in self.CLAVES:
+            raise KeyError(clave)
+        if self._apariciones is None:
+            self._apariciones = self._almacen._apariciones(self._grupo)
+        if clave == 'apariciones':
+            return self._apariciones
+        if clave == 'grupos_huella':
+            return agrupar_por_huella(self._apariciones)
+        # Repositorios en orden de primera aparición
+        return list(dict.fromkeys(aparicion['repositorio'] for aparicion in self._apariciones))
+
+    def __iter__(self):
+        return iter(self.CLAVES)
+
+    def __len__(self):
+        return len(self.CLAVES)
@@ -0,0 +1,239 @@
+from collections import defaultdict
+import re
+import zlib
+
+from cache_contenido import cache_contenido
+from tablesScript import extraer_procedures_de_contenido
+
+# Tokens de AL: comentarios (se descartan), cadenas, identificadores/números y símbolos
+PATRON_TOKEN = re.compile(r"//[^\n]*|/\*.*?\*/|'(?:[^'\n]|'')*'|\"[^\"\n]*\"|\w+|[^\s\w]", re.DOTALL)
+MASCARA_64 = (1 << 64) - 1
+# Separación entre cubetas vacías y la cubeta de la que toman prestado el valor
+DESPLAZAMIENTO_DENSIFICACION = 0x9E3779B97F4A7C15
+
+
+def tokenizar(texto: str) -> list:
+    """
+    Tokens del cuerpo de un procedure en minúsculas, sin comentarios ni el nombre del
+    procedure, para que las copias renombradas se parezcan a su original
+    """
+    tokens = [token for token in PATRON_TOKEN.findall(texto.lower()) if not token.startswith(('//', '/*'))]
+    if 'procedure' in tokens[:3]:
+        posicion_nombre = tokens.index('procedure') + 1
+        del tokens[posicion_nombre:posicion_nombre + 1]
+    return tokens
+
+
+class IndiceSimilitud:
+    """
+    Detector de cuerpos casi iguales con MinHash y locality-sensitive hashing (LSH)
+
+    Cada cuerpo se convierte en el conjunto de sus shingles (secuencias de
+    'tamaño_shingle' tokens consecutivos). La firma MinHash se calcula con una sola
+    permutación repartida en cubetas (one permutation hashing) y densificación por
+    rotación para las cubetas vacías, así que cuesta O(shingles) por cuerpo en vez de
+    O(shingles * permutaciones). La proporción de posiciones iguales entre dos firmas
+    estima la similitud de Jaccard.
+
+    La firma se divide en bandas; dos cuerpos son candidatos si coinciden en alguna
+    banda completa, de modo que solo se comparan cuerpos parecidos y el coste no crece
+    con el cuadrado del número de procedures.
+    """
+
+    def __init__(self, num_permutaciones: int = 128, bandas: int = 32, tamaño_shingle: int = 5,
+                 min_shingles: int = 8, max_cubeta: int = 200):
+        """
+        Args:
+            num_permutaciones (int): Longitud de la firma MinHash
+            bandas (int): Bandas LSH; con 128/32 (4 filas por banda) se detectan con alta
+                probabilidad los pares con similitud mayor que ~0.5
+            tamaño_shingle (int): Tokens por shingle
+            min_shingles (int): Los cuerpos con menos shingles (p. ej. getters de una línea)
+                no se indexan, porque casi cualquier par parecería similar
+            max_cubeta (int): Las cubetas LSH con más cuerpos se ignoran al buscar
+                candidatos (fragmentos de código repetidos en todas partes)
+        """
+        if num_permutaciones % bandas:
+            raise ValueError("num_permutaciones debe ser múltiplo de bandas")
+        self.num_permutaciones = num_permutaciones
+        self.bandas = bandas
+        self.filas_por_banda = num_permutaciones // bandas
+        self.tamaño_shingle = tamaño_shingle
+        self.min_shingles = min_shingles
+        self.max_cubeta = max_cubeta
+        self.firmas = {}
+        self._cubetas = defaultdict(list)
+
+    def calcular_firma(self, texto: str):
+        """Retorna la firma MinHash del texto, o None si tiene menos de min_shingles shingles"""
+        ids = [zlib.crc32(token.encode('utf-8')) for token in tokenizar(texto)]
+        total_shingles = len(ids) - self.tamaño_shingle + 1
+        if total_shingles < self.min_shingles:
+            return None
+
+        n = self.num_permutaciones
+        firma = [None] * n
+        k = self.tamaño_shingle
+        for i in range(total_shingles):
+            # El hash de una tupla de enteros no depende de PYTHONHASHSEED
+            valor = (hash(tuple(ids[i:i + k])) * 0x9E3779B97F4A7C15) & MASCARA_64
+            cubeta = valor % n
+            valor //= n
+            if firma[cubeta] is None or valor < firma[cubeta]:
+                firma[cubeta] = valor
+
+        # Densificación: cada cubeta vacía toma el valor de la siguiente cubeta con
+        # shingles propios, desplazado según la distancia para no repetirlo
+        if None in firma:
+            originales = list(firma)
+            for cubeta in range(n):
+                if originales[cubeta] is None:
+                    distancia = 1
+                    while originales[(cubeta + distancia) % n] is None:
+                        distancia += 1
+                    prestado = originales[(cubeta + distancia) % n]
+                    firma[cubeta] = (prestado + distancia * DESPLAZAMIENTO_DENSIFICACION) & MASCARA_64
+        return tuple(firma)
+
+    def agregar(self, clave, texto: str) -> bool:
+        """
+        Indexa un cuerpo
+
+        Args:
+            clave: Identificador del cuerpo (p. ej. su huella)
+            texto (str): Código del procedure
+
+        Returns:
+            bool: False si el cuerpo es demasiado corto para indexarlo
+        """
+        if clave in self.firmas:
+            return True
+        firma = self.calcular_firma(texto)
+        if firma is None:
+            return False
+        self.firmas[clave] = firma
+        filas = self.filas_por_banda
+        for banda in range(self.bandas):
+            self._cubetas[(banda, firma[banda * filas:(banda + 1) * filas])].append(clave)
+        return True
+
+    def similitud(self, clave_a, clave_b) -> float:
+        """Similitud de Jaccard estimada entre dos cuerpos indexados"""
+        firma_a, firma_b = self.firmas[clave_a], self.firmas[clave_b]
+        return sum(1 for a, b in zip(firma_a, firma_b) if a == b) / self.num_permutaciones
+
+    def _candidatos(self, clave) -> set:
+        firma = self.firmas[clave]
+        filas = self.filas_por_banda
+        candidatos = set()
+        for banda in range(self.bandas):
+            cubeta = self._cubetas[(banda, firma[banda * filas:(banda + 1) * filas])]
+            if len(cubeta) <= self.max_cubeta:
+                candidatos.update(cubeta)
+        candidatos.discard(clave)
+        return candidatos
+
+    def buscar_similares(self, clave, umbral: float = 0.6, limite: int = 20) -> list:
+        """
+        Cuerpos parecidos a uno ya indexado
+
+        Returns:
+            list: (clave, similitud) con similitud >= umbral, de mayor a menor
+        """
+        if clave not in self.firmas:
+            return []
+        similares = [(candidato, self.similitud(clave, candidato)) for candidato in self._candidatos(clave)]
+        similares = [(candidato, valor) for candidato, valor in similares if valor >= umbral]
+        similares.sort(key=lambda par: -par[1])
+        return similares[:limite]
+
+    def agrupar(self, umbral: float = 0.6) -> list:
+        """
+        Agrupa los cuerpos indexados en clústeres de casi duplicados (componentes conexas
+        de los pares candidatos con similitud >= umbral)
+
+        Returns:
+            list: Listas de claves con más de un elemento, de mayor a menor tamaño
+        """
+        padres = {}
+
+        def raiz(clave):
+            while padres.get(clave, clave) != clave:
+                padres[clave] = padres.get(padres[clave], padres[clave])
+                clave = padres[clave]
+            return clave
+
+        for clave in self.firmas:
+            for candidato in self._candidatos(clave):
+                if self.similitud(clave, candidato) >= umbral:
+                    raiz_a, raiz_b = raiz(clave), raiz(candidato)
+                    if raiz_a != raiz_b:
+                        padres[raiz_a] = raiz_b
+
+        grupos = defaultdict(list)
+        for clave in self.firmas:
+            grupos[raiz(clave)].append(clave)
+        return sorted((grupo for grupo in grupos.values() if len(grupo) > 1), key=len, reverse=True)
+
+
+def _completar_cuerpo(aparicion, nombre_procedure, cuerpos_por_ruta):
+    """
+    (huella, linea_fin) de una aparición; si se extrajo sin cuerpo se calculan a partir
+    del archivo, que se extrae una sola vez por ruta
+
+    Returns:
+        tuple: (huella, linea_fin), o (None, None) si el archivo ya no se puede leer o
+            el procedure ya no está en la misma línea
+    """
+    if aparicion.get('huella'):
+        return aparicion['huella'], aparicion.get('linea_fin')
+
+    ruta = aparicion['ruta_archivo']
+    if ruta not in cuerpos_por_ruta:
+        try:
+            cuerpos_por_ruta[ruta] = extraer_procedures_de_contenido(cache_contenido.leer(ruta), cuerpos=True)
+        except (OSError, UnicodeDecodeError):
+            cuerpos_por_ruta[ruta] = {}
+    procedure = cuerpos_por_ruta[ruta].get(nombre_procedure)
+    if procedure is None or procedure['numero_linea'] != aparicion['numero_linea']:
+        return None, None
+    return procedure['huella'], procedure['linea_fin']
+
+
+def construir_indice_similitud(todos_los_procedures, **kwargs):
+    """
+    Indexa un cuerpo por cada huella distinta del resultado de analizar_todos_los_procedures
+
+    El texto de cada cuerpo se lee de la primera aparición con esa huella, usando la
+    cache de contenido compartida. Los procedures extraídos sin cuerpo (archivos que
+    no se repiten) se delimitan aquí, al construir el índice.
+
+    Returns:
+        tuple: (IndiceSimilitud, dict huella -> lista de (nombre_archivo, nombre_procedure),
+            dict (nombre_archivo, nombre_procedure) -> lista de huellas)
+    """
+    indice = IndiceSimilitud(**kwargs)
+    procedures_por_huella = defaultdict(list)
+    huellas_por_procedure = {}
+
+    for nombre_archivo, procedures in todos_los_procedures.items():
+        # Las rutas de un nombre_archivo no aparecen en ningún otro
+        cuerpos_por_ruta = {}
+        for nombre_procedure, info in procedures.items():
+            vistas = []
+            for aparicion in info['apariciones']:
+                huella, linea_fin = _completar_cuerpo(aparicion, nombre_procedure, cuerpos_por_ruta)
+                if not huella or huella in vistas:
+                    continue
+                vistas.append(huella)
+                procedures_por_huella[huella].append((nombre_archivo, nombre_procedure))
+                if huella in indice.firmas or not linea_fin:
+                    continue
+                try:
+                    contenido = cache_contenido.obtener(aparicion['ruta_archivo'])
+                except (OSError, UnicodeDecodeError):
+                    continue
+                indice.agregar(huella, contenido.lineas(aparicion['numero_linea'] - 1, linea_fin))
+            huellas_por_procedure[(nombre_archivo, nombre_procedure)] = vistas
+
+    return indice, dict(procedures_por_huella), huellas_por_procedure
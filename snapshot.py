@@ -0,0 +1,154 @@
+from array import array
+from pathlib import Path
+import json
+import os
+import struct
+import sys
+import zlib
+
+from resultados_compactos import AlmacenProcedures, COLUMNAS_APARICION, COLUMNAS_GRUPO
+
+MAGIA_SNAPSHOT = b"CUSNAP\r\n"
+VERSION_SNAPSHOT = 2
+EXTENSION_SNAPSHOT = ".cusnap"
+NIVEL_COMPRESION = 6
+# Tamaño en bytes de cada tipo de columna admitido
+TAMAÑOS_COLUMNA = {'b': 1, 'i': 4}
+
+
+class ErrorSnapshot(ValueError):
+    """El archivo no es un snapshot válido o es de una versión incompatible"""
+
+
+def _comprimir_json(valor) -> bytes:
+    return zlib.compress(json.dumps(valor, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), NIVEL_COMPRESION)
+
+
+def _descomprimir_json(datos: bytes):
+    return json.loads(zlib.decompress(datos).decode('utf-8'))
+
+
+def _comprimir_columna(columna: array) -> bytes:
+    if sys.byteorder != 'little':
+        columna = array(columna.typecode, columna)
+        columna.byteswap()
+    return zlib.compress(columna.tobytes(), NIVEL_COMPRESION)
+
+
+def _descomprimir_columna(tipo: str, datos: bytes) -> array:
+    columna = array(tipo)
+    columna.frombytes(zlib.decompress(datos))
+    if sys.byteorder != 'little':
+        columna.byteswap()
+    return columna
+
+
+def guardar_snapshot(ruta_snapshot, metadatos: dict, almacen: AlmacenProcedures):
+    """
+    Guarda un análisis en formato snapshot binario
+
+    El archivo contiene la firma MAGIA_SNAPSHOT, una cabecera JSON con la posición de cada
+    sección y las secciones comprimidas con zlib: los metadatos del buscador (JSON), la
+    tabla de cadenas del almacén (JSON) y cada columna del almacén (enteros little-endian).
+    Así se pueden cargar los datos de listado sin descomprimir el detalle de las apariciones.
+
+    Args:
+        ruta_snapshot (str): Archivo de salida
+        metadatos (dict): Datos del buscador serializables como JSON (archivos encontrados,
+            errores, estadísticas...)
+        almacen (AlmacenProcedures): Procedures clasificados
+    """
+    secciones = {
+        'metadatos': _comprimir_json(metadatos),
+        'cadenas': _comprimir_json(almacen.cadenas.cadenas),
+        'archivos': _comprimir_json(list(almacen.rangos_archivos().items()))
+    }
+    tipos = {}
+    for nombre, columna in almacen.columnas().items():
+        if TAMAÑOS_COLUMNA.get(columna.typecode) != columna.itemsize:
+            raise ErrorSnapshot(f"Tipo de columna no soportado: {nombre} ({columna.typecode})")
+        secciones[nombre] = _comprimir_columna(columna)
+        tipos[nombre] = columna.typecode
+
+    indice = {}
+    posicion = 0
+    for nombre, datos in secciones.items():
+        indice[nombre] = [posicion, len(datos)]
+        posicion += len(datos)
+
+    cabecera = json.dumps({
+        'version': VERSION_SNAPSHOT,
+        'secciones': indice,
+        'tipos': tipos
+    }).encode('utf-8')
+
+    ruta_snapshot = Path(ruta_snapshot)
+    ruta_snapshot.parent.mkdir(parents=True, exist_ok=True)
+    ruta_temporal = ruta_snapshot.with_name(ruta_snapshot.name + ".tmp")
+    with open(ruta_temporal, 'wb') as f:
+        f.write(MAGIA_SNAPSHOT)
+        f.write(struct.pack('<I', len(cabecera)))
+        f.write(cabecera)
+        for datos in secciones.values():
+            f.write(datos)
+    os.replace(ruta_temporal, ruta_snapshot)
+
+
+def cargar_snapshot(ruta_snapshot):
+    """
+    Carga un snapshot guardado con guardar_snapshot
+
+    Las columnas por aparición se quedan comprimidas en memoria y solo se descomprimen
+    la primera vez que se consulta el detalle de algún procedure.
+
+    Returns:
+        tuple: (metadatos, almacen)
+
+    Raises:
+        ErrorSnapshot: Si el archivo no es un snapshot o su versión no es compatible
+    """
+    with open(ruta_snapshot, 'rb') as f:
+        contenido = f.read()
+
+    try:
+        return _leer_snapshot(contenido, ruta_snapshot)
+    except (KeyError, ValueError, struct.error, zlib.error) as e:
+        if isinstance(e, ErrorSnapshot):
+            raise
+        raise ErrorSnapshot(f"Snapshot dañado: {ruta_snapshot} ({e})") from e
+
+
+def _leer_snapshot(contenido: bytes, ruta_snapshot):
+    if not contenido.startswith(MAGIA_SNAPSHOT):
+        raise ErrorSnapshot(f"{ruta_snapshot} no es un snapshot de análisis")
+    inicio_cabecera = len(MAGIA_SNAPSHOT) + 4
+    (longitud_cabecera,) = struct.unpack_from('<I', contenido, len(MAGIA_SNAPSHOT))
+    cabecera = json.loads(contenido[inicio_cabecera:inicio_cabecera + longitud_cabecera].decode('utf-8'))
+    if cabecera.get('version') != VERSION_SNAPSHOT:
+        raise ErrorSnapshot(f"Versión de snapshot no soportada: {cabecera.get('version')}")
+
+    inicio_datos = inicio_cabecera + longitud_cabecera
+    vista = memoryview(contenido)
+
+    def seccion(nombre):
+        posicion, longitud = cabecera['secciones'][nombre]
+        return vista[inicio_datos + posicion:inicio_datos + posicion + longitud]
+
+    tipos = cabecera['tipos']
+    # Se copian ahora para no retener el archivo completo hasta que se necesiten
+    apariciones_comprimidas = {nombre: bytes(seccion(nombre)) for nombre in COLUMNAS_APARICION}
+
+    def cargar_apariciones():
+        return {
+            nombre: _descomprimir_columna(tipos[nombre], datos)
+            for nombre, datos in apariciones_comprimidas.items()
+        }
+
+    metadatos = _descomprimir_json(seccion('metadatos'))
+    almacen = AlmacenProcedures.desde_columnas(
+        cadenas=_descomprimir_json(seccion('cadenas')),
+        archivos={nombre: tuple(rango) for nombre, rango in _descomprimir_json(seccion('archivos'))},
+        columnas_grupo={nombre: _descomprimir_columna(tipos[nombre], seccion(nombre)) for nombre in COLUMNAS_GRUPO},
+        cargar_apariciones=cargar_apariciones
+    )
+    return metadatos, almacen
@@ -1,40 +1,532 @@
 from pathlib import Path
+import argparse
+import bisect
+import hashlib
 import json
+import os
+import time
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import multiprocessing
 import re
+import sys
+
+from cache_contenido import cache_contenido, leer_contenido
+from clasificacion_incremental import ClasificadorIncremental, TRANSICION_PROCEDURE, consolidar_transiciones
+from exportacion_ndjson import ExportadorNDJSON
+from instrumentacion import Instrumentacion, configurar_logging
+from manifiesto import ManifiestoProcedures
+from resultados_compactos import AlmacenProcedures, agrupar_por_huella
+import snapshot
+
+SUFIJO_CODEUNIT = ".CodeUnit.al"
+NOMBRE_CARPETA_LLB = "LLB"
+
+# Línea de comandos: salida por defecto de cada formato y códigos de salida
+SALIDAS_POR_DEFECTO = {
+    'json': "resumen_codeunits_completo.json",
+    'ndjson': "resumen_codeunits_completo.ndjson.gz",
+    'snapshot': "resumen_codeunits" + snapshot.EXTENSION_SNAPSHOT
+}
+CODIGO_CORRECTO = 0
+CODIGO_ERRORES_LECTURA = 1  # El análisis terminó pero algunos archivos no se pudieron leer
+CODIGO_USO_INCORRECTO = 2   # Argumentos no válidos (el mismo que usa argparse)
+CODIGO_FALLO = 3            # El análisis no terminó
+
+# Extracción en paralelo: tope de rutas por lote y lotes en vuelo por worker. Acotan
+# los resultados que esperan a ser consumidos, para que la memoria no crezca con el corpus
+TAMAÑO_LOTE_MAXIMO = 32
+LOTES_EN_VUELO_POR_PROCESO = 2
+# Los workers no se crean con fork: el dashboard lanza el análisis desde un servidor con
+# varios hilos y un fork copiaría locks tomados por otros hilos. forkserver no existe en Windows
+METODO_INICIO_PROCESOS = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+logger = logging.getLogger(__name__)
+
+# Patrones para capturar diferentes tipos de procedures:
+# - procedure NombreProcedure()
+# - local procedure NombreProcedure()
+# - internal procedure NombreProcedure()
+# - procedure NombreProcedure(params): ReturnType
+# Se aplica en modo multilínea sobre el archivo completo; [^\S\n] es un espacio que
+# no cruza saltos de línea, equivalente al \s de la búsqueda línea a línea original.
+PATRON_PROCEDURE = re.compile(
+    r'^[^\S\n]*(local[^\S\n]+|internal[^\S\n]+)?procedure[^\S\n]+([a-zA-Z_][a-zA-Z0-9_]*)[^\S\n]*\(',
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Versión rápida: se busca "procedure Nombre(" sin IGNORECASE sobre el texto en minúsculas
+# (el motor salta directamente al literal) y después se valida el inicio de la línea.
+PATRON_CANDIDATO_PROCEDURE = re.compile(r'procedure[^\S\n]+[a-z_][a-z0-9_]*[^\S\n]*\(')
+PATRON_PREFIJO_PROCEDURE = re.compile(r'[^\S\n]*(local[^\S\n]+|internal[^\S\n]+)?', re.IGNORECASE)
+PATRON_NOMBRE_PROCEDURE = re.compile(r'procedure[^\S\n]+([a-zA-Z_][a-zA-Z0-9_]*)', re.IGNORECASE)
+
+# Caracteres que IGNORECASE equipara a letras ASCII pero que lower() no convierte en ellas
+CARACTERES_CASO_ESPECIAL = ('\u0130', '\u0131', '\u017f', '\u212a')
+
+# Palabras que abren (begin, case) y cierran (end) bloques en el cuerpo de un procedure,
+# buscadas sobre el texto en minúsculas
+PATRONES_PALABRAS_BLOQUE = (
+    (re.compile(r'begin\b'), 1),
+    (re.compile(r'case\b'), 1),
+    (re.compile(r'end\b'), -1),
+)
+PATRON_COMENTARIO_O_CADENA = re.compile(r"'(?:[^'\n]|'')*'|\"[^\"\n]*\"|//[^\n]*|/\*.*?\*/", re.DOTALL)
+PATRON_PUNTO_Y_COMA = re.compile(r'[^\S\n]*;')
+MINUSCULAS_ASCII = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def _iterar_coincidencias_procedure(contenido, minusculas):
+    """Genera (inicio_linea, fin_cabecera, modificador, nombre) de cada cabecera de procedure"""
+    if len(minusculas) != len(contenido) or any(c in contenido for c in CARACTERES_CASO_ESPECIAL):
+        for match in PATRON_PROCEDURE.finditer(contenido):
+            yield match.start(), match.end(), match.group(1), match.group(2)
+        return
+
+    for candidato in PATRON_CANDIDATO_PROCEDURE.finditer(minusculas):
+        inicio_procedure = candidato.start()
+        inicio_linea = contenido.rfind('\n', 0, inicio_procedure) + 1
+        prefijo = PATRON_PREFIJO_PROCEDURE.fullmatch(contenido, inicio_linea, inicio_procedure)
+        if prefijo:
+            nombre = PATRON_NOMBRE_PROCEDURE.match(contenido, inicio_procedure).group(1)
+            yield inicio_linea, candidato.end(), prefijo.group(1), nombre
+
+
+def _buscar_palabras_bloque(minusculas):
+    """
+    Devuelve las posiciones de begin/case (+1) y end (-1) fuera de comentarios y cadenas
+
+    Cada palabra se busca como literal (el motor de re salta directamente a ella) y se
+    descartan las que forman parte de otro identificador o caen dentro de un comentario,
+    una cadena o un identificador entre comillas. Sin comentarios de bloque basta con
+    revisar la línea de cada palabra, y solo si antes de ella hay comillas o barras.
+    """
+    eventos = []
+    for patron, delta in PATRONES_PALABRAS_BLOQUE:
+        for posicion in [match.start() for match in patron.finditer(minusculas)]:
+            anterior = minusculas[posicion - 1] if posicion else ' '
+            if not (anterior.isalnum() or anterior == '_'):
+                eventos.append((posicion, delta))
+    eventos.sort()
+
+    if '/*' in minusculas:
+        excluidos = [m.span() for m in PATRON_COMENTARIO_O_CADENA.finditer(minusculas)]
+        filtrados = []
+        indice = 0
+        for posicion, delta in eventos:
+            while indice < len(excluidos) and excluidos[indice][1] <= posicion:
+                indice += 1
+            if indice < len(excluidos) and excluidos[indice][0] <= posicion:
+                continue
+            filtrados.append((posicion, delta))
+        eventos = filtrados
+    else:
+        filtrados = []
+        for posicion, delta in eventos:
+            inicio_linea = minusculas.rfind('\n', 0, posicion) + 1
+            if (minusculas.find("'", inicio_linea, posicion) == -1
+                    and minusculas.find('"', inicio_linea, posicion) == -1
+                    and minusculas.find('/', inicio_linea, posicion) == -1):
+                filtrados.append((posicion, delta))
+            elif not _en_comentario_o_cadena_de_linea(minusculas, inicio_linea, posicion):
+                filtrados.append((posicion, delta))
+        eventos = filtrados
+
+    return [posicion for posicion, _ in eventos], [delta for _, delta in eventos]
+
+
+def _en_comentario_o_cadena_de_linea(texto, inicio_linea, posicion):
+    """Indica si 'posicion' cae dentro de un comentario // o una cadena de su propia línea"""
+    fin_linea = texto.find('\n', posicion)
+    if fin_linea == -1:
+        fin_linea = len(texto)
+    for match in PATRON_COMENTARIO_O_CADENA.finditer(texto, inicio_linea, fin_linea):
+        if match.start() > posicion:
+            break
+        if posicion < match.end():
+            return True
+    return False
+
+
+def _calcular_fines_procedures(contenido, minusculas, cabeceras):
+    """
+    Calcula el offset final de cada procedure teniendo en cuenta el anidamiento begin/case...end
+
+    El cuerpo termina en el 'end' que cierra el primer 'begin' (incluido el ';'). Si no
+    se encuentra antes de la siguiente cabecera (p. ej. procedures sin cuerpo), termina
+    en el último carácter no blanco anterior a ella.
+    """
+    posiciones, deltas = _buscar_palabras_bloque(minusculas)
+    fines = []
+
+    for indice, (inicio_linea, fin_cabecera, _, _) in enumerate(cabeceras):
+        limite = cabeceras[indice + 1][0] if indice + 1 < len(cabeceras) else len(contenido)
+        fin_procedure = None
+        profundidad = 0
+
+        i = bisect.bisect_left(posiciones, fin_cabecera)
+        while i < len(posiciones) and posiciones[i] < limite:
+            if deltas[i] > 0:
+                profundidad += 1
+            elif profundidad > 0:
+                profundidad -= 1
+                if profundidad == 0:
+                    fin_procedure = posiciones[i] + 3
+                    punto_y_coma = PATRON_PUNTO_Y_COMA.match(contenido, fin_procedure)
+                    if punto_y_coma:
+                        fin_procedure = punto_y_coma.end()
+                    break
+            i += 1
+
+        if fin_procedure is None:
+            fin_procedure = inicio_linea + len(contenido[inicio_linea:limite].rstrip())
+        fines.append(fin_procedure)
+
+    return fines
+
+
+def calcular_huella(cuerpo):
+    """
+    Huella del cuerpo de un procedure: hash del texto sin comentarios ni espacios y en
+    minúsculas, salvo el contenido de las cadenas entre comillas simples
+
+    Dos procedures con la misma huella solo se diferencian en comentarios, espaciado o
+    mayúsculas de identificadores y palabras clave.
+    """
+    partes = []
+    posicion = 0
+    if "'" in cuerpo or '"' in cuerpo or '/' in cuerpo:
+        for match in PATRON_COMENTARIO_O_CADENA.finditer(cuerpo):
+            partes.append(''.join(cuerpo[posicion:match.start()].lower().split()))
+            token = match.group()
+            if token[0] == "'":
+                # Las cadenas se conservan tal cual y delimitadas para no mezclarse con el código
+                partes.append(f"\0{token}\0")
+            elif token[0] == '"':
+                partes.append(''.join(token.lower().split()))
+            posicion = match.end()
+    partes.append(''.join(cuerpo[posicion:].lower().split()))
+    return hashlib.blake2b(''.join(partes).encode('utf-8'), digest_size=8).hexdigest()
+
+
+def extraer_procedures_de_contenido(contenido, cuerpos=False):
+    """
+    Extrae los procedures del contenido de un archivo .Codeunit.al en una sola pasada
+
+    Recorre el texto con un único finditer y calcula los números de línea a partir de
+    los saltos de línea entre coincidencias. Los procedures sobrecargados reciben los
+    sufijos _2, _3... igual que antes, pero recordando el último sufijo usado por nombre.
+
+    Con cuerpos=True se delimita además el cuerpo completo de cada procedure (hasta el
+    'end;' que cierra su primer 'begin') y se guardan 'linea_fin' y la huella de ese
+    texto (calcular_huella). Cuesta más que extraer solo las cabeceras, así que solo se
+    pide para lo que lo usa: la comparación de contenido de los procedures repetidos,
+    la similitud y los prompts de IA.
+
+    Args:
+        contenido (str): Texto del archivo (con saltos de línea normalizados a '\n')
+        cuerpos (bool): Si es True se añaden 'linea_fin' y 'huella' a cada procedure
+
+    Returns:
+        dict: Procedures indexados por nombre (con sufijo si está sobrecargado)
+    """
+    procedures = {}
+    ultimos_sufijos = {}
+    numero_linea = 1
+    posicion_anterior = 0
+
+    minusculas = contenido.lower()
+    cabeceras = list(_iterar_coincidencias_procedure(contenido, minusculas))
+    if cuerpos:
+        if len(minusculas) != len(contenido):
+            # Solo se buscan palabras clave ASCII, así que basta con conservar los offsets
+            minusculas = contenido.translate(MINUSCULAS_ASCII)
+        fines = _calcular_fines_procedures(contenido, minusculas, cabeceras)
+    else:
+        fines = [None] * len(cabeceras)
+
+    for (inicio_linea, fin_cabecera, modificador, nombre_procedure), fin_procedure in zip(cabeceras, fines):
+        numero_linea += contenido.count('\n', posicion_anterior, inicio_linea)
+        posicion_anterior = inicio_linea
+
+        fin_linea = contenido.find('\n', fin_cabecera)
+        if fin_linea == -1:
+            fin_linea = len(contenido)
+        linea_limpia = contenido[inicio_linea:fin_linea].strip()
+
+        # Limpiar modificador (local, internal)
+        modificador = modificador.strip().lower() if modificador else "public"
+
+        # Si ya existe, agregar sufijo para diferenciar
+        clave_procedure = nombre_procedure
+        if clave_procedure in procedures:
+            contador = ultimos_sufijos.get(nombre_procedure, 1)
+            while clave_procedure in procedures:
+                contador += 1
+                clave_procedure = f"{nombre_procedure}_{contador}"
+            ultimos_sufijos[nombre_procedure] = contador
+
+        procedure = procedures[clave_procedure] = {
+            'linea': linea_limpia,
+            'numero_linea': numero_linea,
+            'nombre': nombre_procedure,
+            'modificador': modificador
+        }
+        if cuerpos:
+            procedure['linea_fin'] = numero_linea + contenido.count('\n', inicio_linea, fin_procedure)
+            procedure['huella'] = calcular_huella(contenido[inicio_linea:fin_procedure])
+
+    return procedures
+
+
+def buscar_linea_fin(contenido, numero_linea):
+    """
+    Última línea del procedure cuya cabecera está en 'numero_linea'
+
+    Para delimitar bajo demanda un procedure que se extrajo sin cuerpo.
+
+    Returns:
+        int: linea_fin, o None si ningún procedure empieza en esa línea
+    """
+    for procedure in extraer_procedures_de_contenido(contenido, cuerpos=True).values():
+        if procedure['numero_linea'] == numero_linea:
+            return procedure['linea_fin']
+    return None
+
+
+def _crear_aparicion(repo, ruta, info_procedure):
+    """Aparición de un procedure extraído de la ruta 'ruta' del repositorio 'repo'"""
+    return {
+        'repositorio': repo,
+        'linea': info_procedure['linea'],
+        'numero_linea': info_procedure['numero_linea'],
+        # Sin cuerpo (archivos que no se repiten) no hay fin ni huella
+        'linea_fin': info_procedure.get('linea_fin'),
+        'huella': info_procedure.get('huella', ''),
+        'ruta_archivo': ruta,
+        'modificador': info_procedure['modificador'],
+        'nombre': info_procedure['nombre']
+    }
+
+
+def _crear_resultado_procedure(estado, contenido, repositorios, apariciones, grupos_huella):
+    """Información de un procedure clasificado tal como se guarda en todos_los_procedures"""
+    return {
+        'estado': estado,
+        'contenido': contenido,
+        'repositorios': list(repositorios),
+        'total_repositorios': len(repositorios),
+        'variantes': len(grupos_huella),
+        'grupos_huella': grupos_huella,
+        'apariciones': apariciones
+    }
+
+
+def _extraer_procedures_en_proceso(ruta_archivo, cuerpos):
+    """
+    Extrae los procedures de un archivo en un worker (ver extraer_procedures_de_contenido)
+
+    Se lee sin cache_contenido: cada worker tendría su propia copia de la cache, llena de
+    textos que no vuelve a usar.
+
+    Returns:
+        tuple: (procedures, hash del contenido para el manifiesto, error)
+    """
+    try:
+        contenido = leer_contenido(ruta_archivo)
+        return extraer_procedures_de_contenido(contenido.texto, cuerpos), contenido.hash, None
+    except Exception as e:
+        return {}, None, str(e)
+
+
+def _extraer_lote_en_proceso(lote):
+    """Extrae en un worker cada (ruta, cuerpos) del lote, en orden (ver _extraer_procedures_en_proceso)"""
+    return [_extraer_procedures_en_proceso(ruta_archivo, cuerpos) for ruta_archivo, cuerpos in lote]
+
 
 class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a BuscadorCodeunit
-    def __init__(self, carpeta_repositorios):
+    def __init__(self, carpeta_repositorios, manifiesto=None, callback_progreso=None, callback_resultado=None,
+                 instrumentacion=None):
+        """
+        Args:
+            carpeta_repositorios (str): Carpeta que contiene los repositorios AL
+            manifiesto (ManifiestoProcedures): Manifiesto para el análisis incremental (opcional)
+            callback_progreso (callable): Recibe una copia de self.progreso cada vez que avanza
+            callback_resultado (callable): Recibe (nombre_archivo, procedures) en cuanto se
+                termina de clasificar cada archivo
+            instrumentacion (Instrumentacion): Métricas del análisis; por defecto se crea
+                una sin cProfile ni tracemalloc
+        """
         self.carpeta_repositorios = Path(carpeta_repositorios)
+        self.manifiesto = manifiesto
+        self.analisis_manifiesto = None  # AnalisisManifiesto del último análisis
+        self.instrumentacion = instrumentacion if instrumentacion is not None else Instrumentacion()
         self.archivos_encontrados = {}
         self.archivos_repetidos = {}
         self.archivos_unicos = {}
         self.todos_los_procedures = {}  # *** CAMBIO: De todos_los_campos a todos_los_procedures
+        self.clasificador = None  # ClasificadorIncremental, se crea en la primera actualización
+        self.version_resultados = 0  # Aumenta cada vez que aplicar_cambios modifica los resultados
+        self.ultimas_transiciones = []
+        self.tiempos_repositorios = {}
         self.errores = []
+        self.callback_progreso = callback_progreso
+        self.callback_resultado = callback_resultado
+        self.progreso = {
+            'etapa': 'pendiente',
+            'repos_escaneados': 0,
+            'total_repos': 0,
+            'archivos_procesados': 0,
+            'total_archivos': 0,
+            'procedures_encontrados': 0
+        }
 
-    def buscar_archivos(self):
-        """Busca archivos Codeunit.al en todos los repositorios"""  # *** CAMBIO: Documentación actualizada
+    def _notificar_progreso(self, **cambios):
+        """Actualiza el progreso y lo comunica al callback si existe"""
+        self.progreso.update(cambios)
+        if self.callback_progreso is not None:
+            self.callback_progreso(dict(self.progreso))
+
+    def buscar_archivos(self, paralelo=False, max_workers=None):
+        """Busca archivos Codeunit.al en todos los repositorios
+
+        Args:
+            paralelo (bool): Si es True, reparte los repositorios en un pool de hilos
+                y recorre cada uno con un único os.scandir (un stat por archivo)
+            max_workers (int): Número de hilos del pool (por defecto el de ThreadPoolExecutor)
+        """  # *** CAMBIO: Documentación actualizada
         if not self.carpeta_repositorios.exists():
             raise FileNotFoundError(f"La carpeta {self.carpeta_repositorios} no existe")
 
-        for repo_path in self.carpeta_repositorios.iterdir():
-            if repo_path.is_dir():
+        with self.instrumentacion.etapa('escaneo'):
+            repos = [repo_path for repo_path in self.carpeta_repositorios.iterdir() if repo_path.is_dir()]
+            self._notificar_progreso(etapa='escaneo', total_repos=len(repos), repos_escaneados=0)
+
+            if paralelo:
+                self._buscar_archivos_paralelo(repos, max_workers)
+            else:
+                for repo_path in repos:
+                    inicio = time.perf_counter()
+                    try:
+                        self._procesar_repositorio(repo_path)
+                    except Exception as e:
+                        self.errores.append(f"Error en {repo_path.name}: {str(e)}")
+                        logger.error("❌ Error procesando %s: %s", repo_path.name, e)
+                    self._registrar_tiempo_repositorio(repo_path.name, inicio)
+                    self._notificar_progreso(repos_escaneados=self.progreso['repos_escaneados'] + 1)
+
+        total_archivos = sum(len(archivos) for archivos in self.archivos_encontrados.values())
+        self.instrumentacion.contar('repositorios', len(repos))
+        self.instrumentacion.contar('archivos_encontrados', total_archivos)
+        logger.info("🔍 %d archivos Codeunit.al en %d repositorios", total_archivos, len(repos))
+
+    def _buscar_archivos_paralelo(self, repos, max_workers=None):
+        """Recorre los repositorios en paralelo manteniendo el orden de iterdir en el resultado"""
+        logger.info("🔍 Escaneando %d repositorios en paralelo...", len(repos))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = [executor.submit(self._escanear_repositorio, repo_path) for repo_path in repos]
+
+            # Los resultados se insertan en el orden original, no en el de finalización
+            for repo_path, futuro in zip(repos, futuros):
                 try:
-                    self._procesar_repositorio(repo_path)
+                    archivos_repo, segundos = futuro.result()
                 except Exception as e:
                     self.errores.append(f"Error en {repo_path.name}: {str(e)}")
-                    print(f"❌ Error procesando {repo_path.name}: {e}")
+                    logger.error("❌ Error procesando %s: %s", repo_path.name, e)
+                    continue
+                finally:
+                    self._notificar_progreso(repos_escaneados=self.progreso['repos_escaneados'] + 1)
+
+                self.tiempos_repositorios[repo_path.name] = {
+                    'segundos': segundos,
+                    'archivos': len(archivos_repo)
+                }
+                self.instrumentacion.registrar_repositorio(repo_path.name, segundos_escaneo=segundos,
+                                                           archivos=len(archivos_repo))
+                if archivos_repo:
+                    self.archivos_encontrados[repo_path.name] = archivos_repo
+                logger.debug("  📊 %s: %d archivos en %.3fs", repo_path.name, len(archivos_repo), segundos)
+
+    def _escanear_repositorio(self, repo_path):
+        """
+        Recorre un repositorio con un único os.scandir y devuelve la misma lista de
+        archivos que _procesar_repositorio, junto con el tiempo empleado.
+
+        El recorrido es en profundidad y en el mismo orden que Path.rglob, de modo que
+        los archivos de cada carpeta LLB (incluidas las LLB anidadas) quedan en el mismo
+        orden que en el modo secuencial.
+        """
+        inicio = time.perf_counter()
+        repo_str = str(repo_path)
+        archivos_por_llb = []  # [(ruta_llb, [entradas de archivo])] en orden de descubrimiento
+
+        def recorrer(carpeta, llbs_activas):
+            with os.scandir(carpeta) as entradas:
+                entradas = list(entradas)
+
+            subcarpetas = []
+            for entrada in entradas:
+                if entrada.is_dir():
+                    if entrada.name == NOMBRE_CARPETA_LLB:
+                        archivos_por_llb.append((entrada.path, []))
+                        subcarpetas.append((entrada.path, llbs_activas + [archivos_por_llb[-1]]))
+                    elif not entrada.is_symlink():
+                        # Igual que rglob, no se desciende por enlaces simbólicos
+                        subcarpetas.append((entrada.path, llbs_activas))
+                elif llbs_activas and entrada.name.endswith(SUFIJO_CODEUNIT):
+                    estado = entrada.stat()
+                    for _, archivos_llb in llbs_activas:
+                        archivos_llb.append((entrada.path, entrada.name, estado))
+
+            for ruta, llbs in subcarpetas:
+                recorrer(ruta, llbs)
+
+        recorrer(repo_str, [])
+
+        archivos_repo = []
+        for llb_str, archivos_llb in archivos_por_llb:
+            llb_relativa = llb_str[len(repo_str) + 1:]
+            for ruta_archivo, nombre, estado in archivos_llb:
+                ruta_desde_llb = ruta_archivo[len(llb_str) + 1:]
+                carpeta_archivo = os.path.dirname(ruta_archivo)
+                carpeta_llb_completa = llb_relativa
+                if carpeta_archivo != llb_str:
+                    carpeta_llb_completa = f"{llb_relativa}/{carpeta_archivo[len(llb_str) + 1:]}"
+
+                archivos_repo.append({
+                    'ruta_completa': ruta_archivo,
+                    'ruta_relativa': ruta_archivo[len(repo_str) + 1:],
+                    'ruta_desde_llb': ruta_desde_llb,
+                    'carpeta_llb_base': carpeta_llb_completa,
+                    'nombre': nombre,
+                    'tamaño': estado.st_size,
+                    'modificado': datetime.fromtimestamp(estado.st_mtime).isoformat()
+                })
+
+        return archivos_repo, time.perf_counter() - inicio
+
+    def _registrar_tiempo_repositorio(self, repo_name, inicio):
+        """Guarda el tiempo de escaneo de un repositorio"""
+        self.tiempos_repositorios[repo_name] = {
+            'segundos': time.perf_counter() - inicio,
+            'archivos': len(self.archivos_encontrados.get(repo_name, []))
+        }
+        self.instrumentacion.registrar_repositorio(repo_name,
+                                                   segundos_escaneo=self.tiempos_repositorios[repo_name]['segundos'],
+                                                   archivos=self.tiempos_repositorios[repo_name]['archivos'])
 
     def _procesar_repositorio(self, repo_path):
         """Procesa un repositorio individual"""
         repo_name = repo_path.name
-        print(f"🔍 Procesando repositorio: {repo_name}")
+        logger.debug("🔍 Procesando repositorio: %s", repo_name)
         archivos_repo = []
 
         for llb_path in repo_path.rglob("LLB"):
             if llb_path.is_dir():
-                print(f"  📁 Encontrada carpeta LLB: {llb_path.relative_to(repo_path)}")
+                logger.debug("  📁 Encontrada carpeta LLB: %s", llb_path.relative_to(repo_path))
                 
                 # *** CAMBIO PRINCIPAL: Buscar .Codeunit.al en lugar de .TableExt.al ***
                 for archivo in llb_path.rglob("*.CodeUnit.al"):
@@ -53,188 +545,349 @@ class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a Buscador
                         'tamaño': archivo.stat().st_size,
                         'modificado': datetime.fromtimestamp(archivo.stat().st_mtime).isoformat()
                     })
-                    print(f"    ✅ {archivo.relative_to(llb_path)} ({archivo.name})")
+                    logger.debug("    ✅ %s (%s)", archivo.relative_to(llb_path), archivo.name)
 
         if archivos_repo:
             self.archivos_encontrados[repo_name] = archivos_repo
-            print(f"  📊 Total archivos encontrados: {len(archivos_repo)}")
+            logger.debug("  📊 Total archivos encontrados: %d", len(archivos_repo))
         else:
-            print(f"  ⚠️ No se encontraron archivos Codeunit.al")  # *** CAMBIO: Mensaje actualizado
+            logger.debug("  ⚠️ No se encontraron archivos Codeunit.al en %s", repo_name)
 
     def filtrar_archivos_repetidos(self):
         """Filtra archivos que aparecen en al menos 2 carpetas LLB distintas"""
-        print("\n🔍 Filtrando archivos repetidos...")
-        archivos_por_nombre = defaultdict(list)
-
-        for repo, archivos in self.archivos_encontrados.items():
-            for archivo in archivos:
-                carpeta_llb_id = f"{repo}/{archivo['carpeta_llb_base']}"
-                archivos_por_nombre[archivo['nombre']].append({
-                    'archivo': archivo,
-                    'repo': repo,
-                    'carpeta_llb_id': carpeta_llb_id
-                })
+        with self.instrumentacion.etapa('filtrado'):
+            logger.info("🔍 Filtrando archivos repetidos...")
+            self._notificar_progreso(etapa='filtrado')
+            archivos_por_nombre = defaultdict(list)
 
-        archivos_filtrados = {}
-        archivos_unicos = {}
+            for repo, archivos in self.archivos_encontrados.items():
+                for archivo in archivos:
+                    carpeta_llb_id = f"{repo}/{archivo['carpeta_llb_base']}"
+                    archivos_por_nombre[archivo['nombre']].append({
+                        'archivo': archivo,
+                        'repo': repo,
+                        'carpeta_llb_id': carpeta_llb_id
+                    })
 
-        for nombre_archivo, apariciones in archivos_por_nombre.items():
-            carpetas_unicas = set(aparicion['carpeta_llb_id'] for aparicion in apariciones)
-            repositorios_unicos = set(aparicion['repo'] for aparicion in apariciones)
+            archivos_filtrados = {}
+            archivos_unicos = {}
 
-            if len(carpetas_unicas) > 1:
-                archivos_filtrados[nombre_archivo] = {
-                    'total_apariciones': len(apariciones),
-                    'carpetas_llb': list(carpetas_unicas),
-                    'repositorios': list(repositorios_unicos),
-                    'archivos': apariciones
-                }
-                print(f"  ✅ {nombre_archivo} - encontrado en {len(carpetas_unicas)} carpetas LLB distintas")
-            else:
-                print(f"  ❌ {nombre_archivo} - solo en 1 carpeta LLB, descartado")
-                archivos_unicos[nombre_archivo] = {
-                    'total_apariciones': len(apariciones),
-                    'carpetas_llb': list(carpetas_unicas),
-                    'repositorios': list(repositorios_unicos),
-                    'archivos': apariciones
-                }
+            for nombre_archivo, apariciones in archivos_por_nombre.items():
+                carpetas_unicas = set(aparicion['carpeta_llb_id'] for aparicion in apariciones)
+                repositorios_unicos = set(aparicion['repo'] for aparicion in apariciones)
+
+                if len(carpetas_unicas) > 1:
+                    archivos_filtrados[nombre_archivo] = {
+                        'total_apariciones': len(apariciones),
+                        'carpetas_llb': list(carpetas_unicas),
+                        'repositorios': list(repositorios_unicos),
+                        'archivos': apariciones
+                    }
+                    logger.debug("  ✅ %s - encontrado en %d carpetas LLB distintas", nombre_archivo, len(carpetas_unicas))
+                else:
+                    logger.debug("  ❌ %s - solo en 1 carpeta LLB, descartado", nombre_archivo)
+                    archivos_unicos[nombre_archivo] = {
+                        'total_apariciones': len(apariciones),
+                        'carpetas_llb': list(carpetas_unicas),
+                        'repositorios': list(repositorios_unicos),
+                        'archivos': apariciones
+                    }
 
         self.archivos_repetidos = archivos_filtrados
         self.archivos_unicos = archivos_unicos
+        self.clasificador = None
+        logger.info("  %d archivos repetidos y %d únicos", len(archivos_filtrados), len(archivos_unicos))
         return archivos_filtrados, archivos_unicos
 
-    def extraer_procedures_de_archivo(self, ruta_archivo):
-        """Extrae los procedures de un archivo .Codeunit.al"""  # *** CAMBIO: Nueva función para procedures
+    def extraer_procedures_de_archivo(self, ruta_archivo, cuerpos=False):
+        """Extrae los procedures de un archivo .Codeunit.al (ver extraer_procedures_de_contenido)"""  # *** CAMBIO: Nueva función para procedures
         procedures = {}
         try:
-            with open(ruta_archivo, 'r', encoding='utf-8') as f:
-                contenido = f.read()
-                lineas = contenido.split('\n')
-                
-                for numero_linea, linea in enumerate(lineas, 1):
-                    linea_limpia = linea.strip()
-                    
-                    # *** CAMBIO PRINCIPAL: Buscar patterns de procedure ***
-                    # Patrones para capturar diferentes tipos de procedures:
-                    # - procedure NombreProcedure()
-                    # - local procedure NombreProcedure()
-                    # - internal procedure NombreProcedure()
-                    # - procedure NombreProcedure(params): ReturnType
-                    
-                    patron_procedure = r'^\s*(local\s+|internal\s+)?procedure\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*\('
-                    match = re.search(patron_procedure, linea_limpia, re.IGNORECASE)
-                    
-                    if match:
-                        # Extraer el modificador (local, internal) y el nombre del procedure
-                        modificador = match.group(1).strip() if match.group(1) else "public"
-                        nombre_procedure = match.group(2)
-                        
-                        # Limpiar modificador
-                        if modificador and modificador.lower() in ['local', 'internal']:
-                            modificador = modificador.lower()
-                        else:
-                            modificador = "public"
-                        
-                        # Crear clave única incluyendo el modificador para diferenciar procedures con mismo nombre
-                        clave_procedure = f"{nombre_procedure}"
-                        
-                        # Si ya existe, agregar sufijo para diferenciar
-                        contador = 1
-                        clave_original = clave_procedure
-                        while clave_procedure in procedures:
-                            contador += 1
-                            clave_procedure = f"{clave_original}_{contador}"
-                        
-                        procedures[clave_procedure] = {
-                            'linea': linea_limpia,
-                            'numero_linea': numero_linea,
-                            'nombre': nombre_procedure,
-                            'modificador': modificador,
-                            'linea_completa': linea_limpia
-                        }
+            procedures = extraer_procedures_de_contenido(cache_contenido.leer(ruta_archivo), cuerpos)
 
         except Exception as e:
-            print(f"❌ Error leyendo archivo {ruta_archivo}: {e}")
+            logger.error("❌ Error leyendo archivo %s: %s", ruta_archivo, e)
             self.errores.append(f"Error leyendo {ruta_archivo}: {e}")
 
         return procedures
 
-    def analizar_todos_los_procedures(self):
-        """Analiza TODOS los procedures y determina si se repiten o son únicos"""  # *** CAMBIO: Renombrado
-        print("\n🔍 Analizando TODOS los procedures...")
+    def analizar_todos_los_procedures(self, procesos=None, tamaño_lote=None, compacto=False,
+                                      exportador=None, conservar_resultados=True):
+        """
+        Analiza TODOS los procedures y determina si se repiten o son únicos
 
-        # Primero, extraer todos los procedures de todos los archivos
-        todos_los_procedures_global = defaultdict(lambda: defaultdict(list))
+        Args:
+            procesos (int): Si es mayor que 1, la extracción se reparte en un pool de
+                procesos con ese número de workers
+            tamaño_lote (int): Rutas enviadas a cada worker por lote (por defecto se
+                reparten en unos 4 lotes por worker, con un máximo de TAMAÑO_LOTE_MAXIMO)
+            compacto (bool): Si es True el resultado se guarda en un AlmacenProcedures
+                columnar, que ocupa mucha menos memoria y se consulta igual que el diccionario
+            exportador (ExportadorNDJSON): Si se indica, cada archivo se escribe en el NDJSON
+                en cuanto se clasifica y al final se añade el pie con las estadísticas
+            conservar_resultados (bool): Si es False los procedures no se guardan en
+                todos_los_procedures (útil junto con exportador para no acumular memoria)
+        """  # *** CAMBIO: Renombrado
+        # Etapa que engloba extracción y clasificación, para cProfile y tracemalloc
+        with self.instrumentacion.etapa('analisis'):
+            return self._analizar_todos_los_procedures(procesos, tamaño_lote, compacto, exportador,
+                                                       conservar_resultados)
 
-        # Procesar archivos únicos
-        for nombre_archivo, info in self.archivos_unicos.items():
-            print(f"\n📄 Procesando {nombre_archivo}...")
-            for archivo_info in info['archivos']:
-                ruta = archivo_info['archivo']['ruta_completa']
-                repo = archivo_info['repo']
-                print(f"  📁 Extrayendo procedures de {repo}...")
-                
-                procedures = self.extraer_procedures_de_archivo(ruta)  # *** CAMBIO: Llamar nueva función
-                
-                for nombre_procedure, info_procedure in procedures.items():
-                    todos_los_procedures_global[nombre_archivo][nombre_procedure].append({
-                        'repositorio': repo,
-                        'linea': info_procedure['linea'],
-                        'numero_linea': info_procedure['numero_linea'],
-                        'ruta_archivo': ruta,
-                        'modificador': info_procedure['modificador'],
-                        'nombre': info_procedure['nombre']
-                    })
+    def _analizar_todos_los_procedures(self, procesos, tamaño_lote, compacto, exportador, conservar_resultados):
+        logger.info("🔍 Analizando TODOS los procedures...")
+        self.clasificador = None
 
-        # Procesar archivos repetidos
-        for nombre_archivo, info in self.archivos_repetidos.items():
-            print(f"\n📄 Procesando {nombre_archivo}...")
-            for archivo_info in info['archivos']:
-                ruta = archivo_info['archivo']['ruta_completa']
-                repo = archivo_info['repo']
-                print(f"  📁 Extrayendo procedures de {repo}...")
-                
-                procedures = self.extraer_procedures_de_archivo(ruta)  # *** CAMBIO: Llamar nueva función
-                
-                for nombre_procedure, info_procedure in procedures.items():
-                    todos_los_procedures_global[nombre_archivo][nombre_procedure].append({
-                        'repositorio': repo,
-                        'linea': info_procedure['linea'],
-                        'numero_linea': info_procedure['numero_linea'],
-                        'ruta_archivo': ruta,
-                        'modificador': info_procedure['modificador'],
-                        'nombre': info_procedure['nombre']
-                    })
+        if self.manifiesto is not None:
+            self.analisis_manifiesto = self.manifiesto.iniciar_analisis()
 
-        # Procesar y clasificar cada procedure
-        resultado_final = {}
+        # Archivos únicos y después archivos repetidos, en el mismo orden que el análisis secuencial
+        trabajos = [
+            (nombre_archivo, archivo_info)
+            for archivos in (self.archivos_unicos, self.archivos_repetidos)
+            for nombre_archivo, info in archivos.items()
+            for archivo_info in info['archivos']
+        ]
 
-        for nombre_archivo, procedures_del_archivo in todos_los_procedures_global.items():
-            resultado_final[nombre_archivo] = {}
+        self._notificar_progreso(etapa='extraccion', total_archivos=len(trabajos),
+                                 archivos_procesados=0, procedures_encontrados=0)
 
-            for nombre_procedure, apariciones in procedures_del_archivo.items():
-                repositorios_unicos = set(aparicion['repositorio'] for aparicion in apariciones)
+        # Los archivos con el mismo nombre son consecutivos en la lista de trabajos, así que
+        # cada archivo se clasifica en cuanto se han extraído todas sus apariciones
+        if not conservar_resultados:
+            resultado_final = None
+        else:
+            resultado_final = AlmacenProcedures() if compacto else {}
+        if exportador is not None:
+            exportador.abrir(self.carpeta_repositorios)
+        nombre_anterior = None
+        procedures_del_archivo = defaultdict(list)
 
-                if len(repositorios_unicos) > 1:
-                    # Procedure repetido
-                    resultado_final[nombre_archivo][nombre_procedure] = {
-                        'estado': 'REPETIDO',
-                        'repositorios': list(repositorios_unicos),
-                        'total_repositorios': len(repositorios_unicos),
-                        'apariciones': apariciones
-                    }
-                else:
-                    # Procedure único
-                    resultado_final[nombre_archivo][nombre_procedure] = {
-                        'estado': 'ÚNICO',
-                        'repositorios': list(repositorios_unicos),
-                        'total_repositorios': 1,
-                        'apariciones': apariciones
-                    }
+        for nombre_archivo, archivo_info, procedures in self._iterar_procedures(trabajos, procesos, tamaño_lote):
+            if nombre_archivo != nombre_anterior:
+                if nombre_anterior is not None:
+                    self._cerrar_archivo(resultado_final, nombre_anterior, procedures_del_archivo, exportador)
+                logger.debug("📄 Procesando %s...", nombre_archivo)
+                nombre_anterior = nombre_archivo
+                procedures_del_archivo = defaultdict(list)
+            ruta = archivo_info['archivo']['ruta_completa']
+            repo = archivo_info['repo']
+            logger.debug("  📁 Extrayendo procedures de %s...", repo)
+
+            for nombre_procedure, info_procedure in procedures.items():
+                procedures_del_archivo[nombre_procedure].append(_crear_aparicion(repo, ruta, info_procedure))
+
+            self._notificar_progreso(
+                archivos_procesados=self.progreso['archivos_procesados'] + 1,
+                procedures_encontrados=self.progreso['procedures_encontrados'] + len(procedures)
+            )
+            self.instrumentacion.contar('archivos_procesados')
+            self.instrumentacion.contar('apariciones', len(procedures))
+
+        if nombre_anterior is not None:
+            self._cerrar_archivo(resultado_final, nombre_anterior, procedures_del_archivo, exportador)
+
+        if self.manifiesto is not None:
+            self.analisis_manifiesto.podar(self.carpeta_repositorios)
+            self.manifiesto.guardar()
+            estadisticas = self.analisis_manifiesto.obtener_estadisticas()
+            self.instrumentacion.contar('archivos_reutilizados', estadisticas['aciertos'])
+            logger.info("♻️ Manifiesto: %d archivos reutilizados, %d extraídos de nuevo",
+                        estadisticas['aciertos'], estadisticas['fallos'])
+
+        if exportador is not None:
+            inicio = time.perf_counter()
+            exportador.cerrar(self._estadisticas_archivos(), self.errores)
+            self.instrumentacion.acumular('guardado', time.perf_counter() - inicio)
+            logger.info("💾 Análisis exportado en: %s", exportador.archivo_salida)
 
+        if resultado_final is None:
+            resultado_final = {}
         self.todos_los_procedures = resultado_final  # *** CAMBIO: Asignar a todos_los_procedures
+        metricas = self.instrumentacion.resumen()
+        logger.info("⏱️ %d archivos extraídos a %.1f archivos/s (%.1f MB/s)",
+                    self.instrumentacion.contadores['archivos_procesados'],
+                    metricas['archivos_por_segundo'], metricas['mb_por_segundo'])
+        self._notificar_progreso(etapa='completado')
         return resultado_final
 
+    def _cerrar_archivo(self, resultado_final, nombre_archivo, procedures_del_archivo, exportador=None):
+        """Clasifica los procedures de un archivo ya completo, lo exporta y lo comunica al callback"""
+        if not procedures_del_archivo:
+            return
+        inicio = time.perf_counter()
+        procedures = self._clasificar_archivo(procedures_del_archivo)
+        self.instrumentacion.acumular('clasificacion', time.perf_counter() - inicio)
+        self.instrumentacion.contar('procedures', len(procedures))
+        if exportador is not None:
+            inicio = time.perf_counter()
+            exportador.escribir_archivo(nombre_archivo, procedures)
+            self.instrumentacion.acumular('guardado', time.perf_counter() - inicio)
+        if resultado_final is not None:
+            resultado_final[nombre_archivo] = procedures
+            procedures = resultado_final[nombre_archivo]
+        if self.callback_resultado is not None:
+            self.callback_resultado(nombre_archivo, procedures)
+
+    def _necesita_cuerpos(self, nombre_archivo):
+        """
+        Indica si hay que extraer los cuerpos (linea_fin y huella) de un archivo
+
+        Solo un archivo en más de una carpeta LLB puede tener procedures repetidos cuyo
+        contenido comparar; el resto los calcula cuando se necesitan (similitud, IA).
+        """
+        return nombre_archivo in self.archivos_repetidos
+
+    def _iterar_procedures(self, trabajos, procesos=None, tamaño_lote=None):
+        """
+        Genera (nombre_archivo, archivo_info, procedures) para cada trabajo, en orden
+
+        Con procesos > 1 los archivos que no están en el manifiesto se extraen en un
+        pool de procesos. Los lotes se envían en el orden de los trabajos y se consumen
+        en ese mismo orden, así que el resultado es el mismo sea cual sea el orden en que
+        terminen los workers. Solo hay LOTES_EN_VUELO_POR_PROCESO lotes por worker
+        pendientes de consumir y cada resultado se suelta tras su último uso, de modo que
+        la memoria no depende del número de archivos.
+        """
+        instrumentacion = self.instrumentacion
+        if not procesos or procesos <= 1 or not trabajos:
+            for nombre_archivo, archivo_info in trabajos:
+                bytes_previos = instrumentacion.contadores['bytes_leidos']
+                inicio = time.perf_counter()
+                procedures = self._obtener_procedures(archivo_info['archivo'], self._necesita_cuerpos(nombre_archivo))
+                segundos = time.perf_counter() - inicio
+                instrumentacion.acumular('extraccion', segundos)
+                instrumentacion.registrar_repositorio(
+                    archivo_info['repo'], segundos_extraccion=segundos,
+                    bytes_leidos=instrumentacion.contadores['bytes_leidos'] - bytes_previos
+                )
+                yield nombre_archivo, archivo_info, procedures
+            return
+
+        resueltos = {}
+        pendientes = {}
+        cuerpos_pendientes = {}
+        # Los procedures del manifiesto se leen al llegar su turno, no todos de antemano
+        en_manifiesto = set()
+        usos = defaultdict(int)
+        for nombre_archivo, archivo_info in trabajos:
+            archivo = archivo_info['archivo']
+            ruta = archivo['ruta_completa']
+            usos[ruta] += 1
+            if ruta in en_manifiesto or ruta in pendientes:
+                continue
+            cuerpos = self._necesita_cuerpos(nombre_archivo)
+            if self.manifiesto is not None and self.analisis_manifiesto.comprobar(archivo, cuerpos):
+                en_manifiesto.add(ruta)
+            else:
+                pendientes[ruta] = archivo
+                cuerpos_pendientes[ruta] = cuerpos
+
+        if not tamaño_lote:
+            tamaño_lote = max(1, min(len(pendientes) // (procesos * 4), TAMAÑO_LOTE_MAXIMO))
+        logger.info("⚙️ Extrayendo %d archivos con %d procesos (lotes de %d)...",
+                    len(pendientes), procesos, tamaño_lote)
+
+        rutas_pendientes = list(pendientes)
+        lotes = (
+            [(ruta, cuerpos_pendientes[ruta]) for ruta in rutas_pendientes[inicio:inicio + tamaño_lote]]
+            for inicio in range(0, len(rutas_pendientes), tamaño_lote)
+        )
+        lotes_en_vuelo = deque()
+        resultados = iter(())
+
+        with ProcessPoolExecutor(max_workers=procesos,
+                                 mp_context=multiprocessing.get_context(METODO_INICIO_PROCESOS)) as executor:
+            def enviar_lotes():
+                for lote in lotes:
+                    lotes_en_vuelo.append(executor.submit(_extraer_lote_en_proceso, lote))
+                    if len(lotes_en_vuelo) >= procesos * LOTES_EN_VUELO_POR_PROCESO:
+                        break
+
+            enviar_lotes()
+            for nombre_archivo, archivo_info in trabajos:
+                ruta = archivo_info['archivo']['ruta_completa']
+                if ruta in en_manifiesto and ruta not in resueltos:
+                    procedures = self.analisis_manifiesto.leer(archivo_info['archivo'])
+                    if procedures is None:
+                        # Otro análisis eliminó la entrada mientras tanto
+                        procedures = self._obtener_procedures(archivo_info['archivo'],
+                                                              cuerpos_pendientes.get(ruta, self._necesita_cuerpos(nombre_archivo)))
+                    resueltos[ruta] = procedures
+                elif ruta not in resueltos:
+                    # En paralelo se mide la espera de cada resultado, no el trabajo de los workers
+                    inicio = time.perf_counter()
+                    resultado = next(resultados, None)
+                    if resultado is None:
+                        resultados = iter(lotes_en_vuelo.popleft().result())
+                        enviar_lotes()
+                        resultado = next(resultados)
+                    procedures, hash_contenido, error = resultado
+                    instrumentacion.acumular('extraccion', time.perf_counter() - inicio)
+                    if error is None:
+                        tamaño = pendientes[ruta].get('tamaño', 0)
+                        instrumentacion.contar('archivos_leidos')
+                        instrumentacion.contar('bytes_leidos', tamaño)
+                        instrumentacion.registrar_repositorio(archivo_info['repo'], bytes_leidos=tamaño)
+                        if self.manifiesto is not None:
+                            self.analisis_manifiesto.registrar(pendientes[ruta], procedures, hash_contenido,
+                                                               cuerpos_pendientes[ruta])
+                    else:
+                        logger.error("❌ Error leyendo archivo %s: %s", ruta, error)
+                        self.errores.append(f"Error leyendo {ruta}: {error}")
+                    resueltos[ruta] = procedures
+                usos[ruta] -= 1
+                procedures = resueltos[ruta] if usos[ruta] else resueltos.pop(ruta)
+                yield nombre_archivo, archivo_info, procedures
+
+    def _obtener_procedures(self, archivo, cuerpos=False):
+        """Extrae los procedures de un archivo, usando el manifiesto incremental si existe"""
+        ruta = archivo['ruta_completa']
+
+        def extraer(ruta_archivo):
+            errores_previos = len(self.errores)
+            procedures = self.extraer_procedures_de_archivo(ruta_archivo, cuerpos)
+            if len(self.errores) == errores_previos:
+                self.instrumentacion.contar('archivos_leidos')
+                self.instrumentacion.contar('bytes_leidos', archivo.get('tamaño', 0))
+                return procedures, True
+            return procedures, False
+
+        if self.manifiesto is None:
+            return extraer(ruta)[0]
+
+        if self.analisis_manifiesto is None:
+            # Buscador cargado de un snapshot que se actualiza sin haber analizado
+            self.analisis_manifiesto = self.manifiesto.iniciar_analisis()
+        return self.analisis_manifiesto.obtener_procedures(archivo, extraer, cuerpos)
+
+    def _clasificar_archivo(self, procedures_del_archivo):
+        """
+        Clasifica los procedures de un único archivo
+
+        'estado' depende solo del nombre (REPETIDO si aparece en más de un repositorio) y
+        'contenido' compara además las huellas de los cuerpos: IDÉNTICO si todas las
+        copias coinciden, DIVERGENTE si hay varias versiones y ÚNICO si no se repite.
+        """
+        resultado_archivo = {}
+
+        for nombre_procedure, apariciones in procedures_del_archivo.items():
+            repositorios_unicos = set(aparicion['repositorio'] for aparicion in apariciones)
+            grupos_huella = agrupar_por_huella(apariciones)
+
+            if len(repositorios_unicos) > 1:
+                # Procedure repetido
+                resultado_archivo[nombre_procedure] = _crear_resultado_procedure(
+                    'REPETIDO', 'IDÉNTICO' if len(grupos_huella) == 1 else 'DIVERGENTE',
+                    repositorios_unicos, apariciones, grupos_huella
+                )
+            else:
+                # Procedure único
+                resultado_archivo[nombre_procedure] = _crear_resultado_procedure(
+                    'ÚNICO', 'ÚNICO', repositorios_unicos, apariciones, grupos_huella
+                )
+
+        return resultado_archivo
+
     def mostrar_todos_los_procedures(self):
         """Muestra TODOS los procedures clasificados por repetidos/únicos"""  # *** CAMBIO: Renombrado
         print("\n" + "="*100)
@@ -265,6 +918,7 @@ class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a Buscador
                     print(f"      Estado: {info['estado']}")
                     print(f"      Repositorios: {', '.join(info['repositorios'])}")
                     print(f"      Total repositorios: {info['total_repositorios']}")
+                    print(f"      Contenido: {info['contenido']} ({info['variantes']} versiones del cuerpo)")
                     for aparicion in info['apariciones']:
                         modificador_str = f"[{aparicion['modificador']}] " if aparicion['modificador'] != 'public' else ""
                         print(f"      {aparicion['repositorio']}: {modificador_str}{aparicion['linea']}")
@@ -293,6 +947,12 @@ class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a Buscador
 
     def guardar_resumen_completo(self, archivo_salida="resumen_codeunits_completo.json"):  # *** CAMBIO: Nombre de archivo
         """Guarda resumen completo incluyendo todos los procedures"""  # *** CAMBIO: Documentación
+        with self.instrumentacion.etapa('guardado'):
+            self._guardar_resumen_completo(archivo_salida)
+
+        logger.info("💾 Resumen completo guardado en: %s", archivo_salida)
+
+    def _guardar_resumen_completo(self, archivo_salida):
         resumen = {
             'fecha_busqueda': datetime.now().isoformat(),
             'tipo_analisis': 'codeunits',  # *** CAMBIO: Agregar tipo de análisis
@@ -304,7 +964,11 @@ class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a Buscador
                 'procedures_repetidos': sum(1 for procedures in self.todos_los_procedures.values()  # *** CAMBIO: Variable actualizada
                                           for procedure in procedures.values() if procedure['estado'] == 'REPETIDO'),
                 'procedures_unicos': sum(1 for procedures in self.todos_los_procedures.values()  # *** CAMBIO: Variable actualizada
-                                       for procedure in procedures.values() if procedure['estado'] == 'ÚNICO')
+                                       for procedure in procedures.values() if procedure['estado'] == 'ÚNICO'),
+                'procedures_identicos': sum(1 for procedures in self.todos_los_procedures.values()
+                                          for procedure in procedures.values() if procedure['contenido'] == 'IDÉNTICO'),
+                'procedures_divergentes': sum(1 for procedures in self.todos_los_procedures.values()
+                                            for procedure in procedures.values() if procedure['contenido'] == 'DIVERGENTE')
             },
             'todos_los_archivos': self.archivos_encontrados,
             'archivos_repetidos': self.archivos_repetidos,
@@ -314,9 +978,347 @@ class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a Buscador
         }
 
         with open(archivo_salida, 'w', encoding='utf-8') as f:
-            json.dump(resumen, f, indent=2, ensure_ascii=False)
+            # El AlmacenProcedures y sus vistas se serializan como diccionarios
+            json.dump(resumen, f, indent=2, ensure_ascii=False, default=dict)
+
+    def _estadisticas_archivos(self):
+        """Estadísticas de los archivos encontrados, comunes a todos los formatos de exportación"""
+        return {
+            'total_repositorios': len(self.archivos_encontrados),
+            'total_archivos': sum(len(archivos) for archivos in self.archivos_encontrados.values()),
+            'archivos_repetidos': len(self.archivos_repetidos)
+        }
+
+    def guardar_resumen_ndjson(self, archivo_salida="resumen_codeunits_completo.ndjson.gz", comprimir=None):
+        """
+        Guarda los procedures ya analizados como NDJSON, un registro por archivo y por procedure
+
+        A diferencia de guardar_resumen_completo no construye el resumen entero en memoria.
+        Para exportar mientras se analiza, pasa un ExportadorNDJSON a analizar_todos_los_procedures.
+        """
+        with self.instrumentacion.etapa('guardado'):
+            exportador = ExportadorNDJSON(archivo_salida, comprimir=comprimir)
+            exportador.abrir(self.carpeta_repositorios)
+            for nombre_archivo, procedures in self.todos_los_procedures.items():
+                exportador.escribir_archivo(nombre_archivo, procedures)
+            exportador.cerrar(self._estadisticas_archivos(), self.errores)
+
+        logger.info("💾 Resumen NDJSON guardado en: %s", archivo_salida)
+
+    def guardar_snapshot(self, archivo_salida="resumen_codeunits" + snapshot.EXTENSION_SNAPSHOT):
+        """
+        Guarda el análisis en un snapshot binario que se puede volver a cargar con
+        cargar_snapshot sin escanear los repositorios
+
+        Solo se guardan los archivos encontrados: los archivos repetidos y únicos se
+        recalculan al cargar.
+        """
+        with self.instrumentacion.etapa('guardado'):
+            almacen = self.todos_los_procedures
+            if not isinstance(almacen, AlmacenProcedures):
+                almacen = AlmacenProcedures()
+                for nombre_archivo, procedures in self.todos_los_procedures.items():
+                    almacen[nombre_archivo] = procedures
+
+            metadatos = {
+                'fecha_busqueda': datetime.now().isoformat(),
+                'tipo_analisis': 'codeunits',
+                # Absoluta: el snapshot se puede abrir desde otro directorio de trabajo
+                'carpeta_repositorios': os.path.abspath(self.carpeta_repositorios),
+                'todos_los_archivos': self.archivos_encontrados,
+                'tiempos_repositorios': self.tiempos_repositorios,
+                'errores': self.errores
+            }
+            snapshot.guardar_snapshot(archivo_salida, metadatos, almacen)
+
+        logger.info("💾 Snapshot guardado en: %s", archivo_salida)
+
+    @classmethod
+    def cargar_snapshot(cls, archivo_snapshot, **kwargs):
+        """
+        Crea un buscador con el análisis guardado en un snapshot
+
+        Args:
+            archivo_snapshot (str): Snapshot guardado con guardar_snapshot
+            **kwargs: Argumentos adicionales para el constructor
+
+        Raises:
+            snapshot.ErrorSnapshot: Si el archivo no es un snapshot válido
+        """
+        metadatos, almacen = snapshot.cargar_snapshot(archivo_snapshot)
+
+        buscador = cls(metadatos['carpeta_repositorios'], **kwargs)
+        buscador.archivos_encontrados = metadatos['todos_los_archivos']
+        buscador.tiempos_repositorios = metadatos['tiempos_repositorios']
+        buscador.errores = metadatos['errores']
+        buscador.filtrar_archivos_repetidos()
+        buscador.todos_los_procedures = almacen
+        buscador._notificar_progreso(etapa='completado')
 
-        print(f"💾 Resumen completo guardado en: {archivo_salida}")
+        logger.info("📂 Snapshot cargado desde: %s", archivo_snapshot)
+        return buscador
+
+    def escanear_archivos(self, max_workers=None):
+        """
+        Vuelve a recorrer los repositorios sin modificar el buscador
+
+        Los repositorios se recorren en un pool de hilos, como en buscar_archivos(paralelo=True).
+
+        Args:
+            max_workers (int): Número de hilos del pool (por defecto el de ThreadPoolExecutor)
+
+        Returns:
+            dict: repositorio -> archivos, con el mismo formato que archivos_encontrados.
+                Si un repositorio no se puede leer se conservan sus archivos anteriores.
+        """
+        repos = [repo_path for repo_path in self.carpeta_repositorios.iterdir() if repo_path.is_dir()]
+        archivos_encontrados = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futuros = [executor.submit(self._escanear_repositorio, repo_path) for repo_path in repos]
+
+            for repo_path, futuro in zip(repos, futuros):
+                try:
+                    archivos_repo, _ = futuro.result()
+                except OSError as e:
+                    logger.error("❌ Error procesando %s: %s", repo_path.name, e)
+                    archivos_repo = self.archivos_encontrados.get(repo_path.name, [])
+                if archivos_repo:
+                    archivos_encontrados[repo_path.name] = archivos_repo
+        return archivos_encontrados
+
+    def detectar_cambios(self, archivos_encontrados):
+        """
+        Compara un escaneo nuevo (ver escanear_archivos) con archivos_encontrados
+
+        Un archivo ha cambiado si cambia su tamaño, su fecha de modificación o las
+        carpetas LLB que lo contienen.
+
+        Returns:
+            dict: 'añadidos', 'modificados' y 'eliminados' -> lista de (ruta, nombre_archivo)
+        """
+        def indexar(archivos_por_repo):
+            firmas = {}
+            for archivos in archivos_por_repo.values():
+                for archivo in archivos:
+                    firma = firmas.setdefault(archivo['ruta_completa'],
+                                              [archivo['nombre'], archivo['tamaño'], archivo['modificado'], []])
+                    firma[3].append(archivo['carpeta_llb_base'])
+            return firmas
+
+        anteriores = indexar(self.archivos_encontrados)
+        actuales = indexar(archivos_encontrados)
+        cambios = {'añadidos': [], 'modificados': [], 'eliminados': []}
+
+        for ruta, firma in actuales.items():
+            anterior = anteriores.get(ruta)
+            if anterior is None:
+                cambios['añadidos'].append((ruta, firma[0]))
+            elif anterior != firma:
+                cambios['modificados'].append((ruta, firma[0]))
+        for ruta, firma in anteriores.items():
+            if ruta not in actuales:
+                cambios['eliminados'].append((ruta, firma[0]))
+        return cambios
+
+    def _construir_clasificador(self):
+        """
+        Crea el ClasificadorIncremental con el análisis actual
+
+        Recorre una vez todas las apariciones; a partir de ahí cada actualización solo
+        toca los contadores de los procedures de los archivos cambiados.
+        """
+        huellas_por_ruta = defaultdict(dict)
+        for procedures in self.todos_los_procedures.values():
+            for nombre_procedure, info in procedures.items():
+                for aparicion in info['apariciones']:
+                    huellas_por_ruta[aparicion['ruta_archivo']].setdefault(nombre_procedure, aparicion['huella'])
+
+        clasificador = ClasificadorIncremental()
+        for archivos in (self.archivos_repetidos, self.archivos_unicos):
+            for grupo in archivos.values():
+                for archivo_info in grupo['archivos']:
+                    huellas = huellas_por_ruta.get(archivo_info['archivo']['ruta_completa'], {})
+                    clasificador.registrar(archivo_info, huellas.items())
+        return clasificador
+
+    def _actualizar_grupo(self, nombre_archivo, apariciones):
+        """Coloca el grupo de un nombre_archivo en archivos_repetidos o archivos_unicos según el clasificador"""
+        estado = self.clasificador.estado_archivo(nombre_archivo)
+        destino, otro = ((self.archivos_repetidos, self.archivos_unicos) if estado == 'REPETIDO'
+                         else (self.archivos_unicos, self.archivos_repetidos))
+        otro.pop(nombre_archivo, None)
+        if estado is None:
+            destino.pop(nombre_archivo, None)
+            return
+        destino[nombre_archivo] = {
+            'total_apariciones': len(apariciones),
+            'carpetas_llb': self.clasificador.carpetas_archivo(nombre_archivo),
+            'repositorios': list(set(aparicion['repo'] for aparicion in apariciones)),
+            'archivos': apariciones
+        }
+
+    def _actualizar_procedures(self, nombre_archivo, tocados, nuevas, posiciones, rutas_extraer):
+        """
+        Rehace en todos_los_procedures los procedures 'tocados' de un archivo según el clasificador
+
+        Args:
+            nombre_archivo (str): Nombre del archivo .CodeUnit.al
+            tocados (set): Procedures con alguna aparición en 'rutas_extraer', antes o ahora
+            nuevas (dict): nombre_procedure -> [(posición en el grupo, aparición)] recién extraídas
+            posiciones (dict): ruta -> posiciones de sus apariciones en el grupo del archivo
+            rutas_extraer (set): Rutas cuyas apariciones anteriores ya no valen
+        """
+        inicio = time.perf_counter()
+        procedures = (dict(self.todos_los_procedures[nombre_archivo].items())
+                      if nombre_archivo in self.todos_los_procedures else {})
+
+        for nombre_procedure in tocados:
+            estado = self.clasificador.estado_procedure(nombre_archivo, nombre_procedure)
+            if estado is None:
+                procedures.pop(nombre_procedure, None)
+                continue
+
+            apariciones = list(nuevas.get(nombre_procedure, ()))
+            if nombre_procedure in procedures:
+                # Apariciones de los archivos sin cambios, en la posición de su archivo en el grupo
+                usos = defaultdict(int)
+                for aparicion in procedures[nombre_procedure]['apariciones']:
+                    ruta = aparicion['ruta_archivo']
+                    if ruta in rutas_extraer or ruta not in posiciones:
+                        continue
+                    indice = min(usos[ruta], len(posiciones[ruta]) - 1)
+                    usos[ruta] += 1
+                    apariciones.append((posiciones[ruta][indice], dict(aparicion)))
+            apariciones.sort(key=lambda par: par[0])
+            apariciones = [aparicion for _, aparicion in apariciones]
+
+            procedures[nombre_procedure] = _crear_resultado_procedure(
+                estado[0], estado[1], self.clasificador.repositorios_procedure(nombre_archivo, nombre_procedure),
+                apariciones, agrupar_por_huella(apariciones)
+            )
+        self.instrumentacion.acumular('clasificacion', time.perf_counter() - inicio)
+
+        if procedures:
+            self.todos_los_procedures[nombre_archivo] = procedures
+            if self.callback_resultado is not None:
+                self.callback_resultado(nombre_archivo, self.todos_los_procedures[nombre_archivo])
+        elif nombre_archivo in self.todos_los_procedures:
+            del self.todos_los_procedures[nombre_archivo]
+
+    def aplicar_cambios(self, archivos_encontrados, cambios):
+        """
+        Actualiza el análisis con un escaneo nuevo volviendo a extraer solo los archivos cambiados
+
+        Los archivos cambiados se quitan del clasificador incremental y se vuelven a
+        registrar con sus procedures nuevos, así que los estados REPETIDO/ÚNICO se
+        actualizan sin reagrupar todo el corpus; las transiciones quedan en
+        ultimas_transiciones. El estado y los repositorios de cada procedure salen del
+        clasificador y solo se rehacen los procedures con alguna aparición en un archivo
+        añadido, modificado o eliminado; el resto se conserva del análisis anterior.
+        Los procedures nuevos se añaden al final de su archivo.
+
+        Args:
+            archivos_encontrados (dict): Resultado de escanear_archivos
+            cambios (dict): Resultado de detectar_cambios
+
+        Returns:
+            set: Nombres de archivo reclasificados
+        """
+        rutas_cambiadas = set()
+        nombres_afectados = set()
+        for lista in cambios.values():
+            for ruta, nombre_archivo in lista:
+                rutas_cambiadas.add(ruta)
+                nombres_afectados.add(nombre_archivo)
+                cache_contenido.invalidar(ruta)
+        self.ultimas_transiciones = []
+        if not nombres_afectados:
+            return nombres_afectados
+        if self.clasificador is None:
+            self.clasificador = self._construir_clasificador()
+
+        with self.instrumentacion.etapa('actualizacion'):
+            # Grupos afectados en el orden del escaneo, igual que en filtrar_archivos_repetidos
+            grupos = defaultdict(list)
+            for repo, archivos in archivos_encontrados.items():
+                for archivo in archivos:
+                    if archivo['nombre'] in nombres_afectados:
+                        grupos[archivo['nombre']].append({
+                            'archivo': archivo,
+                            'repo': repo,
+                            'carpeta_llb_id': f"{repo}/{archivo['carpeta_llb_base']}"
+                        })
+            self.archivos_encontrados = archivos_encontrados
+
+            # Los grupos que ya eran REPETIDO se extrajeron con cuerpos; uno que pasa a estar
+            # en varias carpetas LLB los necesita de todos sus archivos, así que se vuelven a extraer
+            repetidos = {nombre_archivo for nombre_archivo, grupo in grupos.items()
+                         if len({archivo_info['carpeta_llb_id'] for archivo_info in grupo}) > 1}
+            rutas_extraer = set(rutas_cambiadas)
+            for nombre_archivo in repetidos:
+                if nombre_archivo not in self.archivos_repetidos:
+                    rutas_extraer.update(archivo_info['archivo']['ruta_completa']
+                                         for archivo_info in grupos[nombre_archivo])
+
+            # Procedures con alguna aparición en las rutas que se vuelven a extraer
+            tocados = defaultdict(set)
+            transiciones = []
+            for ruta in rutas_extraer:
+                for nombre_archivo, nombre_procedure in self.clasificador.procedures_ruta(ruta):
+                    tocados[nombre_archivo].add(nombre_procedure)
+                transiciones.extend(self.clasificador.quitar(ruta))
+
+            for nombre_archivo in sorted(nombres_afectados):
+                grupo = grupos.get(nombre_archivo, [])
+                # ruta -> posiciones en el grupo (un archivo en LLB anidadas aparece varias veces)
+                posiciones = defaultdict(list)
+                # nombre_procedure -> [(posición en el grupo, aparición)] de las rutas extraídas
+                nuevas = defaultdict(list)
+
+                for posicion, archivo_info in enumerate(grupo):
+                    ruta = archivo_info['archivo']['ruta_completa']
+                    posiciones[ruta].append(posicion)
+                    if ruta in rutas_extraer:
+                        procedures = self._obtener_procedures(archivo_info['archivo'], nombre_archivo in repetidos)
+                        transiciones.extend(self.clasificador.registrar(
+                            archivo_info, ((nombre_procedure, info_procedure.get('huella', ''))
+                                           for nombre_procedure, info_procedure in procedures.items())))
+                        for nombre_procedure, info_procedure in procedures.items():
+                            nuevas[nombre_procedure].append(
+                                (posicion, _crear_aparicion(archivo_info['repo'], ruta, info_procedure)))
+
+                self._actualizar_grupo(nombre_archivo, grupo)
+                self._actualizar_procedures(nombre_archivo, tocados[nombre_archivo] | set(nuevas), nuevas,
+                                            posiciones, rutas_extraer)
+
+        if isinstance(self.todos_los_procedures, AlmacenProcedures):
+            self.todos_los_procedures.compactar(umbral=0.5)
+        if self.manifiesto is not None:
+            self.manifiesto.guardar()
+
+        transiciones = consolidar_transiciones(transiciones)
+        for transicion in transiciones:
+            logger.debug("  🔀 %s %s: %s -> %s", transicion['nombre_archivo'], transicion['nombre_procedure'] or '',
+                         transicion['anterior'], transicion['nuevo'])
+        self.ultimas_transiciones = transiciones
+        self.version_resultados += 1
+        self.instrumentacion.contar('archivos_actualizados', len(rutas_cambiadas))
+        self.instrumentacion.contar('transiciones', len(transiciones))
+        logger.info("🔄 %d archivos cambiados, %d grupos reclasificados, %d procedures cambian de estado",
+                    len(rutas_cambiadas), len(nombres_afectados),
+                    sum(1 for transicion in transiciones if transicion['tipo'] == TRANSICION_PROCEDURE))
+        return nombres_afectados
+
+    def actualizar(self):
+        """
+        Vuelve a escanear los repositorios y aplica los cambios encontrados
+
+        Returns:
+            set: Nombres de archivo reclasificados (vacío si no ha cambiado nada)
+        """
+        archivos_encontrados = self.escanear_archivos()
+        return self.aplicar_cambios(archivos_encontrados, self.detectar_cambios(archivos_encontrados))
 
     def obtener_todos_los_procedures(self):  # *** CAMBIO: Renombrado
         """Retorna todos los procedures clasificados"""
@@ -324,31 +1326,142 @@ class BuscadorCodeunit:  # *** CAMBIO: Renombrado de BuscadorTableExt a Buscador
 
 
 # Uso del script completo
-if __name__ == "__main__":
-    # Configuración
-    ruta_repositorios = "/Users/miguelangel/Documents/AL"
+def crear_parser():
+    """Argumentos de la línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Busca los procedures de los archivos .CodeUnit.al repetidos entre repositorios AL",
+        epilog=(f"Códigos de salida: {CODIGO_CORRECTO} correcto, {CODIGO_ERRORES_LECTURA} archivos ilegibles, "
+                f"{CODIGO_USO_INCORRECTO} argumentos no válidos, {CODIGO_FALLO} el análisis falló")
+    )
+    parser.add_argument('ruta_repositorios', help="Carpeta que contiene los repositorios AL")
+    parser.add_argument('-p', '--procesos', type=int, default=os.cpu_count() or 1,
+                        help="Procesos que extraen procedures en paralelo (por defecto, uno por CPU)")
+    parser.add_argument('-c', '--cache', metavar='DIRECTORIO',
+                        help="Carpeta del manifiesto incremental; los archivos sin cambios no se vuelven a extraer")
+    parser.add_argument('--verificar-hash', action='store_true',
+                        help="Comprobar el hash de los archivos del manifiesto aunque no cambien tamaño ni fecha")
+    parser.add_argument('-f', '--formato', choices=sorted(SALIDAS_POR_DEFECTO), default='json',
+                        help="Formato del resultado (por defecto json)")
+    parser.add_argument('-o', '--salida', help="Archivo de resultado (por defecto según el formato)")
+    parser.add_argument('-e', '--estadisticas', metavar='ARCHIVO', default='-',
+                        help="Dónde escribir las estadísticas y tiempos en JSON ('-' para la salida estándar)")
+    parser.add_argument('--mostrar', action='store_true',
+                        help="Mostrar también todos los procedures por la salida estándar")
+    parser.add_argument('--perfilar', action='store_true',
+                        help="Ejecutar bajo cProfile y tracemalloc e incluir el perfil en las estadísticas")
+    nivel = parser.add_mutually_exclusive_group()
+    nivel.add_argument('-q', '--silencioso', action='store_true', help="Solo avisos y errores en el log")
+    nivel.add_argument('-v', '--detallado', action='store_true', help="Un mensaje por repositorio y archivo")
+    return parser
 
-    # Crear instancia del buscador
-    buscador = BuscadorCodeunit(ruta_repositorios)  # *** CAMBIO: Nueva clase
 
-    # PASO 1: Buscar archivos
-    print("🚀 PASO 1: Buscando archivos Codeunit.al...")  # *** CAMBIO: Mensaje actualizado
-    buscador.buscar_archivos()
+def _contar_estados(todos_los_procedures):
+    """Procedures por estado y contenido, con las mismas claves que el pie del NDJSON"""
+    contadores = {'total_procedures': 0, 'procedures_repetidos': 0, 'procedures_unicos': 0,
+                  'procedures_identicos': 0, 'procedures_divergentes': 0}
+    for procedures in todos_los_procedures.values():
+        for procedure in procedures.values():
+            contadores['total_procedures'] += 1
+            contadores['procedures_repetidos' if procedure['estado'] == 'REPETIDO' else 'procedures_unicos'] += 1
+            if procedure['contenido'] == 'IDÉNTICO':
+                contadores['procedures_identicos'] += 1
+            elif procedure['contenido'] == 'DIVERGENTE':
+                contadores['procedures_divergentes'] += 1
+    return contadores
 
-    # PASO 2: Filtrar archivos repetidos
-    print("\n🚀 PASO 2: Filtrando archivos repetidos...")
-    archivos_repetidos, archivos_unicos = buscador.filtrar_archivos_repetidos()
 
-    # PASO 3: Analizar TODOS los procedures
-    print("\n🚀 PASO 3: Analizando TODOS los procedures...")  # *** CAMBIO: Mensaje actualizado
-    todos_los_procedures = buscador.analizar_todos_los_procedures()  # *** CAMBIO: Llamada actualizada
+def main(argv=None):
+    """
+    Ejecuta el análisis completo sin interfaz, pensado para tareas programadas
 
-    # PASO 4: Mostrar TODOS los procedures
-    print("\n🚀 PASO 4: Mostrando TODOS los procedures...")  # *** CAMBIO: Mensaje actualizado
-    buscador.mostrar_todos_los_procedures()  # *** CAMBIO: Llamada actualizada
+    El log va a stderr y las estadísticas en JSON a stdout (o al archivo de
+    --estadisticas), así que la salida estándar se puede procesar directamente.
 
-    # PASO 5: Guardar resumen
-    print("\n🚀 PASO 5: Guardando resumen...")
-    buscador.guardar_resumen_completo()
+    Args:
+        argv (list): Argumentos (por defecto los de sys.argv)
 
-    print(f"\n🎉 ¡Análisis completo de Codeunits terminado!")  # *** CAMBIO: Mensaje actualizado
+    Returns:
+        int: Código de salida (CODIGO_CORRECTO, CODIGO_ERRORES_LECTURA, CODIGO_FALLO)
+    """
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    if not Path(args.ruta_repositorios).is_dir():
+        parser.error(f"no existe la carpeta {args.ruta_repositorios}")
+    if args.procesos < 1:
+        parser.error("--procesos debe ser al menos 1")
+
+    configurar_logging(logging.WARNING if args.silencioso else logging.DEBUG if args.detallado else logging.INFO)
+    salida = args.salida or SALIDAS_POR_DEFECTO[args.formato]
+    instrumentacion = Instrumentacion(perfilar=args.perfilar, medir_memoria=args.perfilar)
+    manifiesto = ManifiestoProcedures(args.cache, verificar_hash=args.verificar_hash) if args.cache else None
+    buscador = BuscadorCodeunit(args.ruta_repositorios, manifiesto=manifiesto, instrumentacion=instrumentacion)
+    inicio = time.perf_counter()
+
+    try:
+        buscador.buscar_archivos(paralelo=args.procesos > 1)
+        buscador.filtrar_archivos_repetidos()
+
+        if args.formato == 'ndjson':
+            # Cada archivo se escribe en cuanto se clasifica; solo se conserva en memoria si hay que mostrarlo
+            exportador = ExportadorNDJSON(salida)
+            buscador.analizar_todos_los_procedures(procesos=args.procesos, exportador=exportador,
+                                                   conservar_resultados=args.mostrar)
+            procedures = {
+                'total_procedures': exportador.total_procedures,
+                'procedures_repetidos': exportador.procedures_repetidos,
+                'procedures_unicos': exportador.procedures_unicos,
+                'procedures_identicos': exportador.procedures_identicos,
+                'procedures_divergentes': exportador.procedures_divergentes
+            }
+        else:
+            buscador.analizar_todos_los_procedures(procesos=args.procesos, compacto=args.formato == 'snapshot')
+            if args.formato == 'snapshot':
+                buscador.guardar_snapshot(salida)
+            else:
+                buscador.guardar_resumen_completo(salida)
+            procedures = _contar_estados(buscador.todos_los_procedures)
+
+        if args.mostrar:
+            buscador.mostrar_todos_los_procedures()
+        codigo = CODIGO_ERRORES_LECTURA if buscador.errores else CODIGO_CORRECTO
+        error = None
+    except Exception as e:
+        logger.exception("❌ El análisis falló")
+        codigo = CODIGO_FALLO
+        error = str(e)
+        procedures = None
+
+    estadisticas = {
+        'fecha': datetime.now().isoformat(),
+        'codigo_salida': codigo,
+        'error': error,
+        'carpeta_repositorios': str(buscador.carpeta_repositorios),
+        'formato': args.formato,
+        'salida': salida if error is None else None,
+        'procesos': args.procesos,
+        'segundos': time.perf_counter() - inicio,
+        'archivos': buscador._estadisticas_archivos(),
+        'procedures': procedures,
+        'manifiesto': (buscador.analisis_manifiesto.obtener_estadisticas()
+                       if buscador.analisis_manifiesto is not None else None),
+        'errores': buscador.errores,
+        'metricas': instrumentacion.resumen()
+    }
+    if args.perfilar:
+        estadisticas['perfil'] = instrumentacion.texto_perfil()
+
+    if args.estadisticas == '-':
+        json.dump(estadisticas, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        with open(args.estadisticas, 'w', encoding='utf-8') as f:
+            json.dump(estadisticas, f, indent=2, ensure_ascii=False)
+        logger.info("📊 Estadísticas guardadas en: %s", args.estadisticas)
+
+    if codigo == CODIGO_CORRECTO:
+        logger.info("🎉 ¡Análisis completo de Codeunits terminado!")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
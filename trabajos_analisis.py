@@ -0,0 +1,116 @@
+from datetime import datetime
+import logging
+import threading
+import uuid
+
+from instrumentacion import Instrumentacion
+from tablesScript import BuscadorCodeunit
+
+logger = logging.getLogger(__name__)
+
+
+class TrabajoAnalisis:
+    """
+    Ejecuta el análisis de BuscadorCodeunit en un hilo en segundo plano
+
+    El progreso y los archivos ya clasificados se guardan bajo un lock, de modo que
+    cualquier sesión de Streamlit puede consultarlos mientras el análisis sigue en curso.
+    """
+
+    def __init__(self, ruta_repositorios, manifiesto=None, procesos=1, perfilar=False):
+        self.id = uuid.uuid4().hex
+        self.ruta_repositorios = ruta_repositorios
+        self.manifiesto = manifiesto
+        self.procesos = procesos
+        self.instrumentacion = Instrumentacion(perfilar=perfilar, medir_memoria=perfilar)
+        self.estado = 'pendiente'
+        self.error = None
+        self.inicio = None
+        self.fin = None
+        self.buscador = None
+        self._progreso = {}
+        self._resultados_parciales = {}
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._ejecutar, name=f"analisis-{self.id[:8]}", daemon=True)
+
+    def iniciar(self):
+        """Lanza el análisis en segundo plano"""
+        self.estado = 'en_curso'
+        self.inicio = datetime.now()
+        self._hilo.start()
+
+    def _ejecutar(self):
+        try:
+            buscador = BuscadorCodeunit(
+                self.ruta_repositorios,
+                manifiesto=self.manifiesto,
+                callback_progreso=self._al_progresar,
+                callback_resultado=self._al_clasificar_archivo,
+                instrumentacion=self.instrumentacion
+            )
+            self.buscador = buscador
+            buscador.buscar_archivos(paralelo=True)
+            buscador.filtrar_archivos_repetidos()
+            buscador.analizar_todos_los_procedures(procesos=self.procesos, compacto=True)
+            self.estado = 'completado'
+        except Exception as e:
+            self.error = str(e)
+            self.estado = 'error'
+            logger.exception("❌ El análisis de %s falló", self.ruta_repositorios)
+        finally:
+            self.fin = datetime.now()
+
+    def _al_progresar(self, progreso):
+        with self._lock:
+            self._progreso = progreso
+
+    def _al_clasificar_archivo(self, nombre_archivo, procedures):
+        with self._lock:
+            self._resultados_parciales[nombre_archivo] = procedures
+
+    @property
+    def en_curso(self):
+        return self.estado in ('pendiente', 'en_curso')
+
+    def obtener_progreso(self):
+        """Retorna una copia del progreso actual"""
+        with self._lock:
+            return dict(self._progreso)
+
+    def obtener_resultados_parciales(self):
+        """Retorna una copia de los archivos clasificados hasta el momento"""
+        with self._lock:
+            return dict(self._resultados_parciales)
+
+
+class RegistroTrabajos:
+    """Trabajos de análisis del servidor, uno activo como máximo por ruta de repositorios"""
+
+    def __init__(self):
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def iniciar_o_unirse(self, ruta_repositorios, manifiesto=None, procesos=1, perfilar=False):
+        """
+        Inicia un análisis para la ruta o devuelve el que ya está en curso
+
+        Con perfilar=True el nuevo trabajo se ejecuta bajo cProfile y tracemalloc
+
+        Returns:
+            tuple: (TrabajoAnalisis, bool indicando si el trabajo es nuevo)
+        """
+        with self._lock:
+            trabajo = self._trabajos.get(ruta_repositorios)
+            if trabajo is not None and trabajo.en_curso:
+                return trabajo, False
+
+            trabajo = TrabajoAnalisis(ruta_repositorios, manifiesto=manifiesto, procesos=procesos,
+                                      perfilar=perfilar)
+            self._trabajos[ruta_repositorios] = trabajo
+            trabajo.iniciar()
+            return trabajo, True
+
+    def obtener(self, ruta_repositorios):
+        """Retorna el último trabajo lanzado para la ruta, si existe"""
+        with self._lock:
+            return self._trabajos.get(ruta_repositorios)
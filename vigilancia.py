@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+import logging
+import threading
+import time
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog es opcional: sin él se sondea el disco cada 'intervalo'
+    FileSystemEventHandler = object
+    Observer = None
+
+from tablesScript import SUFIJO_CODEUNIT
+
+logger = logging.getLogger(__name__)
+
+# Entre dos escaneos pasa al menos este múltiplo de lo que tardó el último, para que en
+# repositorios lentos (p. ej. en red) el escaneo no ocupe todo el tiempo
+FACTOR_ESPERA_ESCANEO = 2.0
+
+
+class _ManejadorEventos(FileSystemEventHandler):
+    """Activa un evento cuando cambia un .CodeUnit.al o una carpeta bajo los repositorios"""
+
+    def __init__(self, hay_cambios: threading.Event):
+        super().__init__()
+        self.hay_cambios = hay_cambios
+
+    def on_any_event(self, event):
+        if event.event_type in ('opened', 'closed_no_write'):
+            return
+        rutas = (str(event.src_path), str(getattr(event, 'dest_path', '') or ''))
+        if event.is_directory or any(ruta.endswith(SUFIJO_CODEUNIT) for ruta in rutas):
+            self.hay_cambios.set()
+
+
+class BloqueoLecturaEscritura:
+    """
+    Bloqueo con varios lectores simultáneos o un único escritor
+
+    Los escritores tienen prioridad: mientras uno espera no entran lectores nuevos, así
+    que una actualización no queda bloqueada indefinidamente por sesiones que leen.
+    """
+
+    def __init__(self):
+        self._condicion = threading.Condition()
+        self._lectores = 0
+        self._escribiendo = False
+        self._escritores_esperando = 0
+
+    @contextmanager
+    def lectura(self):
+        with self._condicion:
+            while self._escribiendo or self._escritores_esperando:
+                self._condicion.wait()
+            self._lectores += 1
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._lectores -= 1
+                if not self._lectores:
+                    self._condicion.notify_all()
+
+    @contextmanager
+    def escritura(self):
+        with self._condicion:
+            self._escritores_esperando += 1
+            while self._escribiendo or self._lectores:
+                self._condicion.wait()
+            self._escritores_esperando -= 1
+            self._escribiendo = True
+        try:
+            yield
+        finally:
+            with self._condicion:
+                self._escribiendo = False
+                self._condicion.notify_all()
+
+
+class VigilanteCodeunits:
+    """
+    Mantiene al día el análisis de un BuscadorCodeunit mientras cambian los archivos
+
+    Si watchdog está instalado, las notificaciones del sistema operativo (inotify,
+    FSEvents...) indican cuándo hay que volver a escanear; si no, se escanea como mucho
+    una vez cada 'intervalo' segundos. El escaneo es un os.scandir por repositorio en
+    un pool de hilos y solo los archivos añadidos, modificados o eliminados se vuelven
+    a extraer (ver BuscadorCodeunit.actualizar). Si el escaneo es lento, el intervalo
+    se alarga a FACTOR_ESPERA_ESCANEO veces lo que tardó el último.
+
+    Los resultados del buscador se modifican en sitio. Si otros hilos los leen (varias
+    sesiones del dashboard muestran el mismo análisis) deben hacerlo dentro de
+    lectura(); cada actualización con cambios incrementa buscador.version_resultados.
+    """
+
+    def __init__(self, buscador, intervalo: float = 2.0, usar_eventos: bool = True):
+        """
+        Args:
+            buscador (BuscadorCodeunit): Buscador con un análisis completo
+            intervalo (float): Segundos mínimos entre escaneos cuando se sondea el disco
+            usar_eventos (bool): Usar watchdog si está disponible
+        """
+        self.buscador = buscador
+        self.intervalo = intervalo
+        self.ultimos_cambios = set()
+        self.segundos_escaneo = 0.0
+        self._hay_cambios = threading.Event()
+        self._ultima_comprobacion = time.monotonic()
+        self._observador = None
+        self._bloqueo = BloqueoLecturaEscritura()
+        self._lock_comprobacion = threading.Lock()
+
+        if usar_eventos and Observer is not None:
+            observador = Observer()
+            observador.schedule(_ManejadorEventos(self._hay_cambios), str(buscador.carpeta_repositorios),
+                                recursive=True)
+            observador.daemon = True
+            observador.start()
+            self._observador = observador
+        logger.info("👁️ Vigilando %s (%s)", buscador.carpeta_repositorios,
+                    "eventos del sistema" if self.usa_eventos else f"sondeo cada {intervalo}s")
+
+    @property
+    def usa_eventos(self) -> bool:
+        return self._observador is not None
+
+    @property
+    def espera_minima(self) -> float:
+        """Segundos mínimos entre escaneos según lo que tardó el último"""
+        return self.segundos_escaneo * FACTOR_ESPERA_ESCANEO
+
+    @property
+    def intervalo_efectivo(self) -> float:
+        """Segundos entre escaneos cuando se sondea el disco"""
+        return max(self.intervalo, self.espera_minima)
+
+    def lectura(self):
+        """Contexto durante el que no se aplican cambios a los resultados del buscador"""
+        return self._bloqueo.lectura()
+
+    def comprobar(self, forzar: bool = False) -> set:
+        """
+        Aplica al buscador los cambios ocurridos desde la última comprobación
+
+        Con eventos solo se escanea si el sistema ha notificado algún cambio; sondeando,
+        como mucho una vez por intervalo_efectivo. En ambos casos entre el final de un
+        escaneo y el siguiente pasa al menos espera_minima. Si otro hilo ya está comprobando no se hace
+        nada: sus cambios se verán en buscador.version_resultados.
+
+        Args:
+            forzar (bool): Escanear aunque no haya eventos ni haya pasado el intervalo
+
+        Returns:
+            set: Nombres de archivo reclasificados
+        """
+        if not self._lock_comprobacion.acquire(blocking=False):
+            return set()
+        try:
+            if not forzar:
+                transcurrido = time.monotonic() - self._ultima_comprobacion
+                if self.usa_eventos:
+                    if not self._hay_cambios.is_set() or transcurrido < self.espera_minima:
+                        return set()
+                elif transcurrido < self.intervalo_efectivo:
+                    return set()
+            self._hay_cambios.clear()
+
+            # El escaneo solo lee el disco; los resultados se modifican al aplicar los cambios
+            inicio = time.monotonic()
+            archivos_encontrados = self.buscador.escanear_archivos()
+            self._ultima_comprobacion = time.monotonic()
+            self.segundos_escaneo = self._ultima_comprobacion - inicio
+            if self.espera_minima > self.intervalo:
+                logger.debug("🐢 El escaneo tardó %.1fs; se espera %.1fs entre escaneos",
+                            self.segundos_escaneo, self.espera_minima)
+            cambios = self.buscador.detectar_cambios(archivos_encontrados)
+            if not any(cambios.values()):
+                return set()
+            with self._bloqueo.escritura():
+                nombres = self.buscador.aplicar_cambios(archivos_encontrados, cambios)
+                if nombres:
+                    self.ultimos_cambios = nombres
+            return nombres
+        finally:
+            self._lock_comprobacion.release()
+
+    def vigilar(self, callback=None, detener: threading.Event = None):
+        """
+        Comprueba cambios en bucle hasta que se active 'detener'
+
+        Args:
+            callback (callable): Recibe el conjunto de nombres de archivo reclasificados
+            detener (threading.Event): Evento para terminar el bucle
+        """
+        detener = detener if detener is not None else threading.Event()
+        while not detener.is_set():
+            if self.usa_eventos:
+                self._hay_cambios.wait(self.intervalo)
+                nombres = self.comprobar()
+            else:
+                detener.wait(self.intervalo_efectivo)
+                nombres = self.comprobar(forzar=True)
+            if nombres and callback is not None:
+                callback(nombres)
+
+    def detener(self):
+        """Detiene el observador de eventos del sistema, si lo hay"""
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join()
+            self._observador = None
+
+
+class RegistroVigilantes:
+    """
+    Un VigilanteCodeunits por buscador, compartido por las sesiones que lo vigilan
+
+    Varias sesiones del dashboard pueden mostrar el mismo análisis; todas usan el mismo
+    vigilante, de modo que los cambios se aplican una sola vez, y se detiene cuando la
+    última sesión deja de vigilar.
+    """
+
+    def __init__(self, intervalo: float = 2.0):
+        self.intervalo = intervalo
+        self._vigilantes = {}  # id(buscador) -> (vigilante, sesiones suscritas)
+        self._lock = threading.Lock()
+
+    def suscribir(self, buscador, sesion: str) -> VigilanteCodeunits:
+        """Devuelve el vigilante del buscador, creándolo si no existe, y apunta la sesión"""
+        with self._lock:
+            if id(buscador) not in self._vigilantes:
+                self._vigilantes[id(buscador)] = (VigilanteCodeunits(buscador, intervalo=self.intervalo), set())
+            vigilante, sesiones = self._vigilantes[id(buscador)]
+            sesiones.add(sesion)
+            return vigilante
+
+    def cancelar(self, buscador, sesion: str):
+        """Quita la sesión y detiene el vigilante si ya no lo usa ninguna"""
+        with self._lock:
+            entrada = self._vigilantes.get(id(buscador))
+            if entrada is None:
+                return
+            vigilante, sesiones = entrada
+            sesiones.discard(sesion)
+            if sesiones:
+                return
+            del self._vigilantes[id(buscador)]
+        vigilante.detener()
+
+    def obtener(self, buscador):
+        """Vigilante activo del buscador o None"""
+        with self._lock:
+            entrada = self._vigilantes.get(id(buscador))
+            return entrada[0] if entrada is not None else None